@@ -0,0 +1,259 @@
+"""
+Analysis Cache - Persistente, content-addressed cache voor analyse resultaten
+- Key = hash van de bestandsinhoud + analyse parameters + algoritme versie
+- Opslag in SQLite (WAL mode), veilig voor meerdere processen tegelijk
+- Configureerbare maximale grootte met least-recently-used eviction
+
+Configuratie via environment variabelen:
+    MUSIC_ANALYZER_CACHE=0            Cache uitschakelen
+    MUSIC_ANALYZER_CACHE_DIR=<pad>    Cache directory (default: ~/.cache/music_analyzer)
+    MUSIC_ANALYZER_CACHE_MAX_MB=<mb>  Maximale grootte in MB (default: 512)
+
+Gebruik:
+    from analysis_cache import get_default_cache
+    cache = get_default_cache()
+    result, hit = cache.cached_call('standalone:1', 'track.mp3', {'sample_rate': 44100}, compute)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'music_analyzer'
+DEFAULT_MAX_MB = 512
+
+# Blokgrootte voor het hashen van bestanden (1 MB)
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_default_cache = None
+_default_cache_error = None
+
+
+def file_content_hash(filename):
+    """
+    Bereken de content hash van een bestand (blake2b, in blokken gelezen)
+
+    Args:
+        filename: Pad naar bestand
+
+    Returns:
+        Hex string van de hash
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_content_hash(data):
+    """
+    Content hash van audio in het geheugen (gelijk aan file_content_hash van
+    een bestand met dezelfde inhoud)
+
+    Args:
+        data: bytes-achtig object
+
+    Returns:
+        Hex string van de hash
+    """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class ContentHash(str):
+    """Vooraf berekende content hash als input voor cached_call (het bestand wordt niet opnieuw gelezen)"""
+
+
+class AnalysisCache:
+    """
+    On-disk cache voor analyse resultaten met LRU eviction
+
+    Args:
+        cache_dir: Directory voor de cache database
+        max_bytes: Maximale totale grootte van opgeslagen resultaten in bytes
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / 'analysis_cache.sqlite'
+
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # Elke operatie een eigen connectie: veilig over threads en processen heen
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    @staticmethod
+    def make_key(content_hash, analyzer, params):
+        """
+        Stel de cache key samen
+
+        Args:
+            content_hash: Hash van de bestandsinhoud
+            analyzer: Naam en algoritme versie van de analyzer (bijv. 'pro:1')
+            params: Dictionary met analyse parameters
+
+        Returns:
+            Hex string cache key
+        """
+        payload = json.dumps([content_hash, analyzer, params], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Haal een resultaat op en markeer het als recent gebruikt
+
+        Returns:
+            Opgeslagen resultaat of None bij een cache miss
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            return json.loads(row[0])
+        finally:
+            conn.close()
+
+    def put(self, key, value):
+        """
+        Sla een resultaat op en verwijder de oudste entries als de cache te groot is
+        """
+        text = json.dumps(value)
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, text, size, time.time())
+            )
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        """Verwijder least-recently-used entries tot de cache binnen max_bytes valt"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_delete = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access ASC'):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM entries WHERE key = ?', to_delete)
+
+    def clear(self):
+        """Verwijder alle entries"""
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM entries')
+        finally:
+            conn.close()
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary met aantal entries, totale grootte en limiet in bytes
+        """
+        conn = self._connect()
+        try:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        finally:
+            conn.close()
+        return {"entries": count, "size_bytes": total, "max_bytes": self.max_bytes}
+
+    def cached_call(self, analyzer, filename, params, compute):
+        """
+        Voer compute() uit, tenzij het resultaat voor deze inhoud al in de cache staat
+
+        Cache fouten (read-only filesystem, locks) vallen terug op gewoon rekenen.
+
+        Args:
+            analyzer: Naam en algoritme versie van de analyzer (bijv. 'pro:1')
+            filename: Pad naar audio bestand, de inhoud als bytes-achtig object, of
+                      een ContentHash
+            params: Dictionary met analyse parameters
+            compute: Functie zonder argumenten die het resultaat berekent
+
+        Returns:
+            result: Analyse resultaat
+            hit: True als het resultaat uit de cache kwam
+        """
+        try:
+            if isinstance(filename, ContentHash):
+                content_hash = str(filename)
+            elif isinstance(filename, (str, os.PathLike)):
+                content_hash = file_content_hash(filename)
+            else:
+                content_hash = data_content_hash(filename)
+            key = self.make_key(content_hash, analyzer, params)
+            cached = self.get(key)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Waarschuwing: Cache niet beschikbaar: {e}")
+            return compute(), False
+
+        if cached is not None:
+            return cached, True
+
+        result = compute()
+        try:
+            self.put(key, result)
+        except (OSError, sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Waarschuwing: Kon resultaat niet cachen: {e}")
+        return result, False
+
+
+def get_default_cache():
+    """
+    Gedeelde cache instantie op basis van de environment variabelen
+
+    Returns:
+        AnalysisCache of None als de cache uitgeschakeld of niet beschikbaar is
+    """
+    global _default_cache, _default_cache_error
+
+    if os.environ.get('MUSIC_ANALYZER_CACHE', '1').lower() in ('0', 'false', 'no', 'off'):
+        return None
+
+    if _default_cache is None and _default_cache_error is None:
+        cache_dir = os.environ.get('MUSIC_ANALYZER_CACHE_DIR', str(DEFAULT_CACHE_DIR))
+        max_mb = float(os.environ.get('MUSIC_ANALYZER_CACHE_MAX_MB', DEFAULT_MAX_MB))
+        try:
+            _default_cache = AnalysisCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
+        except (OSError, sqlite3.Error) as e:
+            # Eén keer melden; daarna draait alles zonder cache
+            _default_cache_error = e
+            print(f"Waarschuwing: Cache uitgeschakeld: {e}")
+
+    return _default_cache
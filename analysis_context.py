@@ -0,0 +1,114 @@
+"""
+Analysis Context - Gedeelde spectrale tussenresultaten per track
+- STFT magnitude en power spectrogram worden één keer berekend
+- Onset envelope, chromagram en RMS hergebruiken dezelfde STFT
+- Frame grid (aantal frames en frame tijden) voor alle detectors
+- Tempo en beat tracking op de gedeelde onset envelope
+
+Gebruik:
+    from analysis_context import AnalysisContext
+    ctx = AnalysisContext(y, sr)
+    tempo = ctx.tempo(aggregate=np.median)
+"""
+
+from functools import cached_property
+
+import librosa
+import numpy as np
+
+
+# Standaard STFT instellingen (gelijk aan de librosa defaults)
+DEFAULT_N_FFT = 2048
+DEFAULT_HOP_LENGTH = 512
+
+
+class AnalysisContext:
+    """
+    Spectrale context voor één track
+
+    Alle zware tussenresultaten worden lui berekend bij het eerste gebruik
+    en daarna bewaard, zodat BPM, key en energie detectie dezelfde STFT delen.
+
+    Args:
+        y: Audio time series
+        sr: Sample rate
+        n_fft: FFT grootte (default: 2048)
+        hop_length: Aantal samples tussen frames (default: 512)
+    """
+
+    def __init__(self, y, sr, n_fft=DEFAULT_N_FFT, hop_length=DEFAULT_HOP_LENGTH):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    @property
+    def duration(self):
+        """Duur van de track in seconden"""
+        return len(self.y) / self.sr
+
+    @cached_property
+    def stft_magnitude(self):
+        """STFT magnitude |S| (freq bins × frames)"""
+        return np.abs(librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length))
+
+    @cached_property
+    def power_spectrogram(self):
+        """Power spectrogram |S|² (basis voor mel, chroma en onset envelope)"""
+        return self.stft_magnitude ** 2
+
+    @cached_property
+    def onset_env(self):
+        """Onset strength envelope (zelfde als librosa.onset.onset_strength(y=y))"""
+        mel = librosa.feature.melspectrogram(S=self.power_spectrogram, sr=self.sr)
+        return librosa.onset.onset_strength(
+            S=librosa.power_to_db(mel), sr=self.sr,
+            n_fft=self.n_fft, hop_length=self.hop_length
+        )
+
+    @cached_property
+    def chromagram(self):
+        """Chromagram (12 × frames) op basis van het gedeelde power spectrogram"""
+        return librosa.feature.chroma_stft(S=self.power_spectrogram, sr=self.sr)
+
+    @cached_property
+    def rms(self):
+        """RMS energie per frame op basis van de gedeelde STFT magnitude"""
+        return librosa.feature.rms(
+            S=self.stft_magnitude, frame_length=self.n_fft, hop_length=self.hop_length
+        )[0]
+
+    def tempo(self, aggregate=np.mean):
+        """
+        Tempo schatting op de gedeelde onset envelope (librosa.beat.tempo)
+
+        Args:
+            aggregate: Aggregatie over frames (np.mean, np.median of None voor tempo per frame)
+        """
+        return librosa.beat.tempo(
+            onset_envelope=self.onset_env, sr=self.sr, hop_length=self.hop_length, aggregate=aggregate
+        )
+
+    def beat_track(self, units='time'):
+        """
+        Beat tracking op de gedeelde onset envelope (librosa.beat.beat_track)
+
+        Returns:
+            tempo: Geschat tempo
+            beats: Beat posities in de gevraagde units
+        """
+        return librosa.beat.beat_track(
+            onset_envelope=self.onset_env, sr=self.sr, hop_length=self.hop_length, units=units
+        )
+
+    @property
+    def n_frames(self):
+        """Aantal STFT frames"""
+        return 1 + len(self.y) // self.hop_length
+
+    @cached_property
+    def frame_times(self):
+        """Tijd in seconden van elk frame"""
+        return librosa.frames_to_time(
+            np.arange(self.n_frames), sr=self.sr, hop_length=self.hop_length
+        )
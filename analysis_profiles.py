@@ -0,0 +1,84 @@
+"""
+Analysis Profiles - Benoemde instellingen voor snelheid versus detail
+- fast:      11025 Hz, alleen BPM en key (ingest van grote bibliotheken)
+- balanced:  22050 Hz, alle detectors (librosa standaard instellingen)
+- archival:  44100 Hz, alle detectors (oorspronkelijke instellingen, default)
+
+Onset envelope en chroma zijn bij 22050 of 11025 Hz mono vrijwel gelijk aan
+44100 Hz; de hop length schaalt mee zodat de frame rate (~43 frames/s) gelijk blijft.
+
+Het default profiel kan via de environment variabele MUSIC_ANALYZER_PROFILE
+worden ingesteld.
+
+Gebruik:
+    from music_analyzer_standalone import analyze_audio
+    result = analyze_audio('track.mp3', profile='fast')
+    print(result['profile'])  # 'fast'
+"""
+
+import os
+
+
+# Alle detectors die een profiel kan aanzetten
+ALL_DETECTORS = ('bpm', 'key', 'energy', 'peaks', 'phrases', 'waveform')
+
+PROFILES = {
+    'fast': {
+        'sample_rate': 11025,
+        'n_fft': 1024,
+        'hop_length': 256,
+        'detectors': ('bpm', 'key'),
+    },
+    'balanced': {
+        'sample_rate': 22050,
+        'n_fft': 2048,
+        'hop_length': 512,
+        'detectors': ALL_DETECTORS,
+    },
+    'archival': {
+        'sample_rate': 44100,
+        'n_fft': 2048,
+        'hop_length': 512,
+        'detectors': ALL_DETECTORS,
+    },
+}
+
+DEFAULT_PROFILE = os.environ.get('MUSIC_ANALYZER_PROFILE', 'archival')
+
+
+def get_profile(profile=None, sample_rate=None):
+    """
+    Zoek de instellingen van een profiel op
+
+    Args:
+        profile: Naam van het profiel (None = DEFAULT_PROFILE)
+        sample_rate: Optionele sample rate die die van het profiel overschrijft;
+                     het profiel heet dan 'custom'
+
+    Returns:
+        Dictionary met name, sample_rate, n_fft, hop_length en detectors
+    """
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Onbekend analyse profiel: {name} (kies uit {', '.join(PROFILES)})")
+
+    config = dict(PROFILES[name], name=name)
+    if sample_rate is not None and sample_rate != config['sample_rate']:
+        config['sample_rate'] = sample_rate
+        config['name'] = 'custom'
+    config['detectors'] = tuple(config['detectors'])
+    return config
+
+
+def cache_params(config):
+    """
+    Returns:
+        Dictionary met de profiel instellingen voor de cache key
+    """
+    return {
+        'profile': config['name'],
+        'sample_rate': config['sample_rate'],
+        'n_fft': config['n_fft'],
+        'hop_length': config['hop_length'],
+        'detectors': list(config['detectors']),
+    }
@@ -5,8 +5,12 @@ Vereenvoudigde versie - retourneert alleen: songnaam, BPM, key en duur
 import os
 import sys
 import json
+import re
+import time
 from pathlib import Path
 
+_IMPORT_START = time.perf_counter()
+
 # Voeg parent directory toe aan Python path voor imports
 # Dit is nodig omdat api/index.py in een subdirectory staat
 current_dir = Path(__file__).parent
@@ -14,8 +18,38 @@ parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
 
-from werkzeug.utils import secure_filename
-from music_analyzer_simple import analyze_track_simple
+# Alleen /tmp is schrijfbaar op Vercel; daar staat ook de analyse cache
+os.environ.setdefault('MUSIC_ANALYZER_CACHE_DIR', '/tmp/music_analyzer_cache')
+
+# Numba cache vóór de eerste import van librosa (prebuilt cache uit de deploy bundle)
+from cold_start import configure_numba_cache, warm_up
+configure_numba_cache()
+
+# Harde limiet voor uploads (body na base64 decodering)
+MAX_UPLOAD_BYTES = int(os.environ.get('MUSIC_ANALYZER_MAX_UPLOAD_MB', 500)) * 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Upload groter dan MAX_UPLOAD_BYTES"""
+
+    def __init__(self, size, limit):
+        super().__init__(f"Upload te groot ({size / 1024 / 1024:.1f} MB, max {limit / 1024 / 1024:.0f} MB)")
+        self.size = size
+        self.limit = limit
+
+# librosa/NumPy (en werkzeug) worden pas bij de eerste upload geïmporteerd:
+# de index pagina en OPTIONS requests starten zonder die import kosten
+_analyzer = None
+
+
+def get_analyzer():
+    """Lazy import van analyze_track_simple (librosa, NumPy, numba)"""
+    global _analyzer
+    if _analyzer is None:
+        from music_analyzer_simple import analyze_track_simple
+        _analyzer = analyze_track_simple
+    return _analyzer
+
 
 # Laad HTML template
 def load_template():
@@ -27,101 +61,99 @@ def allowed_file(filename):
     allowed_extensions = {'mp3', 'wav', 'm4a', 'flac'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-def parse_multipart(body, content_type):
-    """Parse multipart form data - verbeterde versie"""
-    # Parse boundary
-    if 'boundary=' not in content_type:
+def _multipart_boundary(content_type):
+    """Boundary uit de Content-Type header (None als die ontbreekt)"""
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.strip().lower() == 'boundary' and value:
+            return value.strip().strip('"').encode('latin-1')
+    return None
+
+
+_DISPOSITION_PARAM = re.compile(r"""(\w+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^;]*))""")
+
+
+def _part_headers(raw):
+    """Headers van een part (keys lowercase) plus de Content-Disposition parameters"""
+    headers = {}
+    for line in raw.decode('utf-8', errors='ignore').splitlines():
+        key, sep, value = line.partition(':')
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+
+    params = {}
+    for match in _DISPOSITION_PARAM.finditer(headers.get('content-disposition', '')):
+        params[match.group(1).lower()] = next(g for g in match.groups()[1:] if g is not None).strip()
+    return headers, params
+
+
+def parse_multipart(body, content_type, max_size=MAX_UPLOAD_BYTES):
+    """
+    Parse multipart form data zonder de payload te kopiëren
+
+    De body wordt met bytes.find() op offsets gescand; de inhoud van elk bestand
+    is een memoryview op de body (geen split, strip of slice kopieën), zodat het
+    geheugen per request dicht bij één kopie van de upload blijft.
+
+    Args:
+        body: Request body (bytes; een str wordt als latin-1 gecodeerd)
+        content_type: Content-Type header met de boundary
+        max_size: Maximale grootte van de body in bytes
+
+    Returns:
+        Dictionary veldnaam -> {'filename', 'content_type', 'content' (memoryview)};
+        alleen bestandsvelden, leeg als er geen boundary is
+
+    Raises:
+        UploadTooLarge: Als de body groter is dan max_size
+    """
+    boundary = _multipart_boundary(content_type)
+    if not boundary:
         return {}
-    
-    boundary = content_type.split('boundary=')[1].strip()
-    if boundary.startswith('"') and boundary.endswith('"'):
-        boundary = boundary[1:-1]
-    
-    files = {}
-    
-    # Zorg dat body bytes is
+
     if isinstance(body, str):
         body = body.encode('latin-1')
-    
-    # Split by boundary (als bytes)
-    boundary_bytes = f'--{boundary}'.encode('utf-8')
-    parts = body.split(boundary_bytes)
-    
-    for part in parts:
-        # Zorg dat part bytes is
-        if isinstance(part, str):
-            part = part.encode('latin-1')
-        
-        part = part.strip()
-        if not part or part == b'--':
-            continue
-        
-        # Find header/content separator (zoek naar dubbele newline)
-        header_end = -1
-        sep = None
-        for sep_candidate in [b'\r\n\r\n', b'\n\n']:
-            if sep_candidate in part:
-                header_end = part.find(sep_candidate)
-                sep = sep_candidate
-                break
-        
-        if header_end == -1 or sep is None:
-            continue
-        
-        # Split headers and content
-        headers_bytes = part[:header_end]
-        content = part[header_end + len(sep):]
-        headers_str = headers_bytes.decode('utf-8', errors='ignore')
-        
-        # Parse headers
-        headers = {}
-        for line in headers_str.split('\n'):
-            line = line.strip()
-            if ':' in line:
-                key, value = line.split(':', 1)
-                headers[key.strip().lower()] = value.strip()
-        
-        # Check if it's a file
-        if 'content-disposition' in headers:
-            disp = headers['content-disposition']
-            if 'filename=' in disp:
-                # Extract filename
-                try:
-                    # Handle quoted filenames
-                    if 'filename="' in disp:
-                        filename = disp.split('filename="')[1].split('"')[0]
-                    elif "filename='" in disp:
-                        filename = disp.split("filename='")[1].split("'")[0]
-                    else:
-                        filename = disp.split('filename=')[1].split(';')[0].strip()
-                    
-                    # Extract field name
-                    if 'name="' in disp:
-                        name = disp.split('name="')[1].split('"')[0]
-                    elif "name='" in disp:
-                        name = disp.split("name='")[1].split("'")[0]
-                    else:
-                        name = disp.split('name=')[1].split(';')[0].strip()
-                    
-                    # Clean up content (remove trailing boundary markers)
-                    # Zorg dat content bytes is
-                    if isinstance(content, str):
-                        content = content.encode('latin-1')
-                    
-                    # Remove trailing \r\n-- if present
-                    while content.endswith(b'\r\n--') or content.endswith(b'\n--'):
-                        if content.endswith(b'\r\n--'):
-                            content = content[:-4]
-                        elif content.endswith(b'\n--'):
-                            content = content[:-3]
-                    
-                    files[name] = {
-                        'filename': filename,
-                        'content': content
-                    }
-                except Exception as e:
-                    continue
-    
+    if len(body) > max_size:
+        raise UploadTooLarge(len(body), max_size)
+
+    view = memoryview(body)
+    delimiter = b'--' + boundary
+    files = {}
+
+    pos = body.find(delimiter)
+    while pos != -1:
+        start = pos + len(delimiter)
+        if body[start:start + 2] == b'--':
+            break  # Afsluitende boundary
+
+        # Header/content scheiding (CRLF, of LF van niet-conforme clients)
+        crlf = body.find(b'\r\n\r\n', start)
+        lf = body.find(b'\n\n', start)
+        if crlf == -1 and lf == -1:
+            break
+        if crlf != -1 and (lf == -1 or crlf <= lf):
+            header_end, content_start = crlf, crlf + 4
+        else:
+            header_end, content_start = lf, lf + 2
+
+        # De inhoud loopt tot de regelovergang vóór de volgende boundary
+        pos = body.find(delimiter, content_start)
+        if pos == -1:
+            break  # Afgekapte body: onvolledig part negeren
+        content_end = pos
+        if body[content_end - 2:content_end] == b'\r\n':
+            content_end -= 2
+        elif body[content_end - 1:content_end] == b'\n':
+            content_end -= 1
+
+        headers, params = _part_headers(body[start:header_end])
+        if 'filename' in params and 'name' in params:
+            files[params['name']] = {
+                'filename': params['filename'],
+                'content_type': headers.get('content-type'),
+                'content': view[content_start:max(content_start, content_end)],
+            }
+
     return files
 
     # Vercel entry point
@@ -137,9 +169,13 @@ def handler(req):
         
         # Als body base64 encoded is, decode het naar bytes
         # Voor multipart/form-data hebben we bytes nodig
+        # (te grote uploads worden niet eerst gedecodeerd)
         if req.get('isBase64Encoded', False) and body:
             import base64
-            body = base64.b64decode(body)
+            if len(body) // 4 * 3 > MAX_UPLOAD_BYTES:
+                body = UploadTooLarge(len(body) // 4 * 3, MAX_UPLOAD_BYTES)
+            else:
+                body = base64.b64decode(body)
     else:
         # Fallback voor andere formats
         method = 'GET'
@@ -174,9 +210,30 @@ def handler(req):
             'body': html_content
         }
     
+    # Warm-up hook: na een deploy (of periodiek) aanroepen, zodat de eerste
+    # echte upload geen imports en JIT compilatie meer betaalt
+    if method in ('GET', 'POST') and path == '/warmup':
+        try:
+            result = warm_up()
+            get_analyzer()
+            result['module_import_seconds'] = MODULE_IMPORT_SECONDS
+            status = 200
+        except Exception as e:
+            result, status = {'error': f'Warm-up mislukt: {str(e)}'}, 500
+        return {
+            'statusCode': status,
+            'headers': {
+                **cors_headers,
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps(result)
+        }
+
     # Handle file upload
     if method == 'POST' and path == '/upload':
         try:
+            from werkzeug.utils import secure_filename
+
             content_type = headers_req.get('content-type', headers_req.get('Content-Type', ''))
             
             if 'multipart/form-data' not in content_type:
@@ -189,6 +246,9 @@ def handler(req):
                     'body': json.dumps({'error': 'Geen bestand geüpload'})
                 }
             
+            if isinstance(body, UploadTooLarge):
+                raise body
+
             # Zorg dat body bytes is voor multipart parsing
             # Als body een string is (niet base64), probeer het als bytes te behandelen
             if isinstance(body, str):
@@ -225,35 +285,10 @@ def handler(req):
                     'body': json.dumps({'error': 'Ongeldig bestandsformaat'})
                 }
             
-            # Sla tijdelijk op in /tmp (beschikbaar in Vercel serverless)
-            tmp_dir = '/tmp'
-            os.makedirs(tmp_dir, exist_ok=True)
-            
-            # Genereer unieke filename om conflicten te voorkomen
-            import uuid
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-            filepath = os.path.join(tmp_dir, unique_filename)
-            
-            with open(filepath, 'wb') as f:
-                # Schrijf content als bytes
-                if isinstance(file_content, str):
-                    # Als string, encode naar bytes (latin-1 behoudt alle bytes)
-                    file_content = file_content.encode('latin-1')
-                elif isinstance(file_content, bytes):
-                    pass  # Al bytes
-                else:
-                    file_content = bytes(file_content)
-                f.write(file_content)
-            
             try:
                 # Analyseer track (vereenvoudigd - alleen songnaam, BPM, key, duur)
-                result = analyze_track_simple(filepath)
-                
-                # Cleanup temp file
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+                # direct uit de memoryview op de body, zonder /tmp bestand
+                result = get_analyzer()(file_content, name=filename)
                 
                 return {
                     'statusCode': 200,
@@ -265,11 +300,6 @@ def handler(req):
                 }
                 
             except Exception as e:
-                # Cleanup bij error
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
                 return {
                     'statusCode': 500,
                     'headers': {
@@ -279,6 +309,16 @@ def handler(req):
                     'body': json.dumps({'error': f'Fout bij analyseren: {str(e)}'})
                 }
             
+        except UploadTooLarge as e:
+            return {
+                'statusCode': 413,
+                'headers': {
+                    **cors_headers,
+                    'Content-Type': 'application/json'
+                },
+                'body': json.dumps({'error': str(e)})
+            }
+
         except Exception as e:
             return {
                 'statusCode': 500,
@@ -298,6 +338,8 @@ def handler(req):
         'body': json.dumps({'error': 'Route niet gevonden'})
     }
 
+MODULE_IMPORT_SECONDS = round(time.perf_counter() - _IMPORT_START, 4)
+
 # Vercel verwacht dat de handler functie direct beschikbaar is
 # Export de handler als default
 __all__ = ['handler']
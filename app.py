@@ -1,13 +1,17 @@
 
-from flask import Flask, render_template, request, jsonify, url_for
+from flask import Flask, Response, render_template, request, jsonify, url_for
 import os
 from pathlib import Path
 from werkzeug.utils import secure_filename
 import json
-from music_analyzer_pro import analyze_track_pro
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import tracemalloc
+from binary_export import to_bytes
+from harmonic_index import DEFAULT_LIMIT, DEFAULT_TOLERANCE, HarmonicIndex
+from job_queue import JobQueue, QueueFull
+from music_analyzer_pro import run_analysis_pro
+from stage_metrics import StageMetrics, StageRecorder, prometheus_text
+from waveform_render import IMAGE_DPI, figure_pixels, min_max_line, plot_waveform_envelope
+from matplotlib.figure import Figure
 import numpy as np
 
 app = Flask(__name__)
@@ -15,9 +19,37 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
 app.config['ALLOWED_EXTENSIONS'] = {'mp3', 'wav', 'm4a', 'flac'}
 
+# Analyse jobs: aantal gelijktijdige analyses, wachtrij grootte en gedrag bij een volle wachtrij
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('MUSIC_ANALYZER_WORKERS', 2))
+app.config['ANALYSIS_QUEUE_SIZE'] = int(os.environ.get('MUSIC_ANALYZER_QUEUE_SIZE', 16))
+app.config['ANALYSIS_QUEUE_POLICY'] = os.environ.get('MUSIC_ANALYZER_QUEUE_POLICY', 'reject')
+
+# Piek allocatie per analyse stap meten (tracemalloc, ~20% trager)
+app.config['TRACK_MEMORY'] = os.environ.get('MUSIC_ANALYZER_TRACK_MEMORY', '').lower() in ('1', 'true', 'yes')
+
+# Opgeslagen analyses voor /mix (JSON lines, JSON exports of directories, gescheiden door os.pathsep)
+app.config['LIBRARY_PATHS'] = [p for p in os.environ.get('MUSIC_ANALYZER_LIBRARY', '').split(os.pathsep) if p]
+
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('static/analysis_images', exist_ok=True)
 
+jobs = JobQueue(
+    workers=app.config['ANALYSIS_WORKERS'],
+    max_queued=app.config['ANALYSIS_QUEUE_SIZE'],
+    policy=app.config['ANALYSIS_QUEUE_POLICY']
+)
+
+# Harmonic mixing index: bibliotheek bij het starten, uploads worden incrementeel toegevoegd
+harmonic_index = HarmonicIndex.from_paths(*app.config['LIBRARY_PATHS'])
+
+# Tijd en geheugen per analyse stap over alle uploads (voor /metrics)
+stage_metrics = StageMetrics()
+
+# Eén keer proces-breed starten, zodat gelijktijdige jobs tracemalloc niet voor elkaar stoppen
+# (de piek is ook proces-breed: stappen die overlappen met een andere job krijgen geen peak_alloc_mb)
+if app.config['TRACK_MEMORY']:
+    tracemalloc.start()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
@@ -38,44 +70,134 @@ def upload_file():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        
+        # Direct uit het geheugen analyseren (geen omweg via de upload map)
+        data = file.read()
+        
+        # URL's bouwen kan alleen binnen een request, niet in de worker thread
+        image_url = url_for('static', filename=f'analysis_images/{Path(filename).stem}_pro_analysis.png')
         
         try:
-            result = analyze_track_pro(filepath, visualize=False, export=False)
-            
-            import librosa
-            y, sr = librosa.load(filepath, sr=44100)
-            energy = np.array(result['energy'])
-            peak_times = np.array(result['peaks'])
-            img_path = create_visualization_pro(
-                y, sr, energy, peak_times, filename, 
-                result['bpm'], result['key'], result.get('mode', 'major'),
-                result.get('camelot', ''), result.get('phrases', {})
-            )
-            
-            result['visualization'] = url_for('static', filename=f'analysis_images/{Path(img_path).name}')
-            result['filename'] = filename
-            
-            return jsonify(result)
-        except Exception as e:
-            return jsonify({'error': f'Fout bij analyseren: {str(e)}'}), 500
+            job_id = jobs.submit(analyze_upload, data, filename, image_url)
+        except QueueFull as e:
+            response = jsonify({'error': f'Server is bezet, probeer het later opnieuw ({e})'})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
     
     return jsonify({'error': 'Ongeldig bestandsformaat'}), 400
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Onbekende job'}), 404
+    
+    if job['error']:
+        job['error'] = f"Fout bij analyseren: {job['error']}"
+    
+    # ?format=binary: resultaat als compact binair blok (arrays plus metadata in de header)
+    if request.args.get('format') == 'binary' and job['status'] == 'done':
+        data, _ = to_bytes(job['result'], embed_metadata=True)
+        return Response(data, mimetype='application/octet-stream')
+    return jsonify(job)
+
+
+@app.route('/jobs/metrics')
+def job_metrics():
+    return jsonify(jobs.metrics())
+
+
+@app.route('/mix')
+def mix():
+    # Tracks die mixen met ?track=<id> of met ?camelot=8A&bpm=124 (plus tolerance, half_double, limit)
+    args = request.args
+    try:
+        options = {
+            'tolerance': float(args.get('tolerance', DEFAULT_TOLERANCE)),
+            'half_double': args.get('half_double', '1').lower() not in ('0', 'false', 'no'),
+            'limit': int(args.get('limit', DEFAULT_LIMIT)),
+        }
+        if 'track' in args:
+            if args['track'] not in harmonic_index:
+                return jsonify({'error': 'Onbekende track'}), 404
+            results = harmonic_index.match(args['track'], **options)
+        elif 'camelot' in args and 'bpm' in args:
+            results = harmonic_index.query(args['camelot'], float(args['bpm']), **options)
+        else:
+            return jsonify({'error': 'Geef track of camelot en bpm op'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'tracks': results, 'count': len(results), 'library_size': len(harmonic_index)})
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text formaat: tijd per analyse stap en wachtrij statistieken
+    text = prometheus_text(stage_metrics, jobs.metrics())
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+
+def analyze_upload(data, filename, image_url):
+    """
+    Analyseer een geüpload bestand en maak de visualisatie (draait in een worker thread)
+    
+    Args:
+        data: Inhoud van de upload (bytes)
+        filename: Veilige bestandsnaam van de upload
+        image_url: URL van de visualisatie
+    
+    Returns:
+        Resultaat dictionary voor de web interface
+    """
+    stages = StageRecorder(track_memory=app.config['TRACK_MEMORY'])
+    # Geen geheugenbudget: dat geldt per proces en de jobs draaien hier als threads naast elkaar
+    analysis = run_analysis_pro(data, visualize=False, export=False, stages=stages, name=filename,
+                                memory_mb=None)
+    result = analysis.data
+    
+    # Hergebruik het gedecodeerde signaal van de analyse (alleen bij een cache hit wordt nog geladen)
+    with stages.stage('load'):
+        y, sr = analysis.signal()
+    with stages.stage('render'):
+        create_visualization_pro(
+            y, sr, analysis.energy, analysis.peak_times, filename, 
+            result['bpm'], result['key'], result.get('mode', 'major'),
+            result.get('camelot', ''), result.get('phrases', {})
+        )
+    
+    result['stage_metrics'] = stages.finish()
+    stage_metrics.observe(result['stage_metrics'])
+    
+    result['visualization'] = image_url
+    result['filename'] = filename
+    harmonic_index.add_result(result, track_id=filename)
+    
+    return result
+
+
 def create_visualization_pro(y, sr, energy, peak_times, filename, bpm, key, mode='major', camelot='', phrases=None):
     x_energy = np.linspace(0, len(y)/sr, len(energy))
-    time_axis = np.linspace(0, len(y)/sr, len(y))
     
     # Maak 3 subplots: Waveform, Combined, Energy
-    fig = plt.figure(figsize=(16, 10))
+    # (Figure API zonder pyplot: geen globale state en geen extra draw bij opslaan)
+    fig = Figure(figsize=(16, 10))
     gs = fig.add_gridspec(3, 1, height_ratios=[1.5, 2, 1], hspace=0.3)
     
+    # Waveform en energie als min/max per pixel kolom (in plaats van alle samples)
+    n_pixels = figure_pixels(fig, IMAGE_DPI)
+    x_line, energy_line = min_max_line(x_energy, energy, n_pixels)
+    
     # Plot 1: Duidelijke Waveform
     ax1 = fig.add_subplot(gs[0])
-    ax1.plot(time_axis, y, color='#4A90E2', linewidth=0.8, alpha=0.9)
-    ax1.fill_between(time_axis, y, 0, alpha=0.3, color='#4A90E2')
+    plot_waveform_envelope(ax1, y, sr, n_pixels, color='#4A90E2', alpha=0.3, outline_alpha=0.9)
     ax1.set_ylabel('Amplitude', fontsize=12, fontweight='bold')
     ax1.set_title('Waveform', fontsize=13, fontweight='bold', pad=10)
     ax1.grid(True, alpha=0.3, linestyle='--')
@@ -84,8 +206,8 @@ def create_visualization_pro(y, sr, energy, peak_times, filename, bpm, key, mode
     
     # Plot 2: Combined view met waveform, energy en peaks
     ax2 = fig.add_subplot(gs[1])
-    ax2.plot(time_axis, y, alpha=0.4, color='#4A90E2', linewidth=0.6, label='Waveform')
-    ax2.plot(x_energy, energy, color='#E24A4A', linewidth=2, label='Energy', zorder=3)
+    plot_waveform_envelope(ax2, y, sr, n_pixels, color='#4A90E2', alpha=0.4, label='Waveform')
+    ax2.plot(x_line, energy_line, color='#E24A4A', linewidth=2, label='Energy', zorder=3)
     ax2.scatter(peak_times, [np.max(energy)*0.6]*len(peak_times), color='#50C878', s=50, zorder=5, label='Peaks', alpha=0.8, marker='v')
     
     if phrases:
@@ -105,19 +227,18 @@ def create_visualization_pro(y, sr, energy, peak_times, filename, bpm, key, mode
     
     # Plot 3: Energy detail
     ax3 = fig.add_subplot(gs[2])
-    ax3.fill_between(x_energy, energy, alpha=0.6, color='#E24A4A')
-    ax3.plot(x_energy, energy, color='#E24A4A', linewidth=2)
+    ax3.fill_between(x_line, energy_line, alpha=0.6, color='#E24A4A')
+    ax3.plot(x_line, energy_line, color='#E24A4A', linewidth=2)
     ax3.set_xlabel('Time (s)', fontsize=12)
     ax3.set_ylabel('Energy', fontsize=12, fontweight='bold')
     ax3.set_title('Energy Detail', fontsize=13, fontweight='bold', pad=10)
     ax3.grid(True, alpha=0.3, linestyle='--')
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     img_filename = f"{Path(filename).stem}_pro_analysis.png"
     img_path = os.path.join('static/analysis_images', img_filename)
-    plt.savefig(img_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(img_path, dpi=IMAGE_DPI, bbox_inches='tight', facecolor='white')
     
     return img_path
 
@@ -0,0 +1,242 @@
+"""
+Audio Probe - Metadata, duur en bitrate zonder audio te decoderen
+- Leest alleen de container header en tags (mutagen), één keer per bestand
+- Fallback op soundfile voor duur, sample rate en kanalen als mutagen het
+  formaat niet kent of niet geïnstalleerd is
+- Batch modus: een complete directory in een paar seconden (threads, I/O gebonden)
+
+Handig voor directe bibliotheek overzichten; de volledige analyse kan daarna
+op de achtergrond draaien.
+
+Gebruik:
+    from audio_probe import probe, probe_directory
+    info = probe('track.mp3')  # song_name, duration, bitrate, sample_rate, channels, ...
+
+    python audio_probe.py <bestand|map> [--output probe.jsonl] [--workers 8]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from mutagen import File as MutagenFile
+    MUTAGEN_AVAILABLE = True
+except ImportError:
+    MUTAGEN_AVAILABLE = False
+    print("Waarschuwing: mutagen niet geïnstalleerd. Bitrate detectie werkt mogelijk niet.")
+    print("Installeer met: pip install mutagen")
+
+
+DEFAULT_WORKERS = 8
+
+# Tag namen per formaat (ID3, Vorbis/FLAC, MP4)
+TITLE_TAGS = ('TIT2', 'TITLE', '©nam', 'title')
+ARTIST_TAGS = ('TPE1', 'ARTIST', '©ART', 'artist')
+ALBUM_TAGS = ('TALB', 'ALBUM', '©alb', 'album')
+
+
+def format_duration(seconds):
+    """
+    Returns:
+        Duur als "m:ss" (bijv. "3:45")
+    """
+    minutes = int(seconds // 60)
+    return f"{minutes}:{int(seconds % 60):02d}"
+
+
+def _first_tag(audio_file, tag_keys):
+    """Eerste niet-lege waarde van een van de tags (None als geen enkele bestaat)"""
+    for tag_key in tag_keys:
+        try:
+            if tag_key in audio_file:
+                value = audio_file[tag_key][0]
+                if value:
+                    return str(value)
+        except (KeyError, ValueError, TypeError, IndexError):
+            continue
+    return None
+
+
+def read_metadata(filename):
+    """
+    Lees tags en stream info met één keer openen via mutagen
+
+    Args:
+        filename: Pad naar audio bestand
+
+    Returns:
+        Dictionary met title, artist, album, duration, bitrate (kbps), sample_rate,
+        channels en format (ontbrekende waarden zijn None); None als mutagen het
+        bestand niet kan lezen
+    """
+    if not MUTAGEN_AVAILABLE:
+        return None
+
+    try:
+        audio_file = MutagenFile(filename)
+    except Exception as e:
+        print(f"Waarschuwing: Kon metadata niet lezen: {e}")
+        return None
+    if audio_file is None:
+        return None
+
+    info = getattr(audio_file, 'info', None)
+    bitrate = getattr(info, 'bitrate', None)
+    if bitrate:
+        # Convert naar kbps als nodig (sommige formats geven bps)
+        bitrate = int(bitrate / 1000 if bitrate > 1000 else bitrate)
+
+    return {
+        'title': _first_tag(audio_file, TITLE_TAGS),
+        'artist': _first_tag(audio_file, ARTIST_TAGS),
+        'album': _first_tag(audio_file, ALBUM_TAGS),
+        'duration': getattr(info, 'length', None),
+        'bitrate': bitrate or None,
+        'sample_rate': getattr(info, 'sample_rate', None),
+        'channels': getattr(info, 'channels', None),
+        'format': type(audio_file).__name__,
+    }
+
+
+def _read_stream_info(filename):
+    """Fallback voor duur, sample rate en kanalen via de soundfile header"""
+    try:
+        import soundfile as sf
+        info = sf.info(filename)
+    except Exception:
+        return {}
+    return {
+        'duration': info.duration,
+        'sample_rate': info.samplerate,
+        'channels': info.channels,
+        'format': info.format,
+    }
+
+
+def probe(filename):
+    """
+    Metadata, duur en bitrate van een audio bestand zonder te decoderen
+
+    Args:
+        filename: Pad naar audio bestand
+
+    Returns:
+        Dictionary met:
+            - song_name: Titel uit de tags, anders de bestandsnaam zonder extensie
+            - artist / album: Uit de tags (None als niet beschikbaar)
+            - duration: Duur in seconden (float, None als onbekend)
+            - duration_formatted: Duur geformatteerd (bijv. "3:45")
+            - bitrate: Bitrate in kbps (None als niet beschikbaar)
+            - sample_rate: Sample rate van het bestand in Hz
+            - channels: Aantal kanalen
+            - format: Container formaat (bijv. 'MP3', 'FLAC', 'WAVE')
+            - file_size: Bestandsgrootte in bytes
+            - filename / filepath: Bestandsnaam en volledig pad
+    """
+    metadata = read_metadata(filename) or {}
+
+    # Zonder bruikbare stream info uit mutagen: header via soundfile
+    if not metadata.get('duration') or not metadata.get('sample_rate'):
+        stream_info = _read_stream_info(filename)
+        for field, value in stream_info.items():
+            if not metadata.get(field):
+                metadata[field] = value
+
+    duration = metadata.get('duration')
+    return {
+        'song_name': metadata.get('title') or Path(filename).stem,
+        'artist': metadata.get('artist'),
+        'album': metadata.get('album'),
+        'duration': round(float(duration), 2) if duration else None,
+        'duration_formatted': format_duration(duration) if duration else None,
+        'bitrate': metadata.get('bitrate'),
+        'sample_rate': metadata.get('sample_rate'),
+        'channels': metadata.get('channels'),
+        'format': metadata.get('format') or Path(filename).suffix.lstrip('.').upper(),
+        'file_size': os.path.getsize(filename),
+        'filename': Path(filename).name,
+        'filepath': str(filename),
+    }
+
+
+def _probe_one(path):
+    try:
+        return {'status': 'ok', **probe(path)}
+    except Exception as e:
+        return {'status': 'error', 'filepath': str(path), 'filename': Path(path).name,
+                'error': str(e) or type(e).__name__}
+
+
+def probe_directory(root, workers=DEFAULT_WORKERS):
+    """
+    Probe alle audio bestanden onder een directory
+
+    Args:
+        root: Directory om te doorzoeken (recursief)
+        workers: Aantal threads (header lezen is I/O gebonden) (default: 8)
+
+    Returns:
+        Lijst met probe resultaten in bestandsvolgorde, elk met 'status' ('ok' of 'error')
+    """
+    from batch_analyzer import find_audio_files
+
+    files = find_audio_files(root)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(_probe_one, files))
+
+
+def _print_probe(info):
+    details = [info['duration_formatted'] or '?:??']
+    if info['bitrate']:
+        details.append(f"{info['bitrate']} kbps")
+    if info['sample_rate']:
+        details.append(f"{info['sample_rate']} Hz")
+    if info['channels']:
+        details.append(f"{info['channels']} ch")
+    print(f"🎵 {info['song_name']}  |  {'  |  '.join(details)}  ({info['filename']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Metadata, duur en bitrate zonder te decoderen')
+    parser.add_argument('path', help='Audio bestand of directory')
+    parser.add_argument('--output', default=None, help='Resultaten als JSON (bestand) of JSON lines (directory)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Aantal threads (directory)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.path):
+        info = probe(args.path)
+        _print_probe(info)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(info, f, indent=2, ensure_ascii=False)
+        return 0
+
+    start = time.time()
+    records = probe_directory(args.path, args.workers)
+    elapsed = time.time() - start
+
+    for record in records:
+        if record['status'] == 'ok':
+            _print_probe(record)
+        else:
+            print(f"❌ {record['filepath']}: {record['error']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    total = sum(r['duration'] or 0 for r in records if r['status'] == 'ok')
+    print(f"\n📂 {len(records)} bestanden in {elapsed:.2f} sec ({total / 3600:.2f} uur audio)")
+    if args.output:
+        print(f"💾 Resultaten: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Audio Source - Analyse input als pad, bytes of leesbare stream
+- Paden gaan ongewijzigd naar librosa/soundfile/mutagen
+- bytes, bytearray, memoryview, BytesIO en andere streams worden één keer in het
+  geheugen gezet en via een MemoryReader (zonder kopie) gedecodeerd
+- Formaten die libsndfile niet uit het geheugen kan lezen (bijv. m4a) gaan via
+  een tijdelijk bestand naar audioread/ffmpeg
+- Een al gedecodeerd signaal (decode_pipeline) kan vooraf gezet worden; load()
+  decodeert dan niet opnieuw
+
+Gebruik:
+    from audio_source import as_source
+    source = as_source(request.files['file'])       # of bytes, BytesIO, pad
+    y, sr = source.load(44100)
+    source.name, source.stem                         # 'track.mp3', 'track'
+"""
+
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from analysis_cache import ContentHash
+
+
+# Naam voor in-memory audio zonder bestandsnaam
+DEFAULT_NAME = 'audio'
+
+
+class MemoryReader(io.RawIOBase):
+    """
+    Seekable, read-only file object op een buffer (geen kopie van de data)
+
+    Args:
+        data: bytes-achtig object
+        name: Bestandsnaam (voor formaat detectie op extensie)
+    """
+
+    def __init__(self, data, name=None):
+        super().__init__()
+        self._view = memoryview(data).cast('B')
+        self._pos = 0
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def is_path(source):
+    """True als source een pad is (str of os.PathLike)"""
+    return isinstance(source, (str, os.PathLike))
+
+
+class AudioSource:
+    """
+    Analyse input: een pad of de inhoud van een bestand in het geheugen
+
+    Args:
+        source: Pad, bytes-achtig object, of object met read() (BytesIO, stream,
+                werkzeug FileStorage)
+        name: Bestandsnaam voor titel en export namen (default: afgeleid van de source)
+
+    Attributes:
+        path: Pad als string (None bij in-memory input)
+        data: memoryview op de inhoud (None bij een pad)
+        name: Bestandsnaam inclusief extensie
+        content_hash: Vooraf berekende content hash (None = berekenen bij gebruik)
+    """
+
+    def __init__(self, source, name=None):
+        self.path = None
+        self.data = None
+        self.content_hash = None
+        self._signal = None
+
+        if is_path(source):
+            self.path = str(source)
+            name = name or Path(self.path).name
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.data = memoryview(source).cast('B')
+        elif hasattr(source, 'read'):
+            # Streams één keer lezen: decoderen, hashen en metadata lezen hebben
+            # elk een eigen (seekable) reader nodig
+            name = name or getattr(source, 'filename', None) or getattr(source, 'name', None)
+            self.data = memoryview(source.read()).cast('B')
+        else:
+            raise TypeError(f"Onbekende audio input: {type(source).__name__}")
+
+        self.name = Path(name).name if isinstance(name, (str, os.PathLike)) and str(name) else DEFAULT_NAME
+
+    @property
+    def stem(self):
+        """Bestandsnaam zonder extensie"""
+        return Path(self.name).stem
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+    def open(self):
+        """
+        Returns:
+            Pad of een nieuwe MemoryReader (positie 0) voor soundfile, librosa en mutagen
+        """
+        return self.path if self.path is not None else MemoryReader(self.data, self.name)
+
+    @contextmanager
+    def local_path(self):
+        """Pad naar de audio; in-memory input wordt tijdelijk naar schijf geschreven"""
+        if self.path is not None:
+            yield self.path
+            return
+
+        fd, path = tempfile.mkstemp(suffix=Path(self.name).suffix, prefix='audio_source_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.data)
+            yield path
+        finally:
+            os.remove(path)
+
+    def preload(self, y, sr, sample_rate, content_hash=None):
+        """
+        Zet een al gedecodeerd signaal (bijv. uit een decoder thread)
+
+        Args:
+            y: Audio time series
+            sr: Sample rate van y
+            sample_rate: Gevraagde sample rate waarvoor y gedecodeerd is (None = native)
+            content_hash: Content hash van het bestand (bespaart het opnieuw lezen voor de cache)
+        """
+        self._signal = (sample_rate, y, sr)
+        self.content_hash = content_hash
+
+    def preloaded(self, sample_rate):
+        """
+        Returns:
+            (y, sr) als er een signaal voor deze sample rate gezet is (zie preload), anders None
+        """
+        if self._signal is not None and self._signal[0] == sample_rate:
+            return self._signal[1], self._signal[2]
+        return None
+
+    def load(self, sample_rate):
+        """
+        Decodeer naar een mono signaal (zoals librosa.load)
+
+        In-memory input wordt direct uit het geheugen gedecodeerd als libsndfile het
+        formaat kent (wav, flac, ogg, mp3); anders via een tijdelijk bestand.
+
+        Args:
+            sample_rate: Doel sample rate (None = native)
+
+        Returns:
+            y: Audio time series
+            sr: Sample rate
+        """
+        import librosa
+        import soundfile as sf
+
+        signal = self.preloaded(sample_rate)
+        if signal is not None:
+            return signal
+
+        if self.path is not None:
+            return librosa.load(self.path, sr=sample_rate)
+
+        try:
+            return librosa.load(self.open(), sr=sample_rate)
+        except sf.SoundFileRuntimeError:
+            with self.local_path() as path:
+                return librosa.load(path, sr=sample_rate)
+
+    def cache_input(self):
+        """Input voor AnalysisCache.cached_call (content hash, pad of inhoud)"""
+        if self.content_hash is not None:
+            return ContentHash(self.content_hash)
+        return self.path if self.path is not None else self.data
+
+
+def as_source(source, name=None):
+    """
+    Returns:
+        AudioSource (een bestaande AudioSource wordt hergebruikt)
+    """
+    if isinstance(source, AudioSource):
+        return source
+    return AudioSource(source, name)
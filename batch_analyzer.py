@@ -0,0 +1,456 @@
+"""
+Batch Analyzer - Analyseer complete muziekbibliotheken parallel
+- Doorzoekt een directory boom naar audio bestanden
+- Verdeelt de tracks over alle cores met een process pool
+- Schrijft resultaten als JSON lines zodra ze klaar zijn
+- Hervat na een herstart: tracks die al in de output staan worden overgeslagen
+- Geheugenlimiet per worker, timeout per track en throughput samenvatting
+- Optioneel een geheugenbudget (piek RSS) voor de pro analyzer (memory_budget), zodat
+  één lange track de andere workers op dezelfde node niet in de problemen brengt
+- Optioneel ook in een library database (library_store) met gebundelde transacties
+- Optioneel gepipelined (decode_pipeline): decoder threads decoderen al de volgende
+  tracks terwijl de workers analyseren
+
+Gebruik:
+    python batch_analyzer.py <map> [--analyzer standalone|pro|simple] [--output resultaten.jsonl]
+                             [--workers N] [--timeout 600] [--max-memory-mb 4096]
+                             [--library library.sqlite] [--decoders N] [--queue-mb 512]
+                             [--memory-budget-mb 768]
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from analysis_cache import data_content_hash
+from analysis_profiles import PROFILES, get_profile
+from audio_source import AudioSource
+from decode_pipeline import DEFAULT_QUEUE_MB, DecodePipeline, map_unordered
+
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac'}
+
+ANALYZERS = ('standalone', 'pro', 'simple')
+
+DEFAULT_OUTPUT = 'batch_analysis.jsonl'
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_MEMORY_MB = 4096
+
+# Aantal tracks per worker proces voordat het vervangen wordt (voorkomt geheugengroei)
+TASKS_PER_CHILD = 50
+
+# Module per analyzer (vooraf geïmporteerd in de forkserver van de pipeline)
+ANALYZER_MODULES = {
+    'standalone': 'music_analyzer_standalone',
+    'pro': 'music_analyzer_pro',
+    'simple': 'music_analyzer_simple',
+}
+
+
+# Geheugenbudget van dit worker proces voor de pro analyzer (gezet door _init_worker)
+_memory_budget_mb = None
+
+
+class TrackTimeout(Exception):
+    """Analyse van één track duurde langer dan de ingestelde timeout"""
+
+
+def find_audio_files(root):
+    """
+    Zoek recursief alle audio bestanden onder een directory
+
+    Args:
+        root: Directory om te doorzoeken
+
+    Returns:
+        Gesorteerde lijst met paden (strings)
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if Path(name).suffix.lower() in AUDIO_EXTENSIONS:
+                files.append(os.path.join(dirpath, name))
+    files.sort()
+    return files
+
+
+def load_done(output_file, analyzer, retry_failed=False):
+    """
+    Lees welke tracks al in de JSON lines output staan
+
+    Args:
+        output_file: Pad naar JSON lines bestand
+        analyzer: Alleen records van deze analyzer tellen mee
+        retry_failed: Mislukte tracks opnieuw proberen (default: False)
+
+    Returns:
+        Set met paden die overgeslagen kunnen worden
+    """
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+
+    with open(output_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Half geschreven laatste regel na een crash
+                continue
+            if record.get('analyzer') != analyzer:
+                continue
+            if record.get('status') == 'ok' or not retry_failed:
+                done.add(record['path'])
+    return done
+
+
+def _init_worker(max_memory_mb, memory_budget_mb=None):
+    """Initialiseer een worker proces: geheugenlimiet, geheugenbudget en stille output"""
+    global _memory_budget_mb
+    _memory_budget_mb = memory_budget_mb
+
+    if max_memory_mb:
+        try:
+            import resource
+            limit = int(max_memory_mb * 1024 * 1024)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    # Analyzers printen veel voortgang; in batch mode alleen de samenvatting tonen
+    sys.stdout = open(os.devnull, 'w')
+
+    # Ctrl+C wordt door het hoofdproces afgehandeld
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _raise_timeout(signum, frame):
+    raise TrackTimeout()
+
+
+def _run_analyzer(path, analyzer, sample_rate, include_waveform, streaming, profile, excerpts=False):
+    """
+    Returns:
+        result: Analyse resultaat
+        duration: Duur van de audio in seconden
+    """
+    if analyzer == 'pro':
+        from music_analyzer_pro import analyze_track_pro
+        # Zonder budget op de command line geldt MUSIC_ANALYZER_MEMORY_MB (default van de analyzer)
+        budget = {'memory_mb': _memory_budget_mb} if _memory_budget_mb else {}
+        result = analyze_track_pro(path, sample_rate, visualize=False, export=False, profile=profile, **budget)
+        return result, result['duration_seconds']
+
+    if analyzer == 'simple':
+        from music_analyzer_simple import analyze_track_simple
+        result = analyze_track_simple(path, sample_rate, profile=profile)
+        return result, result['duration']
+
+    from music_analyzer_standalone import analyze_audio
+    result = analyze_audio(path, sample_rate, include_waveform=include_waveform, streaming=streaming,
+                           profile=profile, excerpts=excerpts)
+    return result, result['duration']
+
+
+def _analyze_one(task):
+    """
+    Analyseer één track in een worker proces
+
+    Args:
+        task: Tuple met pad (of AudioSource met vooraf gedecodeerd signaal) en opties
+
+    Returns:
+        Dictionary record voor de JSON lines output
+    """
+    path, analyzer, sample_rate, include_waveform, streaming, profile, excerpts, timeout = task
+    start = time.time()
+    record = {'path': path.path if isinstance(path, AudioSource) else path, 'analyzer': analyzer}
+
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        result, duration = _run_analyzer(path, analyzer, sample_rate, include_waveform, streaming, profile,
+                                         excerpts)
+        record.update(status='ok', audio_seconds=float(duration), result=result)
+    except TrackTimeout:
+        record.update(status='timeout', error=f'Analyse duurde langer dan {timeout} sec')
+    except MemoryError:
+        record.update(status='error', error='Geheugenlimiet overschreden')
+    except Exception as e:
+        record.update(status='error', error=str(e) or type(e).__name__)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    record['elapsed_seconds'] = round(time.time() - start, 3)
+    return record
+
+
+def _decode_track(task):
+    """
+    Decoder thread: lees het bestand één keer, hash de inhoud en decodeer uit het geheugen
+
+    Returns:
+        meta: Pad, sample rate, content hash, audio seconden en de analyse task
+        y: Gedecodeerd signaal
+    """
+    decode_rate = task[-1]
+    path = task[0]
+    with open(path, 'rb') as f:
+        data = f.read()
+    y, sr = AudioSource(data, Path(path).name).load(decode_rate)
+    meta = {'task': task[:-1], 'sr': sr, 'decode_rate': decode_rate,
+            'content_hash': data_content_hash(data), 'audio_seconds': len(y) / sr}
+    return meta, y
+
+
+def _analyze_decoded(meta, y):
+    """Compute proces: analyseer een track waarvan het signaal al gedecodeerd is"""
+    path, *options = meta['task']
+    source = AudioSource(path)
+    source.preload(y, meta['sr'], meta['decode_rate'], meta['content_hash'])
+    return _analyze_one((source, *options))
+
+
+def _decode_failed(task, error):
+    return {'path': task[0], 'analyzer': task[1], 'status': 'error',
+            'error': f"Decoderen mislukt: {error or type(error).__name__}", 'elapsed_seconds': 0.0}
+
+
+def _worker_failed(task, error):
+    if isinstance(error, BrokenProcessPool):
+        # Het worker proces is gestorven (OOM killer, geheugenlimiet, crash) tijdens deze track
+        message = 'Worker proces gestorven (geheugenlimiet of crash)'
+    else:
+        message = str(error) or type(error).__name__
+    return {'path': task[0], 'analyzer': task[1], 'status': 'error', 'error': message, 'elapsed_seconds': 0.0}
+
+
+def _compute_failed(meta, error):
+    return _worker_failed(meta['task'], error)
+
+
+def analyze_paths(paths, analyzer='standalone', workers=None, timeout=DEFAULT_TIMEOUT,
+                  max_memory_mb=DEFAULT_MAX_MEMORY_MB, sample_rate=None, include_waveform=False,
+                  streaming=False, profile=None, excerpts=False, decoders=0, queue_mb=DEFAULT_QUEUE_MB,
+                  stats=None, memory_budget_mb=None):
+    """
+    Analyseer tracks in een process pool (zie analyze_library voor de argumenten)
+
+    Met decoders > 0 decoderen zoveel threads de tracks vooruit (decode_pipeline);
+    de gedecodeerde PCM wacht in een wachtrij van maximaal queue_mb.
+
+    Args:
+        stats: Optioneel dictionary dat na afloop de pipeline tellers krijgt
+
+    Yields:
+        Record per track (path, analyzer, status, result of error, ...) zodra hij klaar is
+    """
+    if analyzer not in ANALYZERS:
+        raise ValueError(f"Onbekende analyzer: {analyzer}")
+    if decoders and streaming:
+        raise ValueError("Streaming analyse leest zelf in blokken en kan niet gepipelined worden")
+
+    tasks = [(path, analyzer, sample_rate, include_waveform, streaming, profile, excerpts, timeout)
+             for path in paths]
+    if not tasks:
+        return
+
+    # Eén BLAS thread per worker; de parallelliteit zit in de process pool
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+
+    if decoders:
+        decode_rate = get_profile(profile, sample_rate)['sample_rate']
+        pipeline = DecodePipeline(
+            _decode_track, _analyze_decoded, decoders=decoders, workers=workers, queue_mb=queue_mb,
+            on_decode_error=_decode_failed, on_compute_error=_compute_failed,
+            initializer=_init_worker, initargs=(max_memory_mb, memory_budget_mb),
+            max_tasks_per_child=TASKS_PER_CHILD, preload=[__name__, ANALYZER_MODULES[analyzer]]
+        )
+        try:
+            yield from pipeline.run(task + (decode_rate,) for task in tasks)
+        finally:
+            if stats is not None:
+                stats.update(pipeline.stats.summary())
+        return
+
+    # Een gestorven worker (OOM killer, --max-memory-mb, crash) geeft een error record voor
+    # de tracks die liepen; multiprocessing.Pool zou eeuwig op de verloren track wachten
+    yield from map_unordered(
+        _analyze_one, tasks, workers=workers, on_error=_worker_failed,
+        initializer=_init_worker, initargs=(max_memory_mb, memory_budget_mb),
+        max_tasks_per_child=TASKS_PER_CHILD, preload=[__name__, ANALYZER_MODULES[analyzer]]
+    )
+
+
+def analyze_library(root, output_file=DEFAULT_OUTPUT, analyzer='standalone', workers=None,
+                    timeout=DEFAULT_TIMEOUT, max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+                    sample_rate=None, include_waveform=False, retry_failed=False, streaming=False,
+                    profile=None, excerpts=False, library=None, decoders=0, queue_mb=DEFAULT_QUEUE_MB,
+                    memory_budget_mb=None):
+    """
+    Analyseer alle audio bestanden onder een directory parallel
+
+    Args:
+        root: Directory met audio bestanden
+        output_file: JSON lines bestand voor resultaten (wordt aangevuld)
+        analyzer: 'standalone', 'pro' of 'simple' (default: 'standalone')
+        workers: Aantal worker processen (default: aantal cores)
+        timeout: Maximale analyse tijd per track in seconden (default: 600)
+        max_memory_mb: Geheugenlimiet per worker in MB (default: 4096, 0 = geen limiet)
+        sample_rate: Sample rate voor analyse (default: die van het profiel)
+        include_waveform: Waveform opnemen bij de standalone analyzer (default: False)
+        retry_failed: Eerder mislukte tracks opnieuw proberen (default: False)
+        streaming: Standalone analyse in blokken met constant geheugen (default: False)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
+        excerpts: Standalone BPM/key eerst op fragmenten, volledige track alleen bij
+                  een te lage confidence (default: False)
+        library: Pad naar een library database; geslaagde tracks worden daar ook
+                 (per batch in één transactie) opgeslagen (default: geen)
+        decoders: Aantal decoder threads; > 0 overlapt decoderen met analyseren (default: 0)
+        queue_mb: Geheugenbudget voor gedecodeerde tracks die op een worker wachten (default: 512)
+        memory_budget_mb: Limiet voor de piek RSS per worker bij de pro analyzer; blokgroottes
+                          worden daarop gekozen (default: MUSIC_ANALYZER_MEMORY_MB of geen)
+
+    Returns:
+        Dictionary met throughput samenvatting
+    """
+    if analyzer not in ANALYZERS:
+        raise ValueError(f"Onbekende analyzer: {analyzer}")
+
+    workers = workers or os.cpu_count() or 1
+
+    all_files = find_audio_files(root)
+    done = load_done(output_file, analyzer, retry_failed)
+    todo = [path for path in all_files if path not in done]
+
+    print(f"📂 {len(all_files)} tracks gevonden, {len(all_files) - len(todo)} al geanalyseerd")
+    print(f"⚙️  {len(todo)} tracks te analyseren met {workers} workers ({analyzer})")
+
+    counts = {'ok': 0, 'error': 0, 'timeout': 0}
+    audio_seconds = 0.0
+    pipeline_stats = {}
+    start = time.time()
+
+    # Alleen het hoofdproces schrijft naar de database: één writer, transacties per batch
+    writer = None
+    if library:
+        from library_store import LibraryStore
+        writer = LibraryStore(library).writer(analyzer)
+
+    try:
+        if todo:
+            with open(output_file, 'a', encoding='utf-8') as out:
+                records = analyze_paths(todo, analyzer, workers, timeout, max_memory_mb, sample_rate,
+                                        include_waveform, streaming, profile, excerpts, decoders, queue_mb,
+                                        pipeline_stats, memory_budget_mb)
+                for i, record in enumerate(records, 1):
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    out.flush()
+                    if writer is not None and record['status'] == 'ok':
+                        writer.add(record['path'], record['result'])
+
+                    counts[record['status']] += 1
+                    audio_seconds += record.get('audio_seconds', 0.0)
+
+                    if record['status'] != 'ok':
+                        print(f"❌ {record['path']}: {record['error']}")
+                    if i % 100 == 0 or i == len(todo):
+                        rate = i / max(time.time() - start, 1e-9)
+                        print(f"   {i}/{len(todo)} klaar ({rate:.2f} tracks/s)")
+    finally:
+        # Ook bij een onderbreking: wat al klaar is staat in de database
+        if writer is not None:
+            writer.flush()
+
+    elapsed = time.time() - start
+    summary = {
+        'tracks_found': len(all_files),
+        'tracks_skipped': len(all_files) - len(todo),
+        'tracks_ok': counts['ok'],
+        'tracks_failed': counts['error'],
+        'tracks_timeout': counts['timeout'],
+        'elapsed_seconds': round(elapsed, 2),
+        'audio_hours': round(audio_seconds / 3600, 3),
+        'tracks_per_second': round(len(todo) / elapsed, 3) if elapsed > 0 else 0.0,
+        'audio_hours_per_second': round(audio_seconds / 3600 / elapsed, 4) if elapsed > 0 else 0.0,
+    }
+    if pipeline_stats:
+        summary['pipeline'] = pipeline_stats
+
+    print("\n" + "=" * 50)
+    print("📊 BATCH SAMENVATTING")
+    print("=" * 50)
+    print(f"✅ Geanalyseerd:  {summary['tracks_ok']}")
+    print(f"❌ Mislukt:       {summary['tracks_failed']} (+ {summary['tracks_timeout']} timeouts)")
+    print(f"⏭️  Overgeslagen:  {summary['tracks_skipped']}")
+    print(f"⏱️  Tijd:          {summary['elapsed_seconds']:.1f} sec")
+    print(f"🚀 Throughput:    {summary['tracks_per_second']:.2f} tracks/s, "
+          f"{summary['audio_hours_per_second']:.4f} audio-uur/s")
+    print(f"💾 Resultaten:    {output_file}")
+    if library:
+        print(f"🗄️  Library:       {library} ({writer.written} tracks)")
+    if pipeline_stats:
+        for stage, icon in (('decode', '🔧'), ('compute', '🧮')):
+            info = pipeline_stats[stage]
+            print(f"{icon} {stage.capitalize() + ':':<13} {info['items_per_second']:.2f} tracks/s "
+                  f"(capaciteit {info['capacity_per_second']:.2f}/s, bezetting {info['utilization']:.0%}, "
+                  f"{info['workers']} workers)")
+        print(f"🚧 Bottleneck:    {pipeline_stats['bottleneck']} "
+              f"(wachtrij max {pipeline_stats['max_queue_items']} tracks, {pipeline_stats['max_queue_mb']} MB)")
+    print("=" * 50)
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyseer een muziekbibliotheek parallel')
+    parser.add_argument('directory', help='Directory met audio bestanden')
+    parser.add_argument('--analyzer', choices=ANALYZERS, default='standalone')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON lines output bestand')
+    parser.add_argument('--workers', type=int, default=None, help='Aantal worker processen')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Timeout per track (sec)')
+    parser.add_argument('--max-memory-mb', type=float, default=DEFAULT_MAX_MEMORY_MB,
+                        help='Geheugenlimiet per worker in MB (0 = geen limiet)')
+    parser.add_argument('--sample-rate', type=int, default=None, help='Overschrijft de sample rate van het profiel')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=None,
+                        help='Analyse profiel (default: archival)')
+    parser.add_argument('--waveform', action='store_true', help='Waveform opnemen (standalone)')
+    parser.add_argument('--retry-failed', action='store_true', help='Mislukte tracks opnieuw proberen')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Analyse in blokken met constant geheugen (standalone)')
+    parser.add_argument('--excerpts', action='store_true',
+                        help='BPM/key op fragmenten, volledige track alleen bij lage confidence (standalone)')
+    parser.add_argument('--decoders', type=int, default=0,
+                        help='Decoder threads die vooruit decoderen (0 = geen pipeline)')
+    parser.add_argument('--queue-mb', type=float, default=DEFAULT_QUEUE_MB,
+                        help=f'Geheugenbudget voor gedecodeerde tracks in de wachtrij (default: {DEFAULT_QUEUE_MB})')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                        help='Piek RSS per worker voor de pro analyzer in MB (analyse in blokken)')
+    parser.add_argument('--library', default=None,
+                        help='Geslaagde tracks ook opslaan in deze library database (SQLite)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Geen directory: {args.directory}")
+    if args.decoders and args.streaming:
+        parser.error("--decoders kan niet samen met --streaming")
+
+    analyze_library(
+        args.directory, args.output, args.analyzer, args.workers, args.timeout,
+        args.max_memory_mb, args.sample_rate, args.waveform, args.retry_failed, args.streaming,
+        args.profile, args.excerpts, args.library, args.decoders, args.queue_mb, args.memory_budget_mb
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,456 @@
+"""
+Benchmark - Reproduceerbare snelheid- en nauwkeurigheidstest met synthetische audio
+- Genereert lokaal een testcorpus: click tracks op bekende BPM's, akkoordprogressies
+  in bekende toonsoorten en lange bestanden van verschillende lengte
+- Meet per analyzer (pro, standalone, simple) de tijd per stap, de totale tijd,
+  de piek allocatie (tracemalloc) en de piek RSS van het proces
+- Berekent BPM en key nauwkeurigheid (exact en MIREX gewogen)
+- Schrijft een JSON rapport en vergelijkt optioneel met een baseline rapport;
+  bij regressies is de exit code 1 (bruikbaar vóór een deploy)
+
+Gebruik:
+    python benchmark.py [--output benchmark_report.json] [--baseline baseline.json]
+                        [--analyzers pro,standalone,simple] [--quick] [--profile archival]
+                        [--memory-mb 512]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from key_engine import KEYS
+from memory_budget import peak_rss_mb, reset_peak_rss
+
+
+REPORT_VERSION = 1
+
+ANALYZERS = ('pro', 'standalone', 'simple')
+
+DEFAULT_CORPUS_DIR = 'benchmark_audio'
+DEFAULT_OUTPUT = 'benchmark_report.json'
+
+CORPUS_SR = 44100
+SEED = 1234
+
+# Testcorpus: BPM cases (alleen clicks), key cases (alleen akkoorden) en lange bestanden (beide)
+BPM_CASES = (80, 100, 120, 128, 140, 174)
+KEY_CASES = (('C', 'major'), ('G', 'major'), ('D#', 'major'), ('A', 'minor'), ('E', 'minor'), ('F#', 'minor'))
+LONG_CASES = ((126, 'D', 'major', 120), (95, 'B', 'minor', 300), (132, 'F', 'major', 600))
+CASE_SECONDS = 30
+
+# Toegestane verslechtering ten opzichte van de baseline
+DEFAULT_MAX_TIME_REGRESSION = 0.25
+DEFAULT_MAX_MEMORY_REGRESSION = 0.25
+DEFAULT_MAX_ACCURACY_DROP = 0.0
+
+
+# ---------------------------------------------------------------------------
+# Synthetische audio
+# ---------------------------------------------------------------------------
+
+def _click_track(bpm, n_samples, sr, rng):
+    """Clicks op elke beat, accent op de eerste tel van elke maat"""
+    y = np.zeros(n_samples, dtype=np.float32)
+    click_len = int(0.03 * sr)
+    t = np.arange(click_len) / sr
+    click = (np.exp(-t * 150) * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+
+    beat_samples = 60.0 / bpm * sr
+    for i, start in enumerate(np.arange(0, n_samples, beat_samples).astype(np.int64)):
+        n = min(click_len, n_samples - start)
+        gain = 1.0 if i % 4 == 0 else 0.6
+        y[start:start + n] += gain * click[:n]
+
+    # Beetje ruis, zodat het signaal niet perfect synthetisch is
+    y += rng.normal(0, 0.003, n_samples).astype(np.float32)
+    return y
+
+
+def _chord_progression(key, mode, n_samples, sr, chord_seconds=2.0):
+    """I-IV-V-I (majeur) of i-iv-v-i (minor) met harmonische boventonen"""
+    tonic = KEYS.index(key)
+    third = 3 if mode == 'minor' else 4
+    progression = [0, 5, 7, 0]
+
+    y = np.zeros(n_samples, dtype=np.float32)
+    chord_len = int(chord_seconds * sr)
+    fade = np.minimum(1.0, np.arange(chord_len) / (0.02 * sr))
+    fade = (fade * fade[::-1]).astype(np.float32)
+    t = np.arange(chord_len) / sr
+
+    chords = []
+    for degree in progression:
+        root = tonic + degree
+        chord_third = third if degree != 7 else 4  # dominant is altijd majeur
+        tones = np.zeros(chord_len, dtype=np.float64)
+        for semitone in (root, root + chord_third, root + 7):
+            freq = 261.63 * 2 ** ((semitone % 12) / 12)
+            for harmonic, gain in ((1, 1.0), (2, 0.5), (3, 0.25)):
+                tones += gain * np.sin(2 * np.pi * freq * harmonic * t)
+        chords.append((tones / 6).astype(np.float32) * fade)
+
+    for i, start in enumerate(range(0, n_samples, chord_len)):
+        n = min(chord_len, n_samples - start)
+        y[start:start + n] = chords[i % len(chords)][:n]
+    return y
+
+
+def generate_corpus(corpus_dir=DEFAULT_CORPUS_DIR, quick=False):
+    """
+    Genereer het testcorpus (bestaande bestanden worden hergebruikt)
+
+    Args:
+        corpus_dir: Directory voor de WAV bestanden
+        quick: Lange bestanden overslaan (default: False)
+
+    Returns:
+        Lijst met cases: name, path, bpm, key, mode, duration (None = niet van toepassing)
+    """
+    import soundfile as sf
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = np.random.default_rng(SEED)
+    cases = []
+
+    def add(name, bpm, key, mode, seconds):
+        path = os.path.join(corpus_dir, f"{name}.wav")
+        cases.append({'name': name, 'path': path, 'bpm': bpm, 'key': key, 'mode': mode,
+                      'duration': float(seconds)})
+        if os.path.exists(path):
+            return
+        n = int(seconds * CORPUS_SR)
+        y = np.zeros(n, dtype=np.float32)
+        if bpm:
+            y += _click_track(bpm, n, CORPUS_SR, rng)
+        if key:
+            y += 0.5 * _chord_progression(key, mode, n, CORPUS_SR)
+        y *= 0.8 / max(float(np.abs(y).max()), 1e-9)
+        sf.write(path, y, CORPUS_SR)
+
+    for bpm in BPM_CASES:
+        add(f"click_{bpm}bpm", bpm, None, None, CASE_SECONDS)
+    for key, mode in KEY_CASES:
+        add(f"chords_{key.replace('#', 'sharp')}_{mode}", None, key, mode, CASE_SECONDS)
+    if not quick:
+        for bpm, key, mode, seconds in LONG_CASES:
+            add(f"long_{seconds}s", bpm, key, mode, seconds)
+
+    return cases
+
+
+# ---------------------------------------------------------------------------
+# Nauwkeurigheid
+# ---------------------------------------------------------------------------
+
+def bpm_matches(detected, expected, tolerance=1.0):
+    """BPM binnen de tolerantie (de analyzers ronden af op hele BPM's)"""
+    return abs(detected - expected) <= tolerance
+
+
+def bpm_matches_octave(detected, expected, tolerance=0.02):
+    """BPM gelijk aan het verwachte tempo, de helft of het dubbele (binnen 2%)"""
+    return any(abs(detected - expected * factor) <= tolerance * expected * factor for factor in (0.5, 1, 2))
+
+
+def key_score(key, mode, expected_key, expected_mode):
+    """
+    MIREX key score: 1.0 exact, 0.5 kwint, 0.3 relatief, 0.2 parallel, anders 0
+    """
+    if key not in KEYS or expected_key not in KEYS:
+        return 0.0
+    interval = (KEYS.index(key) - KEYS.index(expected_key)) % 12
+
+    if mode == expected_mode:
+        if interval == 0:
+            return 1.0
+        if interval in (5, 7):
+            return 0.5
+        return 0.0
+    if interval == 0:
+        return 0.2
+    # Relatief: a minor ↔ C major
+    if (expected_mode == 'major' and interval == 9) or (expected_mode == 'minor' and interval == 3):
+        return 0.3
+    return 0.0
+
+
+# ---------------------------------------------------------------------------
+# Analyzers met tijd per stap
+# ---------------------------------------------------------------------------
+
+def _run_analyzer(analyzer, path, profile, memory_mb=None):
+    """
+    Draai de echte analyzer met tijd per stap (StageRecorder, zonder tracemalloc)
+
+    Args:
+        memory_mb: Geheugenbudget voor de pro analyzer (None = geen budget)
+
+    Returns:
+        bpm, key, mode zoals de analyzer ze rapporteert, en de wall time per stap
+    """
+    if analyzer == 'pro':
+        from music_analyzer_pro import analyze_track_pro
+        result = analyze_track_pro(path, visualize=False, export=False, use_cache=False, profile=profile,
+                                   instrument=True, memory_mb=memory_mb)
+        key, mode = result['key'], result['mode']
+    elif analyzer == 'simple':
+        from music_analyzer_simple import analyze_track_simple
+        result = analyze_track_simple(path, use_cache=False, profile=profile, instrument=True)
+        key, mode = result['key'].split()
+    else:
+        from music_analyzer_standalone import analyze_audio
+        result = analyze_audio(path, use_cache=False, profile=profile, instrument=True)
+        key, mode = result['key'], result['mode']
+
+    stages = {name: metrics['wall_seconds'] for name, metrics in result['stage_metrics'].items()}
+    return result['bpm'], key, mode, stages
+
+
+def benchmark_case(analyzer, case, profile=None, memory_mb=None):
+    """
+    Benchmark één analyzer op één case
+
+    De totale tijd, de tijd per stap (stage_metrics van dezelfde run) en de piek RSS
+    worden zonder tracemalloc gemeten; de piek allocatie in een aparte run met
+    tracemalloc (dat vertraagt de analyse).
+    De piek RSS is die van het hele proces (inclusief imports), dus direct
+    vergelijkbaar met een geheugenlimiet per worker.
+
+    Args:
+        memory_mb: Geheugenbudget voor de pro analyzer (None = geen budget)
+
+    Returns:
+        Dictionary met tijden, piek allocatie, piek RSS, gedetecteerde waarden en scores
+    """
+    # De analyzers printen voortgang; die is hier niet relevant
+    with contextlib.redirect_stdout(io.StringIO()):
+        rss_reset = reset_peak_rss()
+        start = time.perf_counter()
+        bpm, key, mode, stages = _run_analyzer(analyzer, case['path'], profile, memory_mb)
+        wall = time.perf_counter() - start
+        peak_rss = peak_rss_mb()
+
+        tracemalloc.start()
+        try:
+            _run_analyzer(analyzer, case['path'], profile, memory_mb)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    record = {
+        'analyzer': analyzer,
+        'case': case['name'],
+        'duration': case['duration'],
+        'wall_seconds': round(wall, 4),
+        'realtime_factor': round(case['duration'] / wall, 2) if wall > 0 else None,
+        'stages': stages,
+        'peak_alloc_mb': round(peak / 1024 / 1024, 1),
+        # Zonder reset (geen /proc) is dit de piek sinds de start van het proces
+        'peak_rss_mb': round(peak_rss, 1) if rss_reset else None,
+        'bpm': bpm,
+        'key': key,
+        'mode': mode,
+    }
+    if case['bpm']:
+        record['expected_bpm'] = case['bpm']
+        record['bpm_ok'] = bpm_matches(bpm, case['bpm'])
+        record['bpm_octave_ok'] = bpm_matches_octave(bpm, case['bpm'])
+    if case['key']:
+        record['expected_key'] = f"{case['key']} {case['mode']}"
+        record['key_score'] = key_score(key, mode, case['key'], case['mode'])
+        record['key_ok'] = record['key_score'] == 1.0
+    return record
+
+
+def _mean(values):
+    return round(float(np.mean(values)), 4) if values else None
+
+
+def summarize(results):
+    """
+    Returns:
+        Dictionary per analyzer met nauwkeurigheid, totale tijd en piek allocatie
+    """
+    summary = {}
+    for analyzer in sorted({r['analyzer'] for r in results}):
+        rows = [r for r in results if r['analyzer'] == analyzer]
+        bpm_rows = [r for r in rows if 'bpm_ok' in r]
+        key_rows = [r for r in rows if 'key_ok' in r]
+        summary[analyzer] = {
+            'cases': len(rows),
+            'bpm_accuracy': _mean([r['bpm_ok'] for r in bpm_rows]),
+            'bpm_accuracy_octave': _mean([r['bpm_octave_ok'] for r in bpm_rows]),
+            'key_accuracy': _mean([r['key_ok'] for r in key_rows]),
+            'key_mirex_score': _mean([r['key_score'] for r in key_rows]),
+            'total_seconds': round(sum(r['wall_seconds'] for r in rows), 3),
+            'audio_seconds': round(sum(r['duration'] for r in rows), 1),
+            'max_peak_alloc_mb': max(r['peak_alloc_mb'] for r in rows),
+            'max_peak_rss_mb': max((r['peak_rss_mb'] for r in rows if r.get('peak_rss_mb') is not None),
+                                   default=None),
+        }
+    return summary
+
+
+def compare_reports(report, baseline, max_time_regression=DEFAULT_MAX_TIME_REGRESSION,
+                    max_memory_regression=DEFAULT_MAX_MEMORY_REGRESSION,
+                    max_accuracy_drop=DEFAULT_MAX_ACCURACY_DROP):
+    """
+    Vergelijk een rapport met een baseline
+
+    Returns:
+        Lijst met regressies (strings); leeg als alles binnen de marges valt
+    """
+    regressions = []
+    for analyzer, current in report['summary'].items():
+        previous = baseline.get('summary', {}).get(analyzer)
+        if not previous:
+            continue
+
+        # Tijd alleen vergelijken als hetzelfde corpus gedraaid is
+        if previous['audio_seconds'] == current['audio_seconds']:
+            if current['total_seconds'] > previous['total_seconds'] * (1 + max_time_regression):
+                regressions.append(
+                    f"{analyzer}: tijd {previous['total_seconds']:.2f}s → {current['total_seconds']:.2f}s"
+                )
+        if current['max_peak_alloc_mb'] > previous['max_peak_alloc_mb'] * (1 + max_memory_regression):
+            regressions.append(
+                f"{analyzer}: piek allocatie {previous['max_peak_alloc_mb']} MB → {current['max_peak_alloc_mb']} MB"
+            )
+        if current.get('max_peak_rss_mb') and previous.get('max_peak_rss_mb') and \
+                current['max_peak_rss_mb'] > previous['max_peak_rss_mb'] * (1 + max_memory_regression):
+            regressions.append(
+                f"{analyzer}: piek RSS {previous['max_peak_rss_mb']} MB → {current['max_peak_rss_mb']} MB"
+            )
+        for metric in ('bpm_accuracy', 'bpm_accuracy_octave', 'key_accuracy', 'key_mirex_score'):
+            if current[metric] is None or previous.get(metric) is None:
+                continue
+            if current[metric] < previous[metric] - max_accuracy_drop:
+                regressions.append(f"{analyzer}: {metric} {previous[metric]:.3f} → {current[metric]:.3f}")
+    return regressions
+
+
+def _environment():
+    import librosa
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+    }
+
+
+def run_benchmark(analyzers=ANALYZERS, corpus_dir=DEFAULT_CORPUS_DIR, quick=False, profile=None, memory_mb=None):
+    """
+    Draai de volledige benchmark
+
+    Args:
+        analyzers: Te testen analyzers (default: alle drie)
+        corpus_dir: Directory voor het testcorpus
+        quick: Lange bestanden overslaan (default: False)
+        profile: Analyse profiel (default: archival)
+        memory_mb: Geheugenbudget voor de pro analyzer in MB (default: geen)
+
+    Returns:
+        Rapport dictionary (JSON serialiseerbaar)
+    """
+    cases = generate_corpus(corpus_dir, quick)
+    results = []
+
+    for analyzer in analyzers:
+        # Warm-up: imports en numba JIT compilatie niet meetellen in de eerste case
+        with contextlib.redirect_stdout(io.StringIO()):
+            _run_analyzer(analyzer, cases[0]['path'], profile, memory_mb)
+
+        for case in cases:
+            record = benchmark_case(analyzer, case, profile, memory_mb)
+            results.append(record)
+
+            status = []
+            if 'bpm_ok' in record:
+                status.append(f"BPM {record['bpm']} ({'✅' if record['bpm_ok'] else '❌'} {case['bpm']})")
+            if 'key_ok' in record:
+                status.append(f"key {record['key']} {record['mode']} "
+                              f"({'✅' if record['key_ok'] else '❌'} {record['expected_key']})")
+            rss = f"{record['peak_rss_mb']:7.0f} MB RSS" if record['peak_rss_mb'] is not None else ''
+            print(f"  {analyzer:<10} {case['name']:<24} {record['wall_seconds']:7.2f}s "
+                  f"{record['peak_alloc_mb']:7.1f} MB {rss}  {', '.join(status)}")
+
+    from analysis_profiles import get_profile
+    return {
+        'version': REPORT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'profile': get_profile(profile)['name'],
+        'memory_mb': memory_mb,
+        'cases': [{k: v for k, v in case.items() if k != 'path'} for case in cases],
+        'results': results,
+        'summary': summarize(results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark en nauwkeurigheidstest met synthetische audio')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON rapport')
+    parser.add_argument('--baseline', default=None, help='Baseline rapport om mee te vergelijken')
+    parser.add_argument('--analyzers', default=','.join(ANALYZERS), help='Komma gescheiden lijst')
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Directory voor het testcorpus')
+    parser.add_argument('--quick', action='store_true', help='Lange bestanden overslaan')
+    parser.add_argument('--profile', default=None, help='Analyse profiel (default: archival)')
+    parser.add_argument('--memory-mb', type=float, default=None,
+                        help='Geheugenbudget (piek RSS) voor de pro analyzer in MB')
+    parser.add_argument('--max-time-regression', type=float, default=DEFAULT_MAX_TIME_REGRESSION)
+    parser.add_argument('--max-memory-regression', type=float, default=DEFAULT_MAX_MEMORY_REGRESSION)
+    parser.add_argument('--max-accuracy-drop', type=float, default=DEFAULT_MAX_ACCURACY_DROP)
+    args = parser.parse_args(argv)
+
+    analyzers = [a.strip() for a in args.analyzers.split(',') if a.strip()]
+    unknown = set(analyzers) - set(ANALYZERS)
+    if unknown:
+        parser.error(f"Onbekende analyzer(s): {', '.join(sorted(unknown))}")
+
+    print("=" * 50)
+    print("⏱️  MUSIC ANALYZER BENCHMARK")
+    print("=" * 50)
+
+    report = run_benchmark(analyzers, args.corpus_dir, args.quick, args.profile, args.memory_mb)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("\n" + "=" * 50)
+    print("📊 SAMENVATTING")
+    print("=" * 50)
+    for analyzer, s in report['summary'].items():
+        print(f"{analyzer}: BPM {s['bpm_accuracy']:.0%} (octaaf {s['bpm_accuracy_octave']:.0%}), "
+              f"key {s['key_accuracy']:.0%} (MIREX {s['key_mirex_score']:.2f}), "
+              f"{s['total_seconds']:.1f}s, piek {s['max_peak_alloc_mb']} MB"
+              + (f" ({s['max_peak_rss_mb']:.0f} MB RSS)" if s['max_peak_rss_mb'] else ''))
+    print(f"💾 Rapport: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(
+            report, baseline, args.max_time_regression, args.max_memory_regression, args.max_accuracy_drop
+        )
+        if regressions:
+            print("\n❌ Regressies ten opzichte van de baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("\n✅ Geen regressies ten opzichte van de baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
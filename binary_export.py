@@ -0,0 +1,260 @@
+"""
+Binary Export - Compact binair formaat voor analyse resultaten
+- Arrays (energie, peaks, chroma, ...) als ruwe float16/float32 data
+- Kleine header met per array dtype, shape en offset; arrays uitgelijnd op 64 bytes
+- Laden via memory mapping: alleen de gebruikte stukken worden van schijf gelezen
+- Scalaire metadata (BPM, key, duur, ...) in een kleine JSON sidecar,
+  of optioneel in de header zelf (API responses)
+
+Bestandsformaat (.bin):
+    magic (4 bytes 'MANB') | versie (uint16) | header lengte (uint32) | JSON header | arrays
+
+Gebruik:
+    from binary_export import export_binary, load_binary
+    bin_file, json_file = export_binary(result, 'track_pro_analysis')
+    result = load_binary('track_pro_analysis.json')  # arrays als memory-mapped numpy arrays
+
+    data, _ = to_bytes(result, embed_metadata=True)  # Eén op zichzelf staand blok (API)
+    result = from_bytes(data)
+"""
+
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+
+MAGIC = b'MANB'
+FORMAT_VERSION = 1
+
+_PREFIX = struct.Struct('<4sHI')
+_ALIGNMENT = 64
+
+# Velden die als binaire array worden opgeslagen, met het opslag dtype
+# (geneste velden met een punt als scheiding). Waarden tussen -1 en 1
+# passen in float16; tijden in seconden hebben float32 nodig. De waveform peak
+# pyramide en het beat grid (beat_energy, bars) zijn al compact (base64 int8/uint8)
+# en blijven in de metadata.
+ARRAY_FIELDS = {
+    'energy': np.float16,
+    'peaks': np.float32,
+    'peak_heights': np.float16,
+    'chroma_vector': np.float32,
+    'beats': np.float32,
+}
+
+
+def _get_path(data, path):
+    for part in path.split('.'):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _set_path(data, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _pad(length):
+    return (-length) % _ALIGNMENT
+
+
+def _split_result(result):
+    """
+    Splits een resultaat in metadata (zonder array velden) en arrays
+
+    Alleen de dictionaries op het pad naar een array worden gekopieerd;
+    het originele resultaat blijft ongewijzigd.
+
+    Returns:
+        metadata: Dictionary zonder array velden
+        arrays: Dictionary pad -> numpy array in opslag dtype
+    """
+    metadata = dict(result)
+    arrays = {}
+    for path, dtype in ARRAY_FIELDS.items():
+        value = _get_path(result, path)
+        if value is None:
+            continue
+        arrays[path] = np.ascontiguousarray(value, dtype=dtype)
+
+        parent = metadata
+        parts = path.split('.')
+        for part in parts[:-1]:
+            parent[part] = dict(parent[part])
+            parent = parent[part]
+        del parent[parts[-1]]
+    return metadata, arrays
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Niet JSON serialiseerbaar: {type(value).__name__}")
+
+
+def _encode(arrays, metadata=None):
+    """
+    Returns:
+        Header bytes (prefix, JSON header en padding tot de eerste array)
+    """
+    # Offsets hangen af van de header lengte en omgekeerd; herhalen tot het stabiel is
+    table = {path: {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': 0}
+             for path, arr in arrays.items()}
+
+    while True:
+        header = json.dumps({'arrays': table, 'metadata': metadata}, ensure_ascii=False,
+                            default=_json_default).encode('utf-8')
+        offset = _PREFIX.size + len(header)
+        offset += _pad(offset)
+
+        new_table = {}
+        for path, arr in arrays.items():
+            new_table[path] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+            offset += arr.nbytes + _pad(arr.nbytes)
+
+        if new_table == table:
+            break
+        table = new_table
+
+    prefix = _PREFIX.pack(MAGIC, FORMAT_VERSION, len(header))
+    return prefix + header + b'\0' * _pad(_PREFIX.size + len(header))
+
+
+def to_bytes(result, embed_metadata=False):
+    """
+    Serialiseer een resultaat naar het binaire formaat
+
+    Args:
+        result: Analyse resultaat (pro of standalone)
+        embed_metadata: Metadata ook in de header opnemen, zodat de bytes op zichzelf
+                        staan (bijv. als API response) (default: False)
+
+    Returns:
+        data: Binaire data (bytes)
+        metadata: Resultaat zonder arrays (voor de JSON sidecar)
+    """
+    metadata, arrays = _split_result(result)
+    header = _encode(arrays, metadata if embed_metadata else None)
+
+    chunks = [header]
+    for arr in arrays.values():
+        chunks.append(arr.tobytes())
+        chunks.append(b'\0' * _pad(arr.nbytes))
+    return b''.join(chunks), metadata
+
+
+def _parse_header(prefix, read):
+    """Controleer de prefix en lees de JSON header (read(n) levert de volgende n bytes)"""
+    magic, version, header_len = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("Geen Music Analyzer binair bestand")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Binair formaat versie {version} wordt niet ondersteund")
+    return json.loads(read(header_len))
+
+
+def _count(info):
+    return int(np.prod(info['shape'], dtype=np.int64))
+
+
+def from_bytes(data):
+    """
+    Lees een resultaat uit binaire data (zonder te kopiëren)
+
+    Args:
+        data: bytes of memoryview uit to_bytes(result, embed_metadata=True)
+
+    Returns:
+        Resultaat dictionary met read-only numpy arrays op de plaats van de array velden
+    """
+    buffer = memoryview(data)
+    header = _parse_header(
+        buffer[:_PREFIX.size], lambda n: bytes(buffer[_PREFIX.size:_PREFIX.size + n])
+    )
+
+    result = header.get('metadata') or {}
+    for path, info in header['arrays'].items():
+        arr = np.frombuffer(buffer, dtype=info['dtype'], count=_count(info), offset=info['offset'])
+        _set_path(result, path, arr.reshape(info['shape']))
+    return result
+
+
+def read_arrays(bin_file, mmap=True):
+    """
+    Lees de arrays uit een .bin bestand
+
+    Args:
+        bin_file: Pad naar .bin bestand
+        mmap: Bestand memory-mappen in plaats van volledig inlezen (default: True)
+
+    Returns:
+        Dictionary pad -> numpy array
+    """
+    with open(bin_file, 'rb') as f:
+        table = _parse_header(f.read(_PREFIX.size), f.read)['arrays']
+
+        arrays = {}
+        for path, info in table.items():
+            if not mmap or _count(info) == 0:
+                # Lege arrays kunnen niet gemapt worden
+                f.seek(info['offset'])
+                arr = np.fromfile(f, dtype=info['dtype'], count=_count(info))
+                arrays[path] = arr.reshape(info['shape'])
+            else:
+                arrays[path] = np.memmap(bin_file, dtype=info['dtype'], mode='r',
+                                         offset=info['offset'], shape=tuple(info['shape']))
+    return arrays
+
+
+def export_binary(result, output_stem):
+    """
+    Exporteer een resultaat als .bin bestand met JSON sidecar
+
+    Args:
+        result: Analyse resultaat (pro of standalone)
+        output_stem: Pad zonder extensie (bijv. 'track_pro_analysis')
+
+    Returns:
+        bin_file: Pad naar het binaire bestand
+        json_file: Pad naar de JSON sidecar met metadata
+    """
+    bin_file = f"{output_stem}.bin"
+    json_file = f"{output_stem}.json"
+
+    data, metadata = to_bytes(result)
+    with open(bin_file, 'wb') as f:
+        f.write(data)
+
+    metadata['binary_file'] = Path(bin_file).name
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False, default=_json_default)
+
+    return bin_file, json_file
+
+
+def load_binary(json_file, mmap=True):
+    """
+    Laad een resultaat uit een JSON sidecar en het bijbehorende .bin bestand
+
+    Args:
+        json_file: Pad naar de JSON sidecar
+        mmap: Arrays memory-mappen (default: True)
+
+    Returns:
+        Resultaat dictionary met numpy arrays op de plaats van de array velden
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+
+    bin_file = Path(json_file).parent / result.pop('binary_file')
+    for path, arr in read_arrays(bin_file, mmap=mmap).items():
+        _set_path(result, path, arr)
+    return result
@@ -0,0 +1,289 @@
+"""
+Cold Start - Snelle start van de serverless functie (api/index.py)
+- Numba cache directory die tijdens de deploy gevuld kan worden: de JIT compilatie
+  van librosa (beat tracking, peak picking, ...) gebeurt dan niet bij elke cold start
+- warm_up(): importeer de analyzer en analyseer een kort synthetisch signaal,
+  zodat alle numba functies gecompileerd (of uit de cache geladen) zijn
+- Startup benchmark: import tijd, eerste en tweede request in verse processen,
+  met een lege en een gevulde numba cache
+
+Deze module importeert zelf niets zwaars; configure_numba_cache() moet vóór
+de eerste import van librosa/numba aangeroepen worden.
+
+Gebruik:
+    python cold_start.py --prebuild              # Vul numba_cache/ (deploy stap)
+    python cold_start.py --benchmark [--max-import-seconds 0.5] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+# Tijdens de deploy gevulde cache (meegeleverd in de bundle, read-only op Vercel)
+PREBUILT_NUMBA_CACHE = PROJECT_DIR / 'numba_cache'
+
+# Schrijfbare cache tijdens runtime (alleen /tmp is schrijfbaar op Vercel)
+RUNTIME_NUMBA_CACHE = Path(tempfile.gettempdir()) / 'music_analyzer_numba_cache'
+
+WARMUP_SECONDS = 4.0
+WARMUP_SR = 22050
+
+DEFAULT_RUNS = 3
+DEFAULT_MAX_IMPORT_SECONDS = 0.5
+
+
+def configure_numba_cache(cache_dir=None, prebuilt_dir=PREBUILT_NUMBA_CACHE):
+    """
+    Zet NUMBA_CACHE_DIR (vóór de eerste import van numba)
+
+    Numba moet in de cache directory kunnen schrijven. Een meegeleverde (read-only)
+    cache wordt daarom bij de eerste cold start naar de runtime directory gekopieerd.
+    Een al gezette NUMBA_CACHE_DIR wordt gerespecteerd.
+
+    Args:
+        cache_dir: Schrijfbare cache directory (default: <tmp>/music_analyzer_numba_cache)
+        prebuilt_dir: Tijdens de deploy gevulde cache (default: numba_cache/ in het project)
+
+    Returns:
+        Pad van de gebruikte cache directory
+    """
+    if os.environ.get('NUMBA_CACHE_DIR'):
+        return os.environ['NUMBA_CACHE_DIR']
+
+    cache_dir = Path(cache_dir or RUNTIME_NUMBA_CACHE)
+    if not cache_dir.exists() and prebuilt_dir and Path(prebuilt_dir).is_dir():
+        try:
+            shutil.copytree(prebuilt_dir, cache_dir)
+        except OSError:
+            pass  # Geen kopie: numba compileert en vult de runtime cache zelf
+
+    os.environ['NUMBA_CACHE_DIR'] = str(cache_dir)
+    return str(cache_dir)
+
+
+def warmup_signal(sr=WARMUP_SR, seconds=WARMUP_SECONDS):
+    """Clicks op 120 BPM plus een A mineur akkoord (raakt beat tracking en chroma)"""
+    import numpy as np
+
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    y = 0.2 * sum(np.sin(2 * np.pi * freq * t) for freq in (220.0, 261.63, 329.63))
+    click_t = np.arange(int(0.03 * sr)) / sr
+    click = np.exp(-click_t * 150) * np.sin(2 * np.pi * 1000 * click_t)
+    for start in range(0, n - len(click), int(0.5 * sr)):
+        y[start:start + len(click)] += click
+    return (0.8 * y / np.abs(y).max()).astype(np.float32)
+
+
+def warm_up(profile=None):
+    """
+    Importeer de simple analyzer en analyseer een kort synthetisch signaal
+
+    Na de warm-up zijn alle numba functies gecompileerd en (met cache) op schijf
+    opgeslagen; ook decoderen en resamplen zijn dan al een keer uitgevoerd.
+
+    Args:
+        profile: Analyse profiel (default: dat van de omgeving)
+
+    Returns:
+        Dictionary met import_seconds, warmup_seconds en numba_cache_dir
+    """
+    start = time.perf_counter()
+    from music_analyzer_simple import analyze_track_simple
+    import soundfile as sf
+    imported = time.perf_counter()
+
+    fd, path = tempfile.mkstemp(suffix='.wav', prefix='warmup_')
+    os.close(fd)
+    try:
+        sf.write(path, warmup_signal(), WARMUP_SR)
+        analyze_track_simple(path, use_cache=False, profile=profile)
+    finally:
+        os.remove(path)
+
+    return {
+        'import_seconds': round(imported - start, 4),
+        'warmup_seconds': round(time.perf_counter() - imported, 4),
+        'numba_cache_dir': os.environ.get('NUMBA_CACHE_DIR'),
+    }
+
+
+def prebuild(cache_dir=PREBUILT_NUMBA_CACHE, profile=None):
+    """
+    Vul een numba cache directory voor de deploy bundle
+
+    Numba herkent een cache entry aan het pad en de wijzigingstijd van het
+    bronbestand; draai de prebuild daarom in dezelfde omgeving (Python, librosa,
+    numba en installatie pad) als de functie zelf, bijvoorbeeld in de build stap.
+
+    Args:
+        cache_dir: Doel directory (default: numba_cache/ in het project)
+        profile: Analyse profiel voor de warm-up
+
+    Returns:
+        Dictionary zoals warm_up(), plus het aantal cache bestanden
+    """
+    if 'numba' in sys.modules:
+        raise RuntimeError('prebuild moet vóór de eerste import van numba/librosa draaien')
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ['NUMBA_CACHE_DIR'] = str(cache_dir)
+    timings = warm_up(profile)
+    timings['cache_files'] = sum(len(files) for _, _, files in os.walk(cache_dir))
+    return timings
+
+
+# ---------------------------------------------------------------------------
+# Startup benchmark
+# ---------------------------------------------------------------------------
+
+# Draait in een vers proces: timing begint vóór de import van api/index.py
+_CHILD_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {project!r})
+from api.index import handler
+imported = time.perf_counter()
+
+handler({{'method': 'GET', 'path': '/'}})
+index_page = time.perf_counter()
+
+with open({body_path!r}, 'rb') as f:
+    body = f.read()
+request = {{'method': 'POST', 'path': '/upload', 'body': body,
+            'headers': {{'content-type': 'multipart/form-data; boundary={boundary}'}}}}
+response = handler(request)
+first = time.perf_counter()
+handler(request)
+second = time.perf_counter()
+
+print(json.dumps({{
+    'status': response['statusCode'],
+    'import_seconds': imported - start,
+    'index_seconds': index_page - imported,
+    'first_request_seconds': first - index_page,
+    'second_request_seconds': second - first,
+}}))
+"""
+
+_BOUNDARY = 'coldstartbenchmark'
+
+
+def _upload_body(path):
+    """Multipart body met een synthetische WAV van WARMUP_SECONDS"""
+    import io
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, warmup_signal(), WARMUP_SR, format='WAV')
+    with open(path, 'wb') as f:
+        f.write(f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="startup.wav"\r\nContent-Type: audio/wav\r\n\r\n'.encode())
+        f.write(buffer.getvalue())
+        f.write(f'\r\n--{_BOUNDARY}--\r\n'.encode())
+
+
+def _run_child(body_path, env):
+    start = time.perf_counter()
+    script = _CHILD_SCRIPT.format(project=str(PROJECT_DIR), body_path=body_path, boundary=_BOUNDARY)
+    completed = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True)
+    process_seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup meting mislukt:\n{completed.stderr.strip()}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = process_seconds
+    return result
+
+
+def benchmark_startup(runs=DEFAULT_RUNS):
+    """
+    Meet de cold start van api/index.py in verse processen
+
+    Twee scenario's: 'cold_cache' (lege numba cache, zoals zonder prebuild) en
+    'warm_cache' (cache al gevuld, zoals met een prebuilt numba_cache/). De
+    analyse cache staat steeds uit, zodat elke request echt analyseert.
+
+    Args:
+        runs: Aantal processen per scenario (mediaan wordt gerapporteerd)
+
+    Returns:
+        Dictionary scenario -> mediaan van import_seconds, index_seconds,
+        first_request_seconds, second_request_seconds en process_seconds
+    """
+    report = {}
+    with tempfile.TemporaryDirectory(prefix='cold_start_') as tmp:
+        body_path = os.path.join(tmp, 'upload.bin')
+        _upload_body(body_path)
+        warm_cache = os.path.join(tmp, 'numba_warm')
+
+        for scenario in ('cold_cache', 'warm_cache'):
+            samples = []
+            for run in range(runs):
+                cache_dir = warm_cache if scenario == 'warm_cache' else os.path.join(tmp, f'numba_cold_{run}')
+                env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir, MUSIC_ANALYZER_CACHE='0')
+                samples.append(_run_child(body_path, env))
+                if scenario == 'cold_cache' and run == 0:
+                    shutil.copytree(cache_dir, warm_cache)
+
+            report[scenario] = {
+                key: round(statistics.median(sample[key] for sample in samples), 4)
+                for key in samples[0] if key != 'status'
+            }
+            report[scenario]['status'] = samples[-1]['status']
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Numba cache prebuild, warm-up en startup benchmark')
+    parser.add_argument('--prebuild', nargs='?', const=str(PREBUILT_NUMBA_CACHE), default=None,
+                        metavar='DIR', help='Vul een numba cache directory (default: numba_cache/)')
+    parser.add_argument('--benchmark', action='store_true', help='Meet de cold start in verse processen')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Processen per scenario')
+    parser.add_argument('--max-import-seconds', type=float, default=None,
+                        help='Exit code 1 als de import van api/index.py langer duurt')
+    parser.add_argument('--output', default=None, help='Benchmark resultaten als JSON')
+    parser.add_argument('--profile', default=None, help='Analyse profiel voor de warm-up')
+    args = parser.parse_args(argv)
+
+    if args.prebuild:
+        timings = prebuild(args.prebuild, args.profile)
+        print(f"🔥 Numba cache gevuld: {args.prebuild} ({timings['cache_files']} bestanden)")
+        print(f"   Import: {timings['import_seconds']:.2f}s, warm-up: {timings['warmup_seconds']:.2f}s")
+
+    if not args.benchmark:
+        if not args.prebuild:
+            parser.print_help()
+        return 0
+
+    print("⏱️  Cold start meten...")
+    report = benchmark_startup(max(1, args.runs))
+    for scenario, timings in report.items():
+        print(f"{scenario}: import {timings['import_seconds']:.3f}s, index {timings['index_seconds']:.3f}s, "
+              f"eerste request {timings['first_request_seconds']:.2f}s, "
+              f"tweede {timings['second_request_seconds']:.2f}s (status {timings['status']})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Resultaten: {args.output}")
+
+    if args.max_import_seconds is not None:
+        slowest = max(timings['import_seconds'] for timings in report.values())
+        if slowest > args.max_import_seconds:
+            print(f"❌ Import duurt {slowest:.3f}s (max {args.max_import_seconds}s)")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
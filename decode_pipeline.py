@@ -0,0 +1,434 @@
+"""
+Decode Pipeline - Decoderen en analyseren overlappen in plaats van na elkaar
+- Decoder threads (I/O en ffmpeg/libsndfile geven de GIL vrij) lezen en decoderen tracks
+- Gedecodeerde PCM gaat via shared memory naar de compute processen (geen pickle kopie)
+- Een begrensde wachtrij op basis van een geheugenbudget: decoders wachten als de
+  compute kant achterloopt, zodat het geheugen niet onbegrensd groeit
+- Tellers per stap (bezette tijd, tracks, audio seconden, wachttijd) laten zien
+  welke kant de bottleneck is
+- Een compute proces dat sterft (OOM killer, RLIMIT_AS, segfault) kost alleen de
+  tracks die op dat moment liepen; de pool wordt opnieuw gestart en de rest gaat door
+
+Op netwerkschijven kost decoderen vaak meer tijd dan de analyse zelf; zonder pipeline
+staan de cores dan stil. Piekgeheugen van de wachtrij ≈ budget + één track per decoder.
+
+Gebruik:
+    from decode_pipeline import DecodePipeline
+    pipeline = DecodePipeline(decode, compute, decoders=4, workers=8, queue_mb=1024)
+    for result in pipeline.run(items):   # decode(item) -> (meta, pcm), compute(meta, pcm) -> result
+        ...
+    print(pipeline.stats.summary())
+
+    # Zonder decoders: zoals Pool.imap_unordered, maar een gestorven worker kost alleen zijn tracks
+    for result in map_unordered(analyze, items, workers=8, on_error=lambda item, exc: ...):
+        ...
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+DEFAULT_DECODERS = 2
+DEFAULT_QUEUE_MB = 512
+
+# Hoe vaak (seconden) de dispatcher kijkt of er nieuw werk is terwijl er een worker vrij is
+_POLL_INTERVAL = 0.02
+
+_DONE = object()
+
+
+class StageCounter:
+    """Tellers voor één stap van de pipeline (thread-safe)"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy_seconds, audio_seconds=0.0, error=False):
+        with self._lock:
+            self.items += 1
+            self.errors += int(error)
+            self.busy_seconds += busy_seconds
+            self.audio_seconds += audio_seconds
+
+    def waited(self, seconds):
+        with self._lock:
+            self.wait_seconds += seconds
+
+    def summary(self, elapsed):
+        """
+        Returns:
+            Dictionary met aantallen, throughput (gerealiseerd en capaciteit) en bezetting
+        """
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wait_seconds': round(self.wait_seconds, 3),
+            'items_per_second': round(self.items / elapsed, 3) if elapsed > 0 else 0.0,
+            # Throughput als deze stap nooit op de andere hoeft te wachten
+            'capacity_per_second': round(self.items * self.workers / self.busy_seconds, 3)
+            if self.busy_seconds > 0 else 0.0,
+            'audio_seconds_per_second': round(self.audio_seconds / elapsed, 2) if elapsed > 0 else 0.0,
+            'utilization': round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed > 0 else 0.0,
+        }
+
+
+class PipelineStats:
+    """
+    Tellers van de hele pipeline
+
+    decode.wait_seconds is de tijd dat decoders op ruimte in de wachtrij wachtten
+    (compute loopt achter); compute.wait_seconds de tijd dat een worker vrij was
+    terwijl de wachtrij leeg was (decode loopt achter).
+    """
+
+    def __init__(self, decoders, workers):
+        self.decode = StageCounter('decode', decoders)
+        self.compute = StageCounter('compute', workers)
+        self.max_queue_items = 0
+        self.max_queue_bytes = 0
+        self.start = time.time()
+        self.end = None
+
+    def summary(self):
+        elapsed = (self.end or time.time()) - self.start
+        decode = self.decode.summary(elapsed)
+        compute = self.compute.summary(elapsed)
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'decode': decode,
+            'compute': compute,
+            'max_queue_items': self.max_queue_items,
+            'max_queue_mb': round(self.max_queue_bytes / (1024 * 1024), 1),
+            'bottleneck': 'decode' if decode['capacity_per_second'] < compute['capacity_per_second'] else 'compute',
+        }
+
+
+def pool_kwargs(workers, initializer=None, initargs=(), max_tasks_per_child=None, preload=()):
+    """
+    Argumenten voor een ProcessPoolExecutor met forkserver processen
+
+    Compute processen worden niet geforkt vanuit een proces met draaiende threads (locks van
+    die threads kunnen in het kind vast blijven zitten); de forkserver importeert preload vooraf,
+    zodat nieuwe processen (ook na max_tasks_per_child of een herstart) die imports niet betalen.
+
+    Returns:
+        Dictionary met keyword argumenten voor ProcessPoolExecutor
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(list(preload))
+    else:
+        context = multiprocessing.get_context('spawn')
+    kwargs = {'max_workers': workers, 'initializer': initializer, 'initargs': initargs, 'mp_context': context}
+    if max_tasks_per_child:
+        kwargs['max_tasks_per_child'] = max_tasks_per_child
+    return kwargs
+
+
+def restart_pool(executor, executor_kwargs):
+    """Vervang een kapotte pool (BrokenProcessPool) door een nieuwe met dezelfde instellingen"""
+    print("⚠️  Compute proces gestorven; pool wordt opnieuw gestart")
+    executor.shutdown(wait=False, cancel_futures=True)
+    return ProcessPoolExecutor(**executor_kwargs)
+
+
+def map_unordered(fn, items, workers=None, on_error=None, initializer=None, initargs=(),
+                  max_tasks_per_child=None, preload=()):
+    """
+    fn(item) voor alle items in een process pool, zoals Pool.imap_unordered
+
+    Er lopen nooit meer items dan workers tegelijk. Sterft een worker (OOM killer,
+    RLIMIT_AS, segfault), dan krijgen alleen de items die op dat moment liepen een
+    foutresultaat en gaat de rest verder in een nieuwe pool; Pool.imap_unordered
+    blijft in dat geval eeuwig wachten op het verloren item.
+
+    Args:
+        fn: Functie op module niveau (wordt gepickled)
+        items: Iterable met argumenten voor fn
+        workers: Aantal processen (default: aantal cores)
+        on_error: on_error(item, exc) -> resultaat voor items waarvan fn een exception gaf
+                  of waarvan het proces stierf (default: exception doorgeven)
+        initializer, initargs, max_tasks_per_child, preload: Zie pool_kwargs
+
+    Yields:
+        Resultaten in volgorde van afronden
+    """
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    executor_kwargs = pool_kwargs(workers, initializer, initargs, max_tasks_per_child, preload)
+    items = iter(items)
+    running = {}
+    executor = ProcessPoolExecutor(**executor_kwargs)
+    try:
+        while True:
+            # Niet vooruit in de executor queue: bij een kapotte pool falen alle futures daarin
+            while len(running) < workers:
+                item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                try:
+                    future = executor.submit(fn, item)
+                except BrokenProcessPool:
+                    executor = restart_pool(executor, executor_kwargs)
+                    future = executor.submit(fn, item)
+                running[future] = (item, executor)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, future_executor = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool) and future_executor is executor:
+                        executor = restart_pool(executor, executor_kwargs)
+                    if on_error is None:
+                        raise
+                    result = on_error(item, e)
+                yield result
+    finally:
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _compute_shared(compute, meta, shm_name, shape, dtype):
+    """Draait in een compute proces: PCM uit shared memory, zonder kopie"""
+    start = time.time()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pcm = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = compute(meta, pcm)
+        del pcm
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Het resultaat houdt nog een view vast; het blok verdwijnt met het proces of bij unlink
+            pass
+    return result, time.time() - start
+
+
+class DecodePipeline:
+    """
+    Decoder threads → begrensde wachtrij (geheugenbudget) → compute process pool
+
+    Args:
+        decode: decode(item) -> (meta, pcm numpy array); draait in een decoder thread
+        compute: compute(meta, pcm) -> resultaat; draait in een compute proces
+                 (moet op module niveau gedefinieerd zijn, zodat het gepickled kan worden)
+        decoders: Aantal decoder threads (default: 2)
+        workers: Aantal compute processen (default: aantal cores)
+        queue_mb: Geheugenbudget voor gedecodeerde tracks in de wachtrij in MB (default: 512)
+        on_decode_error: on_decode_error(item, exc) -> resultaat voor tracks die niet
+                         gedecodeerd konden worden (default: exception doorgeven)
+        on_compute_error: on_compute_error(meta, exc) -> resultaat voor tracks waarvan de
+                          analyse een exception gaf of waarvan het compute proces stierf
+                          (BrokenProcessPool: alle tracks die op dat moment liepen);
+                          default: exception doorgeven
+        initializer: Initializer voor de compute processen
+        initargs: Argumenten voor de initializer
+        max_tasks_per_child: Tracks per compute proces voordat het vervangen wordt
+        preload: Modules die de forkserver vooraf importeert, zodat nieuwe compute
+                 processen die imports niet opnieuw betalen (bijv. de analyzer)
+    """
+
+    def __init__(self, decode, compute, decoders=DEFAULT_DECODERS, workers=None, queue_mb=DEFAULT_QUEUE_MB,
+                 on_decode_error=None, on_compute_error=None, initializer=None, initargs=(),
+                 max_tasks_per_child=None, preload=()):
+        self.decode = decode
+        self.compute = compute
+        self.decoders = max(1, int(decoders))
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.queue_bytes = int(queue_mb * 1024 * 1024)
+        self.on_decode_error = on_decode_error
+        self.on_compute_error = on_compute_error
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks_per_child = max_tasks_per_child
+        self.preload = list(preload)
+        self.stats = PipelineStats(self.decoders, self.workers)
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._active_decoders = 0
+        self._stop = False
+
+    def _put(self, entry, nbytes):
+        """
+        Zet een entry in de wachtrij; wacht zolang het budget vol zit (een lege wachtrij laat altijd toe)
+
+        Returns:
+            False als de pipeline gestopt is (de entry is dan niet geplaatst)
+        """
+        with self._cond:
+            start = time.time()
+            while self._queue and self._queued_bytes + nbytes > self.queue_bytes and not self._stop:
+                self._cond.wait()
+            self.stats.decode.waited(time.time() - start)
+            if self._stop:
+                return False
+            self._queue.append((entry, nbytes))
+            self._queued_bytes += nbytes
+            self.stats.max_queue_items = max(self.stats.max_queue_items, len(self._queue))
+            self.stats.max_queue_bytes = max(self.stats.max_queue_bytes, self._queued_bytes)
+            self._cond.notify_all()
+            return True
+
+    def _decoder(self, items, items_lock):
+        try:
+            while not self._stop:
+                with items_lock:
+                    item = next(items, None)
+                if item is None:
+                    return
+
+                start = time.time()
+                try:
+                    meta, pcm = self.decode(item)
+                except Exception as e:
+                    self.stats.decode.add(time.time() - start, error=True)
+                    if self.on_decode_error is None:
+                        raise
+                    self._put(('error', self.on_decode_error(item, e)), 0)
+                    continue
+
+                pcm = np.ascontiguousarray(pcm)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, pcm.nbytes))
+                np.ndarray(pcm.shape, dtype=pcm.dtype, buffer=shm.buf)[...] = pcm
+                audio_seconds = meta.get('audio_seconds', 0.0) if isinstance(meta, dict) else 0.0
+                entry = ('pcm', (meta, shm, pcm.shape, pcm.dtype.str))
+                del pcm
+                self.stats.decode.add(time.time() - start, audio_seconds)
+                if not self._put(entry, shm.size):
+                    shm.close()
+                    shm.unlink()
+        finally:
+            with self._cond:
+                self._active_decoders -= 1
+                self._cond.notify_all()
+
+    def _take(self, timeout):
+        """
+        Returns:
+            (entry, nbytes), of None als er (nog) niets is; 'done' als alle decoders klaar zijn
+        """
+        with self._cond:
+            if not self._queue and self._active_decoders > 0:
+                self._cond.wait(timeout)
+            if self._queue:
+                entry, nbytes = self._queue.popleft()
+                self._queued_bytes -= nbytes
+                self._cond.notify_all()
+                return entry
+            return 'done' if self._active_decoders == 0 else None
+
+    def run(self, items):
+        """
+        Verwerk alle items
+
+        Yields:
+            Resultaten van compute (of on_decode_error/on_compute_error) in volgorde van afronden
+        """
+        items = iter(items)
+        items_lock = threading.Lock()
+        self._active_decoders = self.decoders
+        threads = [threading.Thread(target=self._decoder, args=(items, items_lock), daemon=True)
+                   for _ in range(self.decoders)]
+        self.stats.start = time.time()
+        for thread in threads:
+            thread.start()
+
+        # Forkserver: compute processen niet forken vanuit een proces met draaiende decoder threads
+        executor_kwargs = pool_kwargs(self.workers, self.initializer, self.initargs,
+                                      self.max_tasks_per_child, self.preload)
+
+        running = {}
+        decoding_done = False
+        executor = ProcessPoolExecutor(**executor_kwargs)
+        try:
+            while True:
+                # Vrije workers vullen uit de wachtrij (niet vooruit in de executor queue,
+                # zodat de wachtrij het enige geheugenbudget blijft)
+                while len(running) < self.workers and not decoding_done:
+                    start = time.time()
+                    entry = self._take(_POLL_INTERVAL if running else None)
+                    if entry is None:
+                        self.stats.compute.waited(time.time() - start)
+                        break
+                    if entry == 'done':
+                        decoding_done = True
+                        break
+                    self.stats.compute.waited(time.time() - start)
+
+                    kind, payload = entry
+                    if kind == 'error':
+                        yield payload
+                        continue
+                    meta, shm, shape, dtype = payload
+                    try:
+                        future = executor.submit(_compute_shared, self.compute, meta, shm.name, shape, dtype)
+                    except BrokenProcessPool:
+                        # Een proces is gestorven voordat de lopende futures dat lieten zien
+                        executor = restart_pool(executor, executor_kwargs)
+                        future = executor.submit(_compute_shared, self.compute, meta, shm.name, shape, dtype)
+                    audio_seconds = meta.get('audio_seconds', 0.0) if isinstance(meta, dict) else 0.0
+                    running[future] = (shm, audio_seconds, meta, executor)
+
+                if not running:
+                    if decoding_done:
+                        break
+                    continue
+
+                timeout = None if len(running) >= self.workers or decoding_done else _POLL_INTERVAL
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shm, audio_seconds, meta, future_executor = running.pop(future)
+                    shm.close()
+                    shm.unlink()
+                    try:
+                        result, busy = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool) and future_executor is executor:
+                            executor = restart_pool(executor, executor_kwargs)
+                        self.stats.compute.add(0.0, error=True)
+                        if self.on_compute_error is None:
+                            raise
+                        yield self.on_compute_error(meta, e)
+                        continue
+                    self.stats.compute.add(busy, audio_seconds)
+                    yield result
+        finally:
+            self._stop = True
+            with self._cond:
+                self._cond.notify_all()
+                leftovers = [entry for entry, _ in self._queue]
+                self._queue.clear()
+            for future, (shm, *_) in running.items():
+                future.cancel()
+                shm.close()
+                shm.unlink()
+            for kind, payload in leftovers:
+                if kind == 'pcm':
+                    payload[1].close()
+                    payload[1].unlink()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.stats.end = time.time()
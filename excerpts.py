@@ -0,0 +1,116 @@
+"""
+Excerpts - BPM en key op een paar representatieve fragmenten
+- Een goedkope RMS pass (één waarde per seconde) kiest per deel van de track
+  (begin, midden, eind) het fragment met de meeste energie (refrein, drop)
+- Schattingen per fragment worden gecombineerd; bij weinig overeenstemming
+  daalt de confidence zodat de caller op de volledige track terugvalt
+
+Voor een track van 5 minuten kosten drie fragmenten van 30 seconden ruwweg
+een derde van de spectrale analyse. Korte tracks (minder dan anderhalf keer
+de totale fragment lengte) worden direct volledig geanalyseerd.
+
+Gebruik:
+    from excerpts import select_excerpts
+    windows = select_excerpts(y, sr)   # [(start_sample, end_sample), ...] of None
+"""
+
+import numpy as np
+
+
+EXCERPT_SECONDS = 30.0
+N_EXCERPTS = 3
+
+# Fragmenten alleen als de track minstens zoveel keer langer is dan alle fragmenten samen
+MIN_LENGTH_RATIO = 1.5
+
+# Onder deze confidence wordt de volledige track geanalyseerd
+BPM_CONFIDENCE_THRESHOLD = 0.9
+KEY_CONFIDENCE_THRESHOLD = 0.75
+
+# Resolutie van de RMS pass in seconden
+RMS_BLOCK_SECONDS = 1.0
+
+
+def block_rms(y, sr, block_seconds=RMS_BLOCK_SECONDS):
+    """
+    RMS per blok zonder overlap (een rest korter dan een blok telt niet mee)
+
+    Returns:
+        Array met één RMS waarde per blok
+    """
+    block = max(1, int(block_seconds * sr))
+    n_blocks = len(y) // block
+    frames = y[:n_blocks * block].reshape(n_blocks, block)
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / block)
+
+
+def select_excerpts(y, sr, n_excerpts=N_EXCERPTS, excerpt_seconds=EXCERPT_SECONDS,
+                    block_seconds=RMS_BLOCK_SECONDS):
+    """
+    Kies per deel van de track het fragment met de hoogste gemiddelde energie
+
+    De track wordt in n_excerpts gelijke delen verdeeld met één fragment per deel:
+    zo zijn de fragmenten representatief (een tempo- of toonsoortwissel tussen de
+    delen geeft onenigheid en dus een fallback) en overlappen ze nooit.
+
+    Args:
+        y: Audio time series
+        sr: Sample rate
+        n_excerpts: Aantal fragmenten (default: 3)
+        excerpt_seconds: Lengte van elk fragment in seconden (default: 30)
+        block_seconds: Resolutie van de RMS pass in seconden (default: 1)
+
+    Returns:
+        Lijst met (start_sample, end_sample) in tijdsvolgorde, of None als de track
+        te kort is om fragmenten zinvol te maken
+    """
+    if len(y) < n_excerpts * excerpt_seconds * MIN_LENGTH_RATIO * sr:
+        return None
+
+    rms = block_rms(y, sr, block_seconds)
+    width = max(1, int(round(excerpt_seconds / block_seconds)))
+
+    # Energie per mogelijk startblok via een cumulatieve som
+    cum = np.concatenate([[0.0], np.cumsum(rms, dtype=np.float64)])
+    scores = cum[width:] - cum[:-width]
+
+    # Per deel de beste start waarbij het fragment volledig binnen dat deel valt
+    part = len(rms) // n_excerpts
+    starts = [k * part + int(np.argmax(scores[k * part:(k + 1) * part - width + 1]))
+              for k in range(n_excerpts)]
+
+    block = max(1, int(block_seconds * sr))
+    return [(start * block, min(len(y), (start + width) * block)) for start in starts]
+
+
+def combine_bpm(estimates):
+    """
+    Combineer BPM schattingen van de fragmenten
+
+    Args:
+        estimates: Lijst met (bpm, confidence) per fragment
+
+    Returns:
+        bpm: Mediaan van de fragmenten (integer)
+        confidence: Gemiddelde confidence, verlaagd naarmate de fragmenten
+                    minder overeenstemmen (ook bij half/double time verschillen)
+    """
+    bpms = np.array([bpm for bpm, _ in estimates], dtype=np.float64)
+    confidences = np.array([confidence for _, confidence in estimates], dtype=np.float64)
+
+    agreement = max(0.0, 1 - np.std(bpms) / np.mean(bpms)) if np.mean(bpms) > 0 else 0.0
+    return int(round(float(np.median(bpms)))), float(np.mean(confidences) * agreement)
+
+
+def combine_chroma(chroma_vectors, lengths):
+    """
+    Gemiddelde chroma vector over de fragmenten, gewogen naar lengte
+
+    Args:
+        chroma_vectors: Lijst met gemiddelde chroma vectoren (12 waarden) per fragment
+        lengths: Lengte van elk fragment (samples of frames)
+
+    Returns:
+        Array met 12 waarden
+    """
+    return np.average(np.asarray(chroma_vectors), axis=0, weights=np.asarray(lengths, dtype=np.float64))
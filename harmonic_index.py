@@ -0,0 +1,462 @@
+"""
+Harmonic Index - Welke tracks mixen met deze?
+- In-memory index over opgeslagen analyse resultaten (batch JSON lines, library
+  database, *_analysis.json)
+- Per Camelot code een op BPM gesorteerde lijst; queries via bisect in plaats van een scan
+- Compatibele keys: dezelfde code, ±1 op het wiel en de relatieve majeur/minor
+- BPM binnen ±N%, optioneel ook half/double time
+- Incrementeel: add() voegt een track toe (of werkt hem bij) zonder herbouw
+
+Een query raakt maximaal 4 buckets × 3 BPM bereiken; ook bij 100k tracks blijft
+dat ruim onder een milliseconde (zie --benchmark).
+
+Gebruik:
+    from harmonic_index import HarmonicIndex
+    index = HarmonicIndex.from_paths('batch_analysis.jsonl')
+    index.query('8A', 124, tolerance=6)     # of index.match('/music/track.mp3')
+
+    python harmonic_index.py batch_analysis.jsonl --camelot 8A --bpm 124
+    python harmonic_index.py --benchmark --tracks 100000
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from key_engine import CAMELOT_WHEEL, get_camelot_notation
+
+
+# Standaard BPM tolerantie in procenten en maximaal aantal resultaten
+DEFAULT_TOLERANCE = 6.0
+DEFAULT_LIMIT = 50
+
+# Volgorde waarin key relaties bij gelijke BPM afstand gesorteerd worden
+KEY_RELATIONS = ('same', 'relative', '+1', '-1')
+
+# Tempo relaties: factor ten opzichte van de gevraagde BPM
+TEMPO_FACTORS = (('same', 1.0), ('half', 0.5), ('double', 2.0))
+
+_CAMELOT_PATTERN = re.compile(r'^(1[0-2]|[1-9])([AB])$')
+
+
+def parse_camelot(camelot):
+    """
+    Args:
+        camelot: Camelot code (bijv. '8A', '12b')
+
+    Returns:
+        (nummer, letter), bijv. (8, 'A')
+
+    Raises:
+        ValueError: Als de code geen geldige Camelot code is
+    """
+    match = _CAMELOT_PATTERN.match(str(camelot).strip().upper())
+    if not match:
+        raise ValueError(f"Ongeldige Camelot code: {camelot}")
+    return int(match.group(1)), match.group(2)
+
+
+def compatible_keys(camelot):
+    """
+    Camelot codes die harmonisch mixen met de gegeven code
+
+    Returns:
+        Lijst met (camelot, relatie): dezelfde code ('same'), relatieve majeur/minor
+        ('relative') en één stap met/tegen de klok in ('+1', '-1')
+    """
+    number, letter = parse_camelot(camelot)
+    other = 'B' if letter == 'A' else 'A'
+    return [
+        (f"{number}{letter}", 'same'),
+        (f"{number}{other}", 'relative'),
+        (f"{number % 12 + 1}{letter}", '+1'),
+        (f"{(number - 2) % 12 + 1}{letter}", '-1'),
+    ]
+
+
+def track_from_result(result, track_id=None):
+    """
+    Normaliseer een analyse resultaat (pro, standalone of simple) naar een index record
+
+    Args:
+        result: Resultaat dictionary met bpm en camelot of key/mode
+        track_id: Id van de track (default: filepath, filename of title uit het resultaat)
+
+    Returns:
+        Dictionary met id, bpm, camelot en beschikbare info (title, key, mode, duration),
+        of None als bpm of key ontbreekt
+    """
+    bpm = result.get('bpm')
+    camelot = result.get('camelot')
+    if not camelot and (result.get('key'), result.get('mode')) in CAMELOT_WHEEL:
+        camelot = get_camelot_notation(result['key'], result['mode'])
+    if not bpm or not camelot or camelot == '?':
+        return None
+
+    track_id = track_id or result.get('filepath') or result.get('filename') or result.get('title')
+    if not track_id:
+        return None
+
+    record = {'id': str(track_id), 'bpm': float(bpm), 'camelot': camelot}
+    for field, source in (('title', 'song_name'), ('title', 'title'), ('key', 'key'), ('mode', 'mode'),
+                          ('duration', 'duration'), ('duration', 'duration_seconds')):
+        if field not in record and result.get(source) is not None:
+            record[field] = result[source]
+    return record
+
+
+def load_jsonl(path):
+    """
+    Lees geslaagde tracks uit een batch_analyzer JSON lines bestand
+
+    Bij dubbele paden wint de laatste regel (nieuwste analyse).
+
+    Returns:
+        Lijst met index records
+    """
+    records = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get('status') != 'ok' or not isinstance(entry.get('result'), dict):
+                continue
+            record = track_from_result(entry['result'], entry.get('path'))
+            if record:
+                records[record['id']] = record
+    return list(records.values())
+
+
+def load_json_files(directory):
+    """
+    Lees losse exports (*_analysis.json, *_pro_analysis.json) uit een directory
+
+    Returns:
+        Lijst met index records
+    """
+    records = []
+    for path in sorted(Path(directory).glob('*_analysis.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        record = track_from_result(result) if isinstance(result, dict) else None
+        if record:
+            records.append(record)
+    return records
+
+
+def load_store(db_path):
+    """
+    Lees tracks uit een library database (library_store)
+
+    Returns:
+        Lijst met index records
+    """
+    from library_store import LibraryStore
+
+    records = []
+    for track in LibraryStore(db_path).query(order_by='path'):
+        if track['bpm'] and track['camelot']:
+            records.append({'id': track['path'], 'bpm': track['bpm'], 'camelot': track['camelot'],
+                            'title': track['title'], 'key': track['key'], 'mode': track['mode'],
+                            'duration': track['duration']})
+    return records
+
+
+class HarmonicIndex:
+    """
+    Thread-safe index per Camelot code, binnen elke bucket gesorteerd op BPM
+
+    Elke bucket bestaat uit twee parallelle lijsten (BPM's en track ids) zodat
+    een BPM bereik met twee bisects gevonden wordt.
+    """
+
+    def __init__(self, records=None):
+        self._buckets = {}   # camelot -> (bpms, ids)
+        self._tracks = {}    # id -> record
+        self._lock = threading.Lock()
+        if records:
+            self.add_many(records)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def get(self, track_id):
+        """Record van een track, of None"""
+        return self._tracks.get(track_id)
+
+    def _remove(self, track_id):
+        record = self._tracks.pop(track_id, None)
+        if record is None:
+            return
+        bpms, ids = self._buckets[record['camelot']]
+        i = bisect_left(bpms, record['bpm'])
+        while ids[i] != track_id:
+            i += 1
+        del bpms[i]
+        del ids[i]
+
+    def add(self, record):
+        """
+        Voeg een track toe of werk hem bij (O(bucket grootte), geen herbouw)
+
+        Args:
+            record: Index record met id, bpm en camelot (zie track_from_result)
+        """
+        number, letter = parse_camelot(record['camelot'])
+        record = {**record, 'camelot': f"{number}{letter}", 'bpm': float(record['bpm'])}
+        with self._lock:
+            self._remove(record['id'])
+            bpms, ids = self._buckets.setdefault(record['camelot'], ([], []))
+            i = bisect_right(bpms, record['bpm'])
+            bpms.insert(i, record['bpm'])
+            ids.insert(i, record['id'])
+            self._tracks[record['id']] = record
+
+    def add_result(self, result, track_id=None):
+        """
+        Voeg een analyse resultaat toe
+
+        Returns:
+            Het index record, of None als bpm of key ontbreekt
+        """
+        record = track_from_result(result, track_id)
+        if record:
+            self.add(record)
+        return record
+
+    def add_many(self, records):
+        """
+        Voeg veel tracks tegelijk toe: aanvullen en per bucket één keer sorteren
+
+        Returns:
+            Aantal toegevoegde records
+        """
+        # Eerst ontdubbelen (laatste wint): tijdens het aanvullen zijn buckets niet gesorteerd
+        batch = {}
+        for record in records:
+            number, letter = parse_camelot(record['camelot'])
+            batch[record['id']] = {**record, 'camelot': f"{number}{letter}", 'bpm': float(record['bpm'])}
+
+        with self._lock:
+            for track_id in batch:
+                self._remove(track_id)
+
+            touched = set()
+            for record in batch.values():
+                bpms, ids = self._buckets.setdefault(record['camelot'], ([], []))
+                bpms.append(record['bpm'])
+                ids.append(record['id'])
+                self._tracks[record['id']] = record
+                touched.add(record['camelot'])
+
+            for code in touched:
+                bpms, ids = self._buckets[code]
+                order = sorted(range(len(bpms)), key=bpms.__getitem__)
+                self._buckets[code] = ([bpms[i] for i in order], [ids[i] for i in order])
+        return len(batch)
+
+    def remove(self, track_id):
+        """Verwijder een track (geen fout als hij niet bestaat)"""
+        with self._lock:
+            self._remove(track_id)
+
+    def query(self, camelot, bpm, tolerance=DEFAULT_TOLERANCE, half_double=True, limit=DEFAULT_LIMIT,
+              exclude=None):
+        """
+        Zoek tracks die harmonisch en qua tempo mixen
+
+        Args:
+            camelot: Camelot code van de huidige track (bijv. '8A')
+            bpm: BPM van de huidige track
+            tolerance: Maximale BPM afwijking in procenten (default: 6)
+            half_double: Ook tracks op half/double time (default: True)
+            limit: Maximaal aantal resultaten, None = alle (default: 50)
+            exclude: Track id dat niet in de resultaten mag (bijv. de track zelf)
+
+        Returns:
+            Lijst met records, oplopend gesorteerd op BPM afwijking, elk aangevuld met
+            key_relation, tempo_relation en bpm_diff (procent, t.o.v. het doeltempo)
+        """
+        bpm = float(bpm)
+        if bpm <= 0:
+            raise ValueError(f"Ongeldige BPM: {bpm}")
+        margin = float(tolerance) / 100
+        factors = TEMPO_FACTORS if half_double else TEMPO_FACTORS[:1]
+
+        with self._lock:
+            # Elk (bucket, tempo) bereik is gesorteerd: vanaf het doeltempo naar buiten
+            # lopen geeft de matches per bereik op oplopende afstand. Een heap voegt de
+            # bereiken samen, zodat alleen de beste `limit` matches bekeken worden.
+            ranges, heap = [], []
+            for code, key_relation in compatible_keys(camelot):
+                bucket = self._buckets.get(code)
+                if not bucket:
+                    continue
+                bpms, ids = bucket
+                rank = KEY_RELATIONS.index(key_relation)
+                for tempo_relation, factor in factors:
+                    target = bpm * factor
+                    lo = bisect_left(bpms, target * (1 - margin))
+                    hi = bisect_right(bpms, target * (1 + margin))
+                    if lo == hi:
+                        continue
+                    r = len(ranges)
+                    ranges.append((bpms, ids, lo, hi, target, key_relation, tempo_relation))
+                    center = bisect_left(bpms, target, lo, hi)
+                    for i, step in ((center - 1, -1), (center, 1)):
+                        if lo <= i < hi:
+                            heap.append((abs(bpms[i] / target - 1), rank, ids[i], r, i, step))
+            heapq.heapify(heap)
+
+            results = []
+            while heap and (limit is None or len(results) < limit):
+                _, rank, track_id, r, i, step = heapq.heappop(heap)
+                bpms, ids, lo, hi, target, key_relation, tempo_relation = ranges[r]
+                if lo <= i + step < hi:
+                    j = i + step
+                    heapq.heappush(heap, (abs(bpms[j] / target - 1), rank, ids[j], r, j, step))
+                if track_id != exclude:
+                    results.append({**self._tracks[track_id], 'key_relation': key_relation,
+                                    'tempo_relation': tempo_relation,
+                                    'bpm_diff': round((bpms[i] / target - 1) * 100, 2)})
+        return results
+
+    def match(self, track_id, **kwargs):
+        """
+        Tracks die mixen met een track uit de index (de track zelf niet)
+
+        Raises:
+            KeyError: Als de track niet in de index staat
+        """
+        record = self._tracks.get(track_id)
+        if record is None:
+            raise KeyError(track_id)
+        return self.query(record['camelot'], record['bpm'], exclude=track_id, **kwargs)
+
+    def stats(self):
+        """Aantal tracks per Camelot code"""
+        with self._lock:
+            return {code: len(bucket[0]) for code, bucket in sorted(self._buckets.items())}
+
+    @classmethod
+    def from_paths(cls, *paths):
+        """
+        Bouw een index uit JSON lines bestanden, library databases (.sqlite, .db),
+        losse JSON exports en/of directories
+
+        Returns:
+            HarmonicIndex
+        """
+        index = cls()
+        for path in paths:
+            if os.path.isdir(path):
+                index.add_many(load_json_files(path))
+            elif str(path).endswith('.jsonl'):
+                index.add_many(load_jsonl(path))
+            elif str(path).endswith(('.sqlite', '.db')):
+                index.add_many(load_store(path))
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    index.add_result(json.load(f))
+        return index
+
+
+def benchmark(n_tracks=100000, n_queries=1000, seed=0):
+    """
+    Synthetische benchmark: bouwtijd en query latency over n_tracks
+
+    Returns:
+        Dictionary met build_seconds, query_ms (mediaan, p99) en gemiddeld aantal matches
+    """
+    rng = random.Random(seed)
+    codes = [f"{n}{l}" for n in range(1, 13) for l in 'AB']
+    records = [{'id': f"track_{i}", 'bpm': round(rng.uniform(70, 180), 1), 'camelot': rng.choice(codes)}
+               for i in range(n_tracks)]
+
+    start = time.perf_counter()
+    index = HarmonicIndex(records)
+    build_seconds = time.perf_counter() - start
+
+    timings, matches = [], 0
+    for _ in range(n_queries):
+        code, bpm = rng.choice(codes), rng.uniform(70, 180)
+        start = time.perf_counter()
+        matches += len(index.query(code, bpm))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    # 1000 inserts: totale tijd in ms is gelijk aan µs per insert
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add({'id': f"new_{i}", 'bpm': rng.uniform(70, 180), 'camelot': rng.choice(codes)})
+    insert_us = (time.perf_counter() - start) * 1000
+
+    return {
+        'tracks': n_tracks,
+        'build_seconds': round(build_seconds, 3),
+        'query_ms_median': round(timings[len(timings) // 2], 4),
+        'query_ms_p99': round(timings[int(len(timings) * 0.99)], 4),
+        'insert_us': round(insert_us, 2),
+        'results_per_query': round(matches / n_queries, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Zoek tracks die harmonisch mixen')
+    parser.add_argument('paths', nargs='*', help='JSON lines bestanden, library databases, JSON exports of directories')
+    parser.add_argument('--track', help='Id (pad) van een track uit de index')
+    parser.add_argument('--camelot', help='Camelot code, bijv. 8A')
+    parser.add_argument('--bpm', type=float, help='BPM')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'BPM tolerantie in procenten (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--no-half-double', action='store_true', help='Geen half/double time matches')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT,
+                        help=f'Maximaal aantal resultaten (default: {DEFAULT_LIMIT})')
+    parser.add_argument('--benchmark', action='store_true', help='Synthetische benchmark')
+    parser.add_argument('--tracks', type=int, default=100000, help='Aantal tracks voor --benchmark')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.tracks), indent=2))
+        return 0
+
+    if not args.paths or not (args.track or (args.camelot and args.bpm)):
+        parser.error('Geef analyse resultaten en --track of --camelot met --bpm')
+
+    index = HarmonicIndex.from_paths(*args.paths)
+    print(f"📚 {len(index)} tracks geïndexeerd")
+
+    options = dict(tolerance=args.tolerance, half_double=not args.no_half_double, limit=args.limit)
+    try:
+        results = index.match(args.track, **options) if args.track else \
+            index.query(args.camelot, args.bpm, **options)
+    except KeyError:
+        print(f"❌ Track niet in de index: {args.track}")
+        return 1
+
+    for r in results:
+        tempo = '' if r['tempo_relation'] == 'same' else f" ({r['tempo_relation']} time)"
+        print(f"🎯 {r['camelot']:>3} {r['key_relation']:<8} {r['bpm']:6.1f} BPM "
+              f"{r['bpm_diff']:+5.1f}%{tempo}  {r.get('title') or r['id']}")
+    print(f"✅ {len(results)} tracks gevonden")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
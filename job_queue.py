@@ -0,0 +1,211 @@
+"""
+Job Queue - Asynchrone analyse jobs voor de web app
+- Een upload krijgt direct een job id; de analyse draait in een begrensde worker pool
+- Backpressure: bij een volle wachtrij wordt een job geweigerd of wordt even gewacht
+- Status en resultaat per job opvraagbaar (queued → running → done/error)
+- Metrics: wachtrij diepte, actieve jobs en wacht/looptijd latency
+
+Gebruik:
+    from job_queue import JobQueue, QueueFull
+    jobs = JobQueue(workers=2, max_queued=16)
+    job_id = jobs.submit(analyze, 'track.mp3')
+    print(jobs.get(job_id)['status'])
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUEUE_POLICIES = ('reject', 'block')
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_BLOCK_TIMEOUT = 30.0
+
+# Afgeronde jobs blijven zo lang opvraagbaar (seconden) en er worden er maximaal zoveel bewaard
+JOB_TTL = 3600
+MAX_FINISHED_JOBS = 1000
+
+# Aantal recente jobs waarover latency statistieken berekend worden
+LATENCY_WINDOW = 200
+
+
+class QueueFull(Exception):
+    """De wachtrij zit vol en de job is geweigerd"""
+
+
+def _percentile(values, q):
+    """Percentiel (0-100) van een lijst waarden, None als de lijst leeg is"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+class JobQueue:
+    """
+    Begrensde worker pool met job status administratie
+
+    Args:
+        workers: Aantal gelijktijdige analyses (default: 2)
+        max_queued: Maximaal aantal wachtende jobs bovenop de actieve (default: 16)
+        policy: 'reject' (direct weigeren als vol) of 'block' (wachten op een plek) (default: 'reject')
+        block_timeout: Maximale wachttijd in seconden bij policy 'block' (default: 30)
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED, policy='reject',
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Onbekende queue policy: {policy} (kies uit {', '.join(QUEUE_POLICIES)})")
+
+        self.workers = workers
+        self.max_queued = max_queued
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+        self._counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self._wait_times = deque(maxlen=LATENCY_WINDOW)
+        self._run_times = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Plaats een job in de wachtrij
+
+        Args:
+            func: Functie die het resultaat (JSON serialiseerbaar) retourneert
+            *args, **kwargs: Argumenten voor func
+
+        Returns:
+            job_id: Id waarmee status en resultaat opgevraagd worden
+
+        Raises:
+            QueueFull: Als er geen plek vrijkomt volgens de policy
+        """
+        if self.policy == 'block':
+            acquired = self._slots.acquire(timeout=self.block_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+
+        if not acquired:
+            with self._lock:
+                self._counts['rejected'] += 1
+            raise QueueFull(f"Wachtrij vol ({self.workers} actief, {self.max_queued} wachtend)")
+
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+
+        with self._lock:
+            self._prune()
+            self._jobs[job['job_id']] = job
+            self._counts['submitted'] += 1
+
+        try:
+            self._executor.submit(self._run, job, func, args, kwargs)
+        except RuntimeError:
+            # Executor is afgesloten
+            self._slots.release()
+            with self._lock:
+                del self._jobs[job['job_id']]
+            raise
+
+        return job['job_id']
+
+    def _run(self, job, func, args, kwargs):
+        """Voer een job uit in een worker thread"""
+        with self._lock:
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            self._wait_times.append(job['started_at'] - job['submitted_at'])
+
+        try:
+            result = func(*args, **kwargs)
+            status, error = 'done', None
+        except Exception as e:
+            result, status, error = None, 'error', str(e) or type(e).__name__
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            job['result'] = result
+            job['error'] = error
+            job['status'] = status
+            job['finished_at'] = time.time()
+            self._run_times.append(job['finished_at'] - job['started_at'])
+            self._counts['completed' if status == 'done' else 'failed'] += 1
+
+    def _prune(self):
+        """Verwijder verlopen afgeronde jobs (aanroepen met lock)"""
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at'] is not None]
+
+        expired = [job_id for job_id in finished if now - self._jobs[job_id]['finished_at'] > JOB_TTL]
+        overflow = finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]
+
+        for job_id in set(expired) | set(overflow):
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Returns:
+            Kopie van de job status (dictionary) of None als de job onbekend is
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = dict(job)
+
+        # Positie in de wachtrij helpt clients een verwachting te tonen
+        if info['status'] == 'queued':
+            info['queue_position'] = self._queue_position(job_id)
+        return info
+
+    def _queue_position(self, job_id):
+        with self._lock:
+            queued = [jid for jid, job in self._jobs.items() if job['status'] == 'queued']
+        return queued.index(job_id) + 1 if job_id in queued else 0
+
+    def metrics(self):
+        """
+        Returns:
+            Dictionary met wachtrij diepte, actieve jobs, tellers en latency (seconden)
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job['status'] == 'queued')
+            running = sum(1 for job in self._jobs.values() if job['status'] == 'running')
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            counts = dict(self._counts)
+
+        return {
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'policy': self.policy,
+            'queue_depth': queued,
+            'running': running,
+            **counts,
+            'wait_seconds_p50': _percentile(wait_times, 50),
+            'wait_seconds_p95': _percentile(wait_times, 95),
+            'run_seconds_p50': _percentile(run_times, 50),
+            'run_seconds_p95': _percentile(run_times, 95),
+        }
+
+    def shutdown(self, wait=True):
+        """Stop de worker pool (wachtende jobs worden nog afgemaakt als wait=True)"""
+        self._executor.shutdown(wait=wait)
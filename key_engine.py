@@ -0,0 +1,212 @@
+"""
+Key Engine - Gevectoriseerde Krumhansl-Schmuckler key detectie
+- De 24 geroteerde, z-genormaliseerde profielen worden één keer berekend (24 × 12)
+- N chroma vectoren worden met één matrix vermenigvuldiging gescoord (N × 24)
+- Retourneert key, mode, Camelot code, confidence en alle 24 scores per track
+
+Omdat Pearson correlatie schaal-onafhankelijk is, geeft dit exact dezelfde
+correlaties als np.corrcoef per key/mode combinatie.
+
+Gebruik:
+    from key_engine import estimate_keys
+    result = estimate_keys(chroma_vectors)  # N × 12 (bijv. uit opgeslagen resultaten)
+    print(result['camelot'])
+"""
+
+import numpy as np
+
+
+# Keys voor key detectie
+KEYS = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# Krumhansl-Schmuckler profiles voor majeur en minor
+# Deze zijn gebaseerd op psychologisch onderzoek naar tooncentrum perceptie
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# Camelot Wheel mapping (zoals Rekordbox gebruikt)
+# Format: (key, mode) -> (camelot_number, camelot_letter)
+CAMELOT_WHEEL = {
+    ('C', 'major'): (8, 'B'), ('C#', 'major'): (3, 'B'), ('D', 'major'): (10, 'B'),
+    ('D#', 'major'): (5, 'B'), ('E', 'major'): (12, 'B'), ('F', 'major'): (7, 'B'),
+    ('F#', 'major'): (2, 'B'), ('G', 'major'): (9, 'B'), ('G#', 'major'): (4, 'B'),
+    ('A', 'major'): (11, 'B'), ('A#', 'major'): (6, 'B'), ('B', 'major'): (1, 'B'),
+    ('C', 'minor'): (5, 'A'), ('C#', 'minor'): (12, 'A'), ('D', 'minor'): (7, 'A'),
+    ('D#', 'minor'): (2, 'A'), ('E', 'minor'): (9, 'A'), ('F', 'minor'): (4, 'A'),
+    ('F#', 'minor'): (11, 'A'), ('G', 'minor'): (6, 'A'), ('G#', 'minor'): (1, 'A'),
+    ('A', 'minor'): (8, 'A'), ('A#', 'minor'): (3, 'A'), ('B', 'minor'): (10, 'A'),
+}
+
+# Volgorde van de 24 scores: eerst 12 majeur keys, dan 12 minor keys
+MODES = ['major'] * 12 + ['minor'] * 12
+
+
+def get_camelot_notation(key, mode):
+    """
+    Converteer key en mode naar Camelot wheel notation
+
+    Args:
+        key: Toonsoort (bijv. 'C', 'D#')
+        mode: 'major' of 'minor'
+
+    Returns:
+        Camelot notation string (bijv. '8B', '5A')
+    """
+    camelot = CAMELOT_WHEEL.get((key, mode))
+    if camelot:
+        return f"{camelot[0]}{camelot[1]}"
+    return "?"
+
+
+def _zscore(x):
+    """Z-normaliseer langs de laatste as (populatie std); constante rijen worden 0"""
+    centered = x - x.mean(axis=-1, keepdims=True)
+    std = centered.std(axis=-1, keepdims=True)
+    return np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+
+
+def build_profile_matrix(major_profile=MAJOR_PROFILE, minor_profile=MINOR_PROFILE):
+    """
+    Bouw de 24 × 12 matrix met geroteerde, z-genormaliseerde key profielen
+
+    Rij i (0-11) is majeur met tonica KEYS[i], rij 12 + i is minor met tonica KEYS[i].
+
+    Returns:
+        Profiel matrix (24 × 12), gedeeld door 12 zodat een dot product
+        met een z-genormaliseerde chroma vector de Pearson correlatie geeft
+    """
+    # Rij i is het profiel i halve tonen omhoog geschoven (gelijk aan np.roll(profile, i))
+    rotations = (np.arange(12)[np.newaxis, :] - np.arange(12)[:, np.newaxis]) % 12
+    major = np.asarray(major_profile, dtype=np.float64)[rotations]
+    minor = np.asarray(minor_profile, dtype=np.float64)[rotations]
+    return _zscore(np.vstack([major, minor])) / 12
+
+
+PROFILE_MATRIX = build_profile_matrix()
+
+
+def score_chroma(chroma_vectors, profile_matrix=PROFILE_MATRIX):
+    """
+    Correleer chroma vectoren met alle 24 key profielen
+
+    Args:
+        chroma_vectors: Chroma vector (12) of matrix (N × 12)
+        profile_matrix: Profiel matrix uit build_profile_matrix()
+
+    Returns:
+        Correlaties (N × 24)
+    """
+    chroma = np.atleast_2d(np.asarray(chroma_vectors, dtype=np.float64))
+    return _zscore(chroma) @ profile_matrix.T
+
+
+def estimate_keys(chroma_vectors, profile_matrix=PROFILE_MATRIX):
+    """
+    Schat key en mode voor N tracks tegelijk
+
+    Args:
+        chroma_vectors: Chroma vector (12) of matrix (N × 12), bijv. gemiddelde chroma per track
+        profile_matrix: Profiel matrix uit build_profile_matrix()
+
+    Returns:
+        Dictionary met:
+            - key: Lijst met toonsoorten (bijv. 'C', 'D#')
+            - mode: Lijst met 'major' of 'minor'
+            - key_index: Array met index van de key in KEYS
+            - camelot: Lijst met Camelot codes (bijv. '8B')
+            - correlation: Array met de beste correlatie
+            - confidence: Array met betrouwbaarheid (0-1)
+            - scores: Alle correlaties (N × 24, eerst majeur dan minor)
+    """
+    scores = score_chroma(chroma_vectors, profile_matrix)
+    best = np.argmax(scores, axis=1)
+    correlation = scores[np.arange(len(best)), best]
+    key_index = best % 12
+
+    keys = [KEYS[i] for i in key_index]
+    modes = [MODES[i] for i in best]
+
+    return {
+        "key": keys,
+        "mode": modes,
+        "key_index": key_index,
+        "camelot": [get_camelot_notation(k, m) for k, m in zip(keys, modes)],
+        "correlation": correlation,
+        # Normaliseer confidence (correlatie kan negatief zijn)
+        "confidence": np.clip((correlation + 1) / 2, 0, 1),
+        "scores": scores,
+    }
+
+
+def estimate_key(chroma_vector, profile_matrix=PROFILE_MATRIX):
+    """
+    Schat key en mode voor één chroma vector
+
+    Returns:
+        key: Toonsoort (bijv. 'C', 'D#', etc.)
+        mode: 'major' of 'minor'
+        key_index: Index van de key in KEYS array
+        confidence: Betrouwbaarheid (0-1)
+        camelot: Camelot notation (bijv. '8B', '5A')
+    """
+    result = estimate_keys(chroma_vector, profile_matrix)
+    return (result["key"][0], result["mode"][0], int(result["key_index"][0]),
+            float(result["confidence"][0]), result["camelot"][0])
+
+
+def rescore_results(results, profile_matrix=PROFILE_MATRIX):
+    """
+    Scoor opgeslagen analyse resultaten opnieuw op basis van hun chroma vector
+
+    Handig na een wijziging van de key profielen: de audio hoeft niet opnieuw
+    gedecodeerd te worden. Resultaten zonder 'chroma_vector' worden overgeslagen.
+
+    Args:
+        results: Lijst met resultaat dictionaries (pro of standalone), worden aangepast
+        profile_matrix: Profiel matrix uit build_profile_matrix()
+
+    Returns:
+        Aantal opnieuw gescoorde resultaten
+    """
+    scored = [r for r in results if r.get("chroma_vector")]
+    if not scored:
+        return 0
+
+    estimates = estimate_keys(np.array([r["chroma_vector"] for r in scored]), profile_matrix)
+
+    for i, result in enumerate(scored):
+        key, mode = estimates["key"][i], estimates["mode"][i]
+        result["key"] = key
+        result["mode"] = mode
+        result["key_confidence"] = round(float(estimates["confidence"][i]), 3)
+        if "key_full" in result:
+            result["key_full"] = f"{key} {mode}"
+        if "key_index" in result:
+            result["key_index"] = int(estimates["key_index"][i])
+        if "camelot" in result:
+            result["camelot"] = estimates["camelot"][i]
+
+    return len(scored)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Gebruik: python key_engine.py <batch_analysis.jsonl> [output.jsonl]")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2] if len(sys.argv) > 2 else input_file
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    count = rescore_results([r["result"] for r in records if r.get("status") == "ok"])
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print(f"🎹 {count} van {len(records)} tracks opnieuw gescoord → {output_file}")
@@ -0,0 +1,382 @@
+"""
+Library Scan - Incrementeel herscannen van een muziekmap
+- Per bestand pad, grootte, mtime en een snelle partial hash (begin, midden, eind)
+- Ongewijzigde bestanden (zelfde grootte en mtime) worden niet gelezen en niet geanalyseerd
+- Nieuwe en gewijzigde bestanden gaan door analyze_audio (de batch process pool)
+- Verwijderde bestanden verdwijnen uit de bibliotheek
+- Verplaatste of hernoemde bestanden worden op hash herkend: het resultaat verhuist mee
+- Eenmalig (CLI, bijv. nachtelijk via cron) of als watcher die periodiek opnieuw kijkt
+
+Bestandsstatus staat in de tabel scan_files van de library database (library_store);
+de resultaten zelf in de tracks tabel. Zonder wijzigingen kost een rescan alleen een
+directory walk met stat per bestand: seconden, ook voor 50k tracks.
+
+Gebruik:
+    python library_scan.py ~/Music --library library.sqlite [--workers 8] [--dry-run]
+    python library_scan.py ~/Music --library library.sqlite --watch 300
+
+    from library_scan import rescan
+    summary = rescan('~/Music', LibraryStore('library.sqlite'))
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+from analysis_profiles import PROFILES
+from batch_analyzer import AUDIO_EXTENSIONS, DEFAULT_TIMEOUT, analyze_paths
+from library_store import DEFAULT_BATCH_SIZE, LibraryStore
+
+
+# Bytes per stuk (begin, midden, eind) voor de partial hash
+PARTIAL_HASH_BLOCK = 64 * 1024
+
+DEFAULT_WATCH_INTERVAL = 300
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS scan_files ('
+    ' path TEXT PRIMARY KEY,'
+    ' size INTEGER NOT NULL,'
+    ' mtime_ns INTEGER NOT NULL,'
+    ' partial_hash TEXT NOT NULL,'
+    ' status TEXT NOT NULL,'
+    ' scanned_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_scan_files_hash ON scan_files(partial_hash)',
+)
+
+
+def partial_hash(path, size=None, block=PARTIAL_HASH_BLOCK):
+    """
+    Snelle hash van grootte plus begin, midden en eind van een bestand
+
+    Leest maximaal 3 × block bytes, ongeacht de bestandsgrootte. Genoeg om een
+    verplaatst bestand terug te vinden en een echte wijziging van een touch te
+    onderscheiden (tags staan aan het begin of eind, audio in het midden).
+
+    Returns:
+        Hex string van de hash
+    """
+    size = os.path.getsize(path) if size is None else size
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 3 * block:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - block) // 2, size - block):
+                f.seek(offset)
+                digest.update(f.read(block))
+    return digest.hexdigest()
+
+
+def walk_audio_files(root):
+    """
+    Zoek recursief audio bestanden met grootte en mtime (één stat per bestand)
+
+    Returns:
+        Dictionary absoluut pad -> (size, mtime_ns)
+    """
+    files = {}
+    stack = [os.path.abspath(root)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        st = entry.stat()
+                        files[entry.path] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+    return files
+
+
+class ScanState:
+    """
+    Bestandsstatus van eerdere scans (tabel scan_files in de library database)
+
+    Args:
+        store: LibraryStore
+    """
+
+    def __init__(self, store):
+        self.db_path = store.db_path
+        conn = self._connect()
+        try:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def load(self, root):
+        """
+        Returns:
+            Dictionary pad -> (size, mtime_ns, partial_hash, status) voor bestanden onder root
+        """
+        prefix = os.path.join(os.path.abspath(root), '')
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT path, size, mtime_ns, partial_hash, status FROM scan_files'
+                ' WHERE path >= ? AND path < ?', (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            )
+            return {row[0]: tuple(row[1:]) for row in rows}
+        finally:
+            conn.close()
+
+    def apply(self, upserts=(), deletes=()):
+        """
+        Schrijf wijzigingen in één transactie
+
+        Args:
+            upserts: (path, size, mtime_ns, partial_hash, status) tuples
+            deletes: Paden die niet meer bestaan
+        """
+        upserts, deletes = list(upserts), [(str(p),) for p in deletes]
+        if not upserts and not deletes:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('DELETE FROM scan_files WHERE path = ?', deletes)
+            conn.executemany(
+                'INSERT OR REPLACE INTO scan_files (path, size, mtime_ns, partial_hash, status, scanned_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', [(*row, now) for row in upserts]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+
+def plan_rescan(root, state, retry_failed=False):
+    """
+    Vergelijk de map met de vorige scan (zonder iets te schrijven)
+
+    Alleen bestanden waarvan grootte of mtime veranderd is, of die nieuw zijn, worden
+    gehasht. Een nieuw pad met dezelfde hash als een verdwenen pad is een verplaatsing;
+    een gewijzigde mtime met dezelfde hash is een touch.
+
+    Returns:
+        Dictionary met:
+            - files: Aantal audio bestanden op schijf
+            - unchanged: Aantal ongewijzigde bestanden
+            - new, changed: Aantal nieuwe en inhoudelijk gewijzigde bestanden
+            - analyze: Lijst met (path, size, mtime_ns, partial_hash) om te analyseren
+            - moved: Lijst met (oud pad, path, size, mtime_ns, partial_hash)
+            - touched: Lijst met (path, size, mtime_ns, partial_hash, status) (alleen mtime anders)
+            - deleted: Lijst met verdwenen paden
+            - unreadable: Lijst met paden die niet gelezen konden worden
+    """
+    disk = walk_audio_files(root)
+    known = state.load(root)
+
+    candidates, unchanged = [], 0
+    for path, (size, mtime_ns) in disk.items():
+        previous = known.get(path)
+        if previous and previous[:2] == (size, mtime_ns) and (previous[3] == 'ok' or not retry_failed):
+            unchanged += 1
+        else:
+            candidates.append((path, size, mtime_ns))
+
+    missing = {path: info for path, info in known.items() if path not in disk}
+    # Alleen geslaagde analyses zijn het hergebruiken waard
+    missing_by_hash = {info[2]: path for path, info in missing.items() if info[3] == 'ok'}
+
+    plan = {'files': len(disk), 'unchanged': unchanged, 'analyze': [], 'moved': [], 'touched': [],
+            'deleted': [], 'unreadable': []}
+    for path, size, mtime_ns in sorted(candidates):
+        try:
+            digest = partial_hash(path, size)
+        except OSError:
+            plan['unreadable'].append(path)
+            continue
+
+        previous = known.get(path)
+        if previous and previous[2] == digest and (previous[3] == 'ok' or not retry_failed):
+            plan['touched'].append((path, size, mtime_ns, digest, previous[3]))
+        elif previous is None and digest in missing_by_hash:
+            old = missing_by_hash.pop(digest)
+            plan['moved'].append((old, path, size, mtime_ns, digest))
+        else:
+            plan['analyze'].append((path, size, mtime_ns, digest))
+
+    moved_from = {move[0] for move in plan['moved']}
+    plan['deleted'] = sorted(path for path in missing if path not in moved_from)
+    plan['changed'] = sum(1 for item in plan['analyze'] if item[0] in known)
+    plan['new'] = len(plan['analyze']) - plan['changed']
+    return plan
+
+
+def rescan(root, store, analyzer='standalone', workers=None, timeout=DEFAULT_TIMEOUT, profile=None,
+           excerpts=False, retry_failed=False, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Breng de bibliotheek in lijn met de map: alleen nieuwe en gewijzigde tracks analyseren
+
+    Args:
+        root: Muziekmap
+        store: LibraryStore voor de resultaten
+        analyzer: 'standalone', 'pro' of 'simple' (default: 'standalone')
+        workers: Aantal worker processen (default: aantal cores)
+        timeout: Maximale analyse tijd per track in seconden (default: 600)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
+        excerpts: Standalone BPM/key eerst op fragmenten (default: False)
+        retry_failed: Eerder mislukte, ongewijzigde tracks opnieuw proberen (default: False)
+        dry_run: Alleen tonen wat er zou gebeuren (default: False)
+        batch_size: Tracks per database transactie (default: 200)
+
+    Returns:
+        Dictionary met aantallen (files, unchanged, new, changed, moved, touched, deleted,
+        analyzed, failed) en scan_seconds / elapsed_seconds
+    """
+    start = time.time()
+    state = ScanState(store)
+    plan = plan_rescan(root, state, retry_failed)
+    scan_seconds = time.time() - start
+
+    summary = {
+        'files': plan['files'],
+        'unchanged': plan['unchanged'],
+        'new': plan['new'],
+        'changed': plan['changed'],
+        'moved': len(plan['moved']),
+        'touched': len(plan['touched']),
+        'deleted': len(plan['deleted']),
+        'unreadable': len(plan['unreadable']),
+        'analyzed': 0,
+        'failed': 0,
+        'scan_seconds': round(scan_seconds, 3),
+    }
+    if dry_run:
+        summary['elapsed_seconds'] = round(time.time() - start, 3)
+        return summary
+
+    # Eerst alles wat geen analyse kost: verplaatsingen, touches en verwijderingen
+    store.move((old, path) for old, path, *_ in plan['moved'])
+    store.delete(plan['deleted'])
+    state.apply(
+        upserts=[(path, size, mtime_ns, digest, 'ok') for _, path, size, mtime_ns, digest in plan['moved']]
+        + plan['touched'],
+        deletes=plan['deleted'] + [old for old, *_ in plan['moved']]
+    )
+
+    # Daarna de analyses; bestandsstatus pas na het opslaan van de resultaten bijwerken,
+    # zodat een onderbroken scan de volgende keer gewoon verder gaat
+    files = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in plan['analyze']}
+    pending, failed = [], []
+    writer = store.writer(analyzer, batch_size)
+
+    def flush():
+        writer.flush()
+        state.apply(upserts=pending)
+        pending.clear()
+
+    try:
+        records = analyze_paths(list(files), analyzer, workers, timeout, profile=profile, excerpts=excerpts)
+        for record in records:
+            path = record['path']
+            if record['status'] == 'ok':
+                writer.add(path, record['result'])
+                summary['analyzed'] += 1
+            else:
+                # Een oud resultaat van een gewijzigd bestand klopt niet meer
+                failed.append(path)
+                summary['failed'] += 1
+                print(f"❌ {path}: {record['error']}")
+            pending.append((path, *files[path], 'ok' if record['status'] == 'ok' else 'error'))
+            if len(pending) >= batch_size:
+                flush()
+    finally:
+        flush()
+        store.delete(failed)
+
+    summary['elapsed_seconds'] = round(time.time() - start, 3)
+    return summary
+
+
+def print_summary(summary, root):
+    print("\n" + "=" * 50)
+    print(f"🔄 RESCAN: {root}")
+    print("=" * 50)
+    print(f"📂 Bestanden:     {summary['files']} ({summary['unchanged']} ongewijzigd)")
+    print(f"🆕 Nieuw:         {summary['new']}")
+    print(f"✏️  Gewijzigd:     {summary['changed']} (+ {summary['touched']} alleen mtime)")
+    print(f"🚚 Verplaatst:    {summary['moved']}")
+    print(f"🗑️  Verwijderd:    {summary['deleted']}")
+    print(f"✅ Geanalyseerd:  {summary['analyzed']} ({summary['failed']} mislukt)")
+    print(f"⏱️  Tijd:          {summary['elapsed_seconds']:.1f} sec (scan {summary['scan_seconds']:.2f} sec)")
+    print("=" * 50)
+
+
+def watch(root, store, interval=DEFAULT_WATCH_INTERVAL, **options):
+    """
+    Herscan periodiek tot Ctrl+C (polling: werkt ook op netwerkschijven, zonder extra dependency)
+
+    Args:
+        root: Muziekmap
+        store: LibraryStore
+        interval: Seconden tussen scans (default: 300)
+        **options: Zie rescan()
+    """
+    print(f"👀 Watcher gestart op {root} (elke {interval:g} sec)")
+    try:
+        while True:
+            summary = rescan(root, store, **options)
+            changes = sum(summary[k] for k in ('new', 'changed', 'moved', 'touched', 'deleted'))
+            if changes:
+                print_summary(summary, root)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n👋 Watcher gestopt")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Herscan een muziekmap incrementeel')
+    parser.add_argument('directory', help='Muziekmap')
+    parser.add_argument('--library', required=True, help='Library database (SQLite)')
+    parser.add_argument('--analyzer', choices=('standalone', 'pro', 'simple'), default='standalone')
+    parser.add_argument('--workers', type=int, default=None, help='Aantal worker processen')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Timeout per track (sec)')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=None,
+                        help='Analyse profiel (default: archival)')
+    parser.add_argument('--excerpts', action='store_true', help='BPM/key op fragmenten (standalone)')
+    parser.add_argument('--retry-failed', action='store_true', help='Mislukte tracks opnieuw proberen')
+    parser.add_argument('--dry-run', action='store_true', help='Alleen tonen wat er zou gebeuren')
+    parser.add_argument('--watch', type=float, nargs='?', const=DEFAULT_WATCH_INTERVAL, default=None,
+                        metavar='SECONDS', help=f'Blijf herscannen (default interval: {DEFAULT_WATCH_INTERVAL} sec)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Geen directory: {args.directory}")
+
+    store = LibraryStore(args.library)
+    options = dict(analyzer=args.analyzer, workers=args.workers, timeout=args.timeout, profile=args.profile,
+                   excerpts=args.excerpts, retry_failed=args.retry_failed)
+
+    if args.watch is not None:
+        watch(args.directory, store, args.watch, **options)
+        return 0
+
+    summary = rescan(args.directory, store, dry_run=args.dry_run, **options)
+    print_summary(summary, args.directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,500 @@
+"""
+Library Store - SQLite database voor een geanalyseerde muziekbibliotheek
+- Scalaire velden (bpm, key, mode, camelot, confidences, duur, bitrate) in
+  geïndexeerde kolommen: queries op BPM bereik, key en duur zonder JSON te scannen
+- Het volledige resultaat (arrays, phrases, waveform) als binair blok per track in
+  een aparte blob directory (binary_export formaat, memory-mapped te laden)
+- WAL mode en gebundelde transacties: één commit per batch in plaats van per track
+
+Pro, standalone en simple resultaten kunnen door elkaar opgeslagen worden.
+
+Gebruik:
+    from library_store import LibraryStore
+    store = LibraryStore('library.sqlite')
+    store.put_many([(path, result), ...], analyzer='standalone')
+    store.query(bpm=(120, 128), camelot='8A', duration=(180, 420))
+
+    python library_store.py library.sqlite --import batch_analysis.jsonl
+    python library_store.py library.sqlite --bpm 120-128 --key "A minor"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from binary_export import from_bytes, to_bytes
+from key_engine import CAMELOT_WHEEL, get_camelot_notation
+
+
+DEFAULT_BATCH_SIZE = 200
+
+# Geïndexeerde kolommen en het resultaat veld (of de velden) waar ze vandaan komen
+SCALAR_COLUMNS = {
+    'title': ('title', 'song_name', 'songnaam'),
+    'bpm': ('bpm',),
+    'bpm_confidence': ('bpm_confidence',),
+    'key': ('key',),
+    'mode': ('mode',),
+    'camelot': ('camelot',),
+    'key_confidence': ('key_confidence',),
+    'duration': ('duration_seconds', 'duration'),
+    'bitrate': ('bitrate',),
+    'profile': ('profile',),
+}
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS tracks ('
+    ' path TEXT PRIMARY KEY,'
+    ' analyzer TEXT,'
+    ' title TEXT,'
+    ' bpm REAL,'
+    ' bpm_confidence REAL,'
+    ' key TEXT,'
+    ' mode TEXT,'
+    ' camelot TEXT,'
+    ' key_confidence REAL,'
+    ' duration REAL,'
+    ' bitrate INTEGER,'
+    ' profile TEXT,'
+    ' blob TEXT,'
+    ' analyzed_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_tracks_bpm ON tracks(bpm)',
+    'CREATE INDEX IF NOT EXISTS idx_tracks_camelot_bpm ON tracks(camelot, bpm)',
+    'CREATE INDEX IF NOT EXISTS idx_tracks_key_mode_bpm ON tracks(key, mode, bpm)',
+    'CREATE INDEX IF NOT EXISTS idx_tracks_duration ON tracks(duration)',
+)
+
+_COLUMNS = ('path', 'analyzer', *SCALAR_COLUMNS, 'blob', 'analyzed_at')
+
+
+def scalar_fields(result):
+    """
+    Haal de scalaire kolommen uit een analyse resultaat
+
+    Simple resultaten hebben key als 'A minor'; die wordt gesplitst in key en mode.
+    Zonder camelot (standalone, simple) wordt die uit key en mode afgeleid.
+
+    Returns:
+        Dictionary kolom -> waarde (None als het veld ontbreekt)
+    """
+    fields = {}
+    for column, sources in SCALAR_COLUMNS.items():
+        fields[column] = next((result[s] for s in sources if result.get(s) is not None), None)
+
+    if fields['key'] and not fields['mode'] and ' ' in str(fields['key']):
+        fields['key'], fields['mode'] = str(fields['key']).split(' ', 1)
+    if not fields['camelot'] and (fields['key'], fields['mode']) in CAMELOT_WHEEL:
+        fields['camelot'] = get_camelot_notation(fields['key'], fields['mode'])
+
+    for column in ('bpm', 'bpm_confidence', 'key_confidence', 'duration'):
+        if fields[column] is not None:
+            fields[column] = float(fields[column])
+    if fields['bitrate'] is not None:
+        fields['bitrate'] = int(fields['bitrate'])
+    return fields
+
+
+def _parse_range(value):
+    """(min, max), één getal (exact) of None; None als grens betekent open"""
+    if value is None:
+        return None, None
+    if isinstance(value, (int, float)):
+        return value, value
+    low, high = value
+    return low, high
+
+
+class LibraryStore:
+    """
+    SQLite bibliotheek met een blob directory voor de volledige resultaten
+
+    Args:
+        db_path: Pad naar de database (wordt aangemaakt)
+        blob_dir: Directory voor de binaire resultaten (default: <db_path>.blobs)
+    """
+
+    def __init__(self, db_path, blob_dir=None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.blob_dir = Path(blob_dir) if blob_dir else self.db_path.with_name(self.db_path.name + '.blobs')
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # Elke operatie een eigen connectie: veilig over threads en processen heen
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # In WAL mode is NORMAL veilig (geen corruptie) en veel sneller dan FULL
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @staticmethod
+    def blob_name(path):
+        """Bestandsnaam van de blob voor een track (hash van het pad)"""
+        return hashlib.blake2b(str(path).encode('utf-8'), digest_size=16).hexdigest() + '.bin'
+
+    def _write_blob(self, path, result):
+        name = self.blob_name(path)
+        data, _ = to_bytes(result, embed_metadata=True)
+        tmp = self.blob_dir / f"{name}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.blob_dir / name)
+        return name
+
+    def put_many(self, items, analyzer=None, store_blobs=True):
+        """
+        Sla een batch tracks op in één transactie (bestaande paden worden overschreven)
+
+        Args:
+            items: Iterable met (path, result) tuples
+            analyzer: Naam van de analyzer ('pro', 'standalone', 'simple')
+            store_blobs: Volledige resultaten in de blob directory opslaan (default: True)
+
+        Returns:
+            Aantal opgeslagen tracks
+        """
+        now = time.time()
+        rows = []
+        for path, result in items:
+            # Blobs vóór de transactie schrijven: de database lock blijft kort
+            blob = self._write_blob(path, result) if store_blobs else None
+            rows.append((str(path), analyzer, *scalar_fields(result).values(), blob, now))
+        if not rows:
+            return 0
+
+        placeholders = ', '.join('?' * len(_COLUMNS))
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                f"INSERT OR REPLACE INTO tracks ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return len(rows)
+
+    def put(self, path, result, analyzer=None):
+        """Sla één track op (gebruik put_many of writer() voor bulk writes)"""
+        return self.put_many([(path, result)], analyzer)
+
+    def writer(self, analyzer=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Returns:
+            BatchWriter die per batch_size tracks één transactie doet
+        """
+        return BatchWriter(self, analyzer, batch_size)
+
+    def delete(self, paths):
+        """
+        Verwijder tracks en hun blobs
+
+        Returns:
+            Aantal verwijderde tracks
+        """
+        paths = [str(p) for p in paths]
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            blobs = []
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                marks = ', '.join('?' * len(chunk))
+                blobs += [r['blob'] for r in conn.execute(
+                    f'SELECT blob FROM tracks WHERE path IN ({marks})', chunk) if r['blob']]
+                conn.execute(f'DELETE FROM tracks WHERE path IN ({marks})', chunk)
+            deleted = conn.total_changes
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        for blob in blobs:
+            try:
+                os.remove(self.blob_dir / blob)
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def move(self, moves):
+        """
+        Hernoem tracks (verplaatste bestanden) zonder opnieuw te analyseren
+
+        Args:
+            moves: Iterable met (oud pad, nieuw pad) tuples
+
+        Returns:
+            Aantal verplaatste tracks
+        """
+        moves = [(str(old), str(new)) for old, new in moves]
+        renamed = []
+        moved = 0
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for old, new in moves:
+                row = conn.execute('SELECT blob FROM tracks WHERE path = ?', (old,)).fetchone()
+                if row is None:
+                    continue
+                blob = self.blob_name(new) if row['blob'] else None
+                conn.execute('DELETE FROM tracks WHERE path = ?', (new,))
+                conn.execute('UPDATE tracks SET path = ?, blob = ? WHERE path = ?', (new, blob, old))
+                moved += 1
+                if blob:
+                    renamed.append((row['blob'], blob))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        # Blob namen volgen het pad (blob_name), zodat een nieuwe analyse de blob overschrijft
+        for old_blob, new_blob in renamed:
+            try:
+                os.replace(self.blob_dir / old_blob, self.blob_dir / new_blob)
+            except FileNotFoundError:
+                pass
+        return moved
+
+    def _build_query(self, bpm=None, key=None, mode=None, camelot=None, duration=None, analyzer=None):
+        if key and ' ' in key and mode is None:
+            key, mode = key.split(' ', 1)
+        clauses, params = [], []
+        for column, value in (('key', key), ('mode', mode), ('camelot', camelot), ('analyzer', analyzer)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        for column, value in (('bpm', bpm), ('duration', duration)):
+            low, high = _parse_range(value)
+            if low is not None:
+                clauses.append(f'{column} >= ?')
+                params.append(float(low))
+            if high is not None:
+                clauses.append(f'{column} <= ?')
+                params.append(float(high))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, bpm=None, key=None, mode=None, camelot=None, duration=None, analyzer=None,
+              order_by='bpm', limit=None):
+        """
+        Zoek tracks via de indexen
+
+        Args:
+            bpm: (min, max) BPM bereik, of één BPM (grenzen mogen None zijn)
+            key: Toonsoort (bijv. 'A'); 'A minor' zet ook mode
+            mode: 'major' of 'minor'
+            camelot: Camelot code (bijv. '8A')
+            duration: (min, max) duur in seconden
+            analyzer: Alleen tracks van deze analyzer
+            order_by: Kolom om op te sorteren (default: 'bpm')
+            limit: Maximaal aantal resultaten (default: alle)
+
+        Returns:
+            Lijst met dictionaries (de kolommen van de tracks tabel)
+        """
+        if order_by not in _COLUMNS:
+            raise ValueError(f"Onbekende kolom: {order_by}")
+
+        where, params = self._build_query(bpm, key, mode, camelot, duration, analyzer)
+        sql = f'SELECT * FROM tracks{where} ORDER BY {order_by}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def query_plan(self, **filters):
+        """
+        Returns:
+            SQLite query plan van query(**filters) (controle dat een index gebruikt wordt)
+        """
+        filters.pop('limit', None)
+        order_by = filters.pop('order_by', 'bpm')
+        where, params = self._build_query(**filters)
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'EXPLAIN QUERY PLAN SELECT * FROM tracks{where} ORDER BY {order_by}', params)
+            return [row['detail'] for row in rows]
+        finally:
+            conn.close()
+
+    def get(self, path, full=False):
+        """
+        Haal een track op
+
+        Args:
+            path: Pad van de track
+            full: Volledig resultaat uit de blob laden, arrays memory-mapped (default: False)
+
+        Returns:
+            Dictionary met de kolommen (en bij full=True 'result'), of None
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM tracks WHERE path = ?', (str(path),)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        track = dict(row)
+        if full and track['blob']:
+            track['result'] = from_bytes(np.memmap(self.blob_dir / track['blob'], dtype=np.uint8, mode='r'))
+        return track
+
+    def paths(self):
+        """Alle opgeslagen paden"""
+        conn = self._connect()
+        try:
+            return [row['path'] for row in conn.execute('SELECT path FROM tracks')]
+        finally:
+            conn.close()
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary met aantal tracks, per analyzer, en grootte van database en blobs in bytes
+        """
+        conn = self._connect()
+        try:
+            per_analyzer = {row[0]: row[1] for row in
+                            conn.execute('SELECT analyzer, COUNT(*) FROM tracks GROUP BY analyzer')}
+        finally:
+            conn.close()
+        db_bytes = sum(p.stat().st_size for p in self.db_path.parent.glob(self.db_path.name + '*') if p.is_file())
+        blob_bytes = sum(p.stat().st_size for p in self.blob_dir.glob('*.bin'))
+        return {'tracks': sum(per_analyzer.values()), 'per_analyzer': per_analyzer,
+                'db_bytes': db_bytes, 'blob_bytes': blob_bytes}
+
+    def import_jsonl(self, jsonl_file, batch_size=DEFAULT_BATCH_SIZE, store_blobs=True):
+        """
+        Importeer geslaagde tracks uit een batch_analyzer JSON lines bestand
+
+        Returns:
+            Aantal geïmporteerde tracks
+        """
+        count = 0
+        writers = {}
+        with open(jsonl_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('status') != 'ok' or not isinstance(record.get('result'), dict):
+                    continue
+                analyzer = record.get('analyzer')
+                if analyzer not in writers:
+                    writers[analyzer] = BatchWriter(self, analyzer, batch_size, store_blobs)
+                writers[analyzer].add(record['path'], record['result'])
+                count += 1
+        for writer in writers.values():
+            writer.flush()
+        return count
+
+
+class BatchWriter:
+    """
+    Buffert tracks en schrijft ze per batch in één transactie
+
+    Gebruik:
+        with store.writer('standalone') as writer:
+            for path, result in results:
+                writer.add(path, result)
+    """
+
+    def __init__(self, store, analyzer=None, batch_size=DEFAULT_BATCH_SIZE, store_blobs=True):
+        self.store = store
+        self.analyzer = analyzer
+        self.batch_size = max(1, int(batch_size))
+        self.store_blobs = store_blobs
+        self.written = 0
+        self._pending = []
+
+    def add(self, path, result):
+        self._pending.append((path, result))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.written += self.store.put_many(self._pending, self.analyzer, self.store_blobs)
+            self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+def _range_arg(text):
+    """'120-128', '120-' of '-128' naar (min, max)"""
+    low, _, high = text.partition('-')
+    return (float(low) if low else None, float(high) if high else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Muziekbibliotheek database')
+    parser.add_argument('database', help='Pad naar de SQLite database')
+    parser.add_argument('--import', dest='import_file', help='Importeer een batch_analyzer JSON lines bestand')
+    parser.add_argument('--no-blobs', action='store_true', help='Alleen scalaire velden importeren')
+    parser.add_argument('--bpm', type=_range_arg, help='BPM bereik, bijv. 120-128')
+    parser.add_argument('--duration', type=_range_arg, help='Duur bereik in seconden, bijv. 180-420')
+    parser.add_argument('--key', help="Toonsoort, bijv. 'A' of 'A minor'")
+    parser.add_argument('--camelot', help='Camelot code, bijv. 8A')
+    parser.add_argument('--limit', type=int, help='Maximaal aantal resultaten')
+    parser.add_argument('--stats', action='store_true', help='Toon database statistieken')
+    args = parser.parse_args(argv)
+
+    store = LibraryStore(args.database)
+
+    if args.import_file:
+        start = time.time()
+        count = store.import_jsonl(args.import_file, store_blobs=not args.no_blobs)
+        print(f"💾 {count} tracks geïmporteerd in {time.time() - start:.1f} sec")
+
+    if args.stats:
+        print(json.dumps(store.stats(), indent=2))
+
+    if args.bpm or args.duration or args.key or args.camelot:
+        tracks = store.query(bpm=args.bpm, key=args.key, camelot=args.camelot, duration=args.duration,
+                             limit=args.limit)
+        for t in tracks:
+            duration = f"{t['duration']:.0f}s" if t['duration'] is not None else '?'
+            print(f"🎵 {t['bpm'] or 0:6.1f} BPM  {t['camelot'] or '?':>3}  {duration:>5}  {t['title'] or t['path']}")
+        print(f"✅ {len(tracks)} tracks gevonden")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
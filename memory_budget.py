@@ -0,0 +1,165 @@
+"""
+Memory Budget - Analyse binnen een vaste geheugenlimiet (piek RSS)
+- Meet het RSS van het proces (huidig en piek) via /proc, zonder extra dependencies
+- Kiest blokgroottes voor de STFT pass en de tempogram segmenten zodat de piek
+  RSS onder de limiet blijft; wat de track zelf per frame vasthoudt (mel dB,
+  onset, RMS, chroma, energie) gaat eerst van het budget af
+- Een budget dat niet eens het kleinste blok toelaat geeft direct een MemoryError,
+  in plaats van halverwege de analyse (en de buren op dezelfde node) om te vallen
+
+De kosten per frame zijn gemeten op librosa 0.10 (float32 signaal, complex64 STFT)
+met een veiligheidsmarge; zie plan_budget.
+
+Het default budget kan via de environment variabele MUSIC_ANALYZER_MEMORY_MB
+worden ingesteld (leeg = geen budget). Het budget en de piek RSS gelden voor het hele
+proces: één budget analyse tegelijk per proces (de web app gebruikt geen budget).
+
+Gebruik:
+    from memory_budget import plan_budget, reset_peak_rss, peak_rss_mb
+    plan = plan_budget(768, duration=600, sr=44100, n_fft=2048, hop_length=512)
+    plan['block_seconds'], plan['segment_frames']
+"""
+
+import os
+import resource
+
+import librosa
+
+
+DEFAULT_MEMORY_MB = float(os.environ['MUSIC_ANALYZER_MEMORY_MB']) if os.environ.get('MUSIC_ANALYZER_MEMORY_MB') else None
+
+# RSS kosten per STFT bin per frame in een blok: STFT (complex64), magnitude, power,
+# mel en chroma, plus de tuning schatting (piptrack) op het eerste blok
+BLOCK_BYTES_PER_BIN = 48
+
+# RSS kosten per seconde audio in een blok vóór de analyse: gedecodeerd blok op de
+# sample rate van het bestand (uitgaande van 48 kHz stereo float32) plus mono en resampled kopie
+DECODE_BYTES_PER_SECOND = 48000 * 4 * 4
+
+# RSS kosten per autocorrelatie lag per frame in een tempogram segment (inclusief de
+# overlap van een half venster aan beide kanten)
+SEGMENT_BYTES_PER_LAG = 56
+
+# Wat de analyse per frame vasthoudt: tijdens de STFT pass de mel spectrogram in dB voor
+# de exacte onset envelope (128 × float32), daarna onset, RMS, chroma, energie en de
+# JSON lijst met energie
+FRAME_BYTES = 600
+
+# Deel van het beschikbare geheugen dat een blok mag gebruiken (allocator overhead, fragmentatie)
+SAFETY = 0.8
+
+MIN_BLOCK_FRAMES = 256
+MIN_SEGMENT_FRAMES = 1024
+MAX_BLOCK_SECONDS = 30
+MAX_SEGMENT_FRAMES = 16384
+
+# Aangenomen duur als de header van het bestand geen duur geeft
+UNKNOWN_DURATION = 3600
+
+_MB = 1024 * 1024
+
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """
+    Returns:
+        Huidig RSS van het proces in MB (piek RSS als /proc niet beschikbaar is)
+    """
+    current = _status_mb('VmRSS')
+    return current if current is not None else peak_rss_mb()
+
+
+def peak_rss_mb():
+    """
+    Returns:
+        Piek RSS van het proces in MB (sinds de start of de laatste reset_peak_rss)
+    """
+    peak = _status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    # ru_maxrss is in KB op Linux en in bytes op macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / _MB if os.uname().sysname == 'Darwin' else maxrss / 1024
+
+
+def reset_peak_rss():
+    """
+    Zet de piek RSS terug naar het huidige RSS (Linux, /proc/self/clear_refs)
+
+    Returns:
+        True als dat gelukt is; anders blijft peak_rss_mb de piek sinds de start van het proces
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def plan_budget(memory_mb, duration, sr, n_fft, hop_length, baseline_mb=None):
+    """
+    Kies blokgroottes zodat de piek RSS van een analyse onder memory_mb blijft
+
+    Args:
+        memory_mb: Limiet voor de piek RSS van het proces in MB
+        duration: (Geschatte) duur van de track in seconden (None = UNKNOWN_DURATION)
+        sr: Sample rate van de analyse
+        n_fft: FFT grootte
+        hop_length: Aantal samples tussen frames
+        baseline_mb: RSS vóór de analyse (default: huidig RSS van het proces)
+
+    Returns:
+        Dictionary met memory_mb, baseline_mb, track_mb (wat de track per frame vasthoudt),
+        available_mb, block_frames, block_seconds, segment_frames en estimated_peak_mb
+
+    Raises:
+        MemoryError: Als het budget niet eens het kleinste blok toelaat
+    """
+    if baseline_mb is None:
+        baseline_mb = rss_mb()
+    duration = UNKNOWN_DURATION if duration is None else duration
+
+    n_frames = 1 + int(duration * sr) // hop_length
+    track_mb = n_frames * FRAME_BYTES / _MB
+    available_mb = (memory_mb - baseline_mb - track_mb) * SAFETY
+
+    block_cost = (n_fft // 2 + 1) * BLOCK_BYTES_PER_BIN + hop_length / sr * DECODE_BYTES_PER_SECOND
+    # Tempogram venster van 8 seconden (streaming_analysis.tempo_segmented)
+    lags = int(librosa.time_to_frames(8.0, sr=sr, hop_length=hop_length))
+    segment_cost = lags * SEGMENT_BYTES_PER_LAG
+
+    def peak_mb(block_frames, segment_frames):
+        return max(block_frames * block_cost, (segment_frames + lags) * segment_cost) / _MB
+
+    max_block_frames = int(MAX_BLOCK_SECONDS * sr / hop_length)
+    block_frames = min(int(available_mb * _MB // block_cost), max_block_frames)
+    segment_frames = min(int(available_mb * _MB / segment_cost) - lags, MAX_SEGMENT_FRAMES)
+
+    if block_frames < MIN_BLOCK_FRAMES or segment_frames < MIN_SEGMENT_FRAMES:
+        needed = baseline_mb + track_mb + peak_mb(MIN_BLOCK_FRAMES, MIN_SEGMENT_FRAMES) / SAFETY
+        raise MemoryError(
+            f"Geheugenbudget van {memory_mb:.0f} MB te klein voor deze track "
+            f"(proces {baseline_mb:.0f} MB, track {track_mb:.0f} MB; minimaal ~{needed:.0f} MB nodig)"
+        )
+
+    return {
+        'memory_mb': memory_mb,
+        'baseline_mb': round(baseline_mb, 1),
+        'track_mb': round(track_mb, 1),
+        'available_mb': round(available_mb, 1),
+        'block_frames': block_frames,
+        'block_seconds': round(block_frames * hop_length / sr, 3),
+        'segment_frames': segment_frames,
+        'estimated_peak_mb': round(baseline_mb + track_mb + peak_mb(block_frames, segment_frames), 1),
+    }
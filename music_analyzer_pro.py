@@ -7,35 +7,40 @@ Music Analyzer Pro - Verbeterde versie met Rekordbox-achtige functionaliteit
 - Phrase detection (intro/verse/chorus)
 """
 
-import librosa
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import contextlib
+import io
 import json
 import os
-from pathlib import Path
+import threading
 from scipy.signal import find_peaks
 
+from analysis_cache import get_default_cache
+from analysis_context import AnalysisContext
+from analysis_profiles import ALL_DETECTORS, cache_params, get_profile
+from audio_source import as_source
+from beat_grid import beat_grid
+from binary_export import export_binary
+from key_engine import CAMELOT_WHEEL, KEYS, estimate_key, get_camelot_notation
+from memory_budget import DEFAULT_MEMORY_MB, peak_rss_mb, plan_budget, reset_peak_rss
+from segmentation import segment_phrases
+from stage_metrics import NULL_RECORDER, StageRecorder
+from streaming_analysis import analyze_signal, analyze_stream, stream_duration
+from waveform_render import IMAGE_DPI, figure_pixels, min_max_line, plot_waveform_envelope
 
-# Keys voor key detectie
-KEYS = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-# Krumhansl-Schmuckler profiles voor majeur en minor
-# Deze zijn gebaseerd op psychologisch onderzoek naar tooncentrum perceptie
-MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+# Versie van de analyse algoritmes (verhogen bij wijzigingen die resultaten beïnvloeden,
+# zodat oude cache entries niet meer gebruikt worden)
+ALGORITHM_VERSION = 5
 
-# Camelot Wheel mapping (zoals Rekordbox gebruikt)
-# Format: (key, mode) -> (camelot_number, camelot_letter)
-CAMELOT_WHEEL = {
-    ('C', 'major'): (8, 'B'), ('C#', 'major'): (3, 'B'), ('D', 'major'): (10, 'B'),
-    ('D#', 'major'): (5, 'B'), ('E', 'major'): (12, 'B'), ('F', 'major'): (7, 'B'),
-    ('F#', 'major'): (2, 'B'), ('G', 'major'): (9, 'B'), ('G#', 'major'): (4, 'B'),
-    ('A', 'major'): (11, 'B'), ('A#', 'major'): (6, 'B'), ('B', 'major'): (1, 'B'),
-    ('C', 'minor'): (5, 'A'), ('C#', 'minor'): (12, 'A'), ('D', 'minor'): (7, 'A'),
-    ('D#', 'minor'): (2, 'A'), ('E', 'minor'): (9, 'A'), ('F', 'minor'): (4, 'A'),
-    ('F#', 'minor'): (11, 'A'), ('G', 'minor'): (6, 'A'), ('G#', 'minor'): (1, 'A'),
-    ('A', 'minor'): (8, 'A'), ('A#', 'minor'): (3, 'A'), ('B', 'minor'): (10, 'A'),
-}
+# Resolutie van de feature output: 'frames' (energie per frame) of 'beats'
+# (beat grid met energie per beat en energie en chroma per maat)
+RESOLUTIONS = ('frames', 'beats')
+
+# Of de blokgewijze analyse in dit proces al een keer gedraaid heeft (zie _warm_up_streaming)
+_streaming_warmed_up = False
+_streaming_warm_up_lock = threading.Lock()
 
 
 def load_audio(filename, sample_rate=44100):
@@ -43,43 +48,48 @@ def load_audio(filename, sample_rate=44100):
     Laad audio bestand in
     
     Args:
-        filename: Pad naar audio bestand (mp3/wav)
+        filename: Pad naar audio bestand (mp3/wav), bytes, stream of AudioSource
         sample_rate: Sample rate in Hz (default: 44100)
     
     Returns:
         y: Audio time series
         sr: Sample rate
     """
-    print(f"Laden van track: {filename}")
-    y, sr = librosa.load(filename, sr=sample_rate)
-    print(f"Track geladen: {filename}, Sample Rate: {sr}, Lengte: {len(y)/sr:.2f} sec")
+    source = as_source(filename)
+    label = source.path or source.name
+    print(f"Laden van track: {label}")
+    y, sr = source.load(sample_rate)
+    print(f"Track geladen: {label}, Sample Rate: {sr}, Lengte: {len(y)/sr:.2f} sec")
     return y, sr
 
 
-def detect_bpm_improved(y, sr):
+def detect_bpm_improved(y, sr, ctx=None):
     """
     Verbeterde BPM detectie met multi-tempo analyse (zoals Rekordbox)
     
     Args:
         y: Audio time series
         sr: Sample rate
+        ctx: Optionele AnalysisContext (hergebruikt de onset envelope)
     
     Returns:
         tempo: BPM waarde (meest waarschijnlijke)
         tempo_confidence: Betrouwbaarheid (0-1)
         beat_frames: Frames waar beats voorkomen
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Methode 1: Standaard beat tracking
-    tempo1, beat_frames = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    tempo1, beat_frames = ctx.beat_track(units='time')
     tempo1 = float(tempo1[0] if isinstance(tempo1, np.ndarray) else tempo1)
     
     # Methode 2: Tempogram analyse (meer robuust)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    tempo2 = librosa.beat.tempo(onset_envelope=onset_env, sr=sr, aggregate=np.median)
+    tempo2 = ctx.tempo(aggregate=np.median)
     tempo2 = float(tempo2[0] if isinstance(tempo2, np.ndarray) else tempo2)
     
     # Methode 3: Multi-tempo detectie
-    tempos = librosa.beat.tempo(y=y, sr=sr, aggregate=None)
+    tempos = ctx.tempo(aggregate=None)
     if isinstance(tempos, np.ndarray) and len(tempos) > 0:
         tempo3 = float(np.median(tempos))
     else:
@@ -106,7 +116,7 @@ def detect_bpm_improved(y, sr):
     return final_tempo, confidence, beat_frames
 
 
-def detect_key_krumhansl_schmuckler(y, sr):
+def detect_key_krumhansl_schmuckler(y, sr, ctx=None):
     """
     Verbeterde key detectie met Krumhansl-Schmuckler algoritme
     Detecteert zowel chroma als majeur/minor mode
@@ -114,6 +124,7 @@ def detect_key_krumhansl_schmuckler(y, sr):
     Args:
         y: Audio time series
         sr: Sample rate
+        ctx: Optionele AnalysisContext (hergebruikt het power spectrogram)
     
     Returns:
         key: Toonsoort (bijv. 'C', 'D#', etc.)
@@ -122,41 +133,17 @@ def detect_key_krumhansl_schmuckler(y, sr):
         confidence: Betrouwbaarheid (0-1)
         camelot: Camelot notation (bijv. '8B', '5A')
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Chromagram voor tonaliteit
-    chromagram = librosa.feature.chroma_stft(y=y, sr=sr)
+    chromagram = ctx.chromagram
     
     # Gemiddelde chroma vector
     chroma_mean = np.mean(chromagram, axis=1)
     
-    # Normaliseer chroma vector
-    chroma_norm = chroma_mean / (np.sum(chroma_mean) + 1e-6)
-    
-    # Test alle 24 mogelijkheden (12 keys × 2 modes)
-    correlations = []
-    
-    for key_idx in range(12):
-        # Rotate profiles voor elke key
-        major_rotated = np.roll(MAJOR_PROFILE, key_idx)
-        minor_rotated = np.roll(MINOR_PROFILE, key_idx)
-        
-        # Bereken correlatie
-        major_corr = np.corrcoef(chroma_norm, major_rotated)[0, 1]
-        minor_corr = np.corrcoef(chroma_norm, minor_rotated)[0, 1]
-        
-        correlations.append((key_idx, 'major', major_corr))
-        correlations.append((key_idx, 'minor', minor_corr))
-    
-    # Vind beste match
-    best_match = max(correlations, key=lambda x: x[2])
-    key_index, mode, correlation = best_match
-    
-    # Normaliseer confidence (correlatie kan negatief zijn)
-    confidence = max(0, min(1, (correlation + 1) / 2))
-    
-    key = KEYS[key_index]
-    
-    # Converteer naar Camelot notation
-    camelot = get_camelot_notation(key, mode)
+    # Correleer met alle 24 key profielen in één matrix vermenigvuldiging
+    key, mode, key_index, confidence, camelot = estimate_key(chroma_mean)
     
     print(f"Key: {key} {mode} (confidence: {confidence:.2f})")
     print(f"Camelot: {camelot}")
@@ -164,37 +151,24 @@ def detect_key_krumhansl_schmuckler(y, sr):
     return key, mode, key_index, confidence, camelot
 
 
-def get_camelot_notation(key, mode):
-    """
-    Converteer key en mode naar Camelot wheel notation
-    
-    Args:
-        key: Toonsoort (bijv. 'C', 'D#')
-        mode: 'major' of 'minor'
-    
-    Returns:
-        Camelot notation string (bijv. '8B', '5A')
-    """
-    camelot = CAMELOT_WHEEL.get((key, mode))
-    if camelot:
-        return f"{camelot[0]}{camelot[1]}"
-    return "?"
-
-
-def calculate_energy(y, sr):
+def calculate_energy(y, sr, ctx=None):
     """
     Bereken energie (RMS) van het nummer
     
     Args:
         y: Audio time series
         sr: Sample rate
+        ctx: Optionele AnalysisContext (hergebruikt de STFT magnitude)
     
     Returns:
         energy: Genormaliseerde energie array (0-1)
         rms: Ruwe RMS waarden
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # RMS = Root Mean Square (energie)
-    rms = librosa.feature.rms(y=y)[0]
+    rms = ctx.rms
     
     # Normaliseer energie naar 0-1
     if rms.max() - rms.min() > 0:
@@ -205,15 +179,16 @@ def calculate_energy(y, sr):
     return energy, rms
 
 
-def detect_peaks_improved(energy, y, sr, prominence=0.1):
+def detect_peaks_improved(energy, y, sr, prominence=0.1, duration=None):
     """
     Verbeterde peak detectie met scipy.signal.find_peaks
     
     Args:
         energy: Energie array
-        y: Audio time series
+        y: Audio time series (None als duration gegeven is)
         sr: Sample rate
         prominence: Minimum prominence voor peaks (default: 0.1)
+        duration: Duur in seconden, als het signaal niet in het geheugen staat (geheugenbudget)
     
     Returns:
         peaks: Array met frame indices waar peaks voorkomen
@@ -228,7 +203,8 @@ def detect_peaks_improved(energy, y, sr, prominence=0.1):
     )
     
     # Zet frame-indexen om naar seconden
-    peak_times = peaks * (len(y)/len(energy)) / sr
+    n_samples = len(y) if y is not None else duration * sr
+    peak_times = peaks * (n_samples/len(energy)) / sr
     peak_heights = energy[peaks]
     
     print(f"Peaks gevonden: {len(peaks)} (met prominence={prominence})")
@@ -236,41 +212,26 @@ def detect_peaks_improved(energy, y, sr, prominence=0.1):
     return peaks, peak_times, peak_heights
 
 
-def detect_phrases(y, sr, energy, beat_frames):
+def detect_phrases(y, sr, energy, beat_frames, chroma=None, duration=None):
     """
     Detecteer muzikale frases (intro, verse, chorus, outro)
-    Gebaseerd op energie patronen en beat structure
+    Beat-synchrone segmentatie: novelty op een self-similarity matrix van de
+    beats, met grenzen op het 8/16/32-beat phrase grid (zie segmentation.py)
     
     Args:
         y: Audio time series
         sr: Sample rate
         energy: Energie array
-        beat_frames: Beat frames
+        beat_frames: Tijden van de beats in seconden (uit detect_bpm_improved)
+        chroma: Optioneel chromagram (zelfde frames als energy) voor harmonische wissels
+        duration: Duur in seconden als y None is (geheugenbudget)
     
     Returns:
-        phrases: Dictionary met gedetecteerde frases
+        phrases: Dictionary met gedetecteerde frases (per type een lijst met (start, end))
     """
-    duration = len(y) / sr
-    
-    # Segment track in delen op basis van energie
-    # Gebruik sliding window om energie gemiddelden te berekenen
-    window_size = int(len(energy) / 20)  # 5% van track
-    energy_smooth = []
-    
-    for i in range(len(energy) - window_size):
-        energy_smooth.append(np.mean(energy[i:i+window_size]))
-    
-    energy_smooth = np.array(energy_smooth)
-    
-    # Vind energie veranderingen (mogelijke phrase boundaries)
-    energy_diff = np.diff(energy_smooth)
-    threshold = np.std(energy_diff) * 1.5
-    
-    # Detecteer significante veranderingen
-    changes = np.where(np.abs(energy_diff) > threshold)[0]
-    
-    # Converteer naar seconden
-    change_times = changes * (len(y)/len(energy)) / sr
+    if y is not None:
+        duration = len(y) / sr
+    segments = segment_phrases(beat_frames, energy, duration, chroma=chroma)
     
     # Classificeer frases op basis van positie en energie
     phrases = {
@@ -279,31 +240,8 @@ def detect_phrases(y, sr, energy, beat_frames):
         'chorus': [],
         'outro': []
     }
-    
-    if len(change_times) > 0:
-        # Eerste deel = waarschijnlijk intro
-        if change_times[0] > 10:
-            phrases['intro'].append((0, change_times[0]))
-        
-        # Laatste deel = waarschijnlijk outro
-        if duration - change_times[-1] > 10:
-            phrases['outro'].append((change_times[-1], duration))
-        
-        # Midden delen: hoge energie = chorus, lage = verse
-        for i in range(len(change_times) - 1):
-            start = change_times[i]
-            end = change_times[i + 1]
-            mid_time = (start + end) / 2
-            
-            # Bepaal energie niveau in dit segment
-            mid_idx = int(mid_time * len(energy) / duration)
-            if mid_idx < len(energy):
-                seg_energy = np.mean(energy[max(0, mid_idx-50):min(len(energy), mid_idx+50)])
-                
-                if seg_energy > 0.6:
-                    phrases['chorus'].append((start, end))
-                else:
-                    phrases['verse'].append((start, end))
+    for segment in segments:
+        phrases[segment['label']].append((segment['start'], segment['end']))
     
     print(f"Phrases gedetecteerd:")
     for phrase_type, segments in phrases.items():
@@ -313,50 +251,326 @@ def detect_phrases(y, sr, energy, beat_frames):
     return phrases
 
 
-def analyze_track_pro(filename, sample_rate=44100, visualize=True, export=True):
+class ProAnalysisResult:
+    """
+    Interne uitkomst van een pro analyse
+    
+    Bevat naast de JSON-klare data ook het gedecodeerde signaal en de NumPy
+    feature arrays, zodat visualisatie en latere stappen niet opnieuw decoden.
+    Bij een cache hit is het signaal nog niet geladen; signal() laadt het dan één keer.
+    
+    Attributes:
+        data: Dictionary met alle analyse resultaten (zoals analyze_track_pro)
+        y: Audio time series (None bij een cache hit tot signal() is aangeroepen)
+        sr: Sample rate
+        energy: Genormaliseerde energie array (float32)
+        peak_times: Tijden van de peaks in seconden
+        beat_times: Tijden van de beats in seconden (None bij een cache hit)
+        from_cache: True als de data uit de cache kwam
+    """
+    
+    def __init__(self, data, filename, y=None, sr=None, energy=None, peak_times=None,
+                 beat_times=None, from_cache=False):
+        self.data = data
+        self.filename = filename
+        self.y = y
+        self.sr = sr if sr is not None else data["sample_rate"]
+        if energy is None:
+            energy = np.asarray(data.get("energy", []), dtype=np.float32)
+        if peak_times is None:
+            peak_times = np.asarray(data["peaks"])
+        self.energy = energy
+        self.peak_times = peak_times
+        self.beat_times = beat_times
+        self.from_cache = from_cache
+    
+    def signal(self):
+        """
+        Returns:
+            y: Audio time series (wordt alleen geladen als dat nog niet gebeurd is)
+            sr: Sample rate
+        """
+        if self.y is None:
+            self.y, self.sr = load_audio(self.filename, self.sr)
+        return self.y, self.sr
+
+
+def analyze_track_pro(filename, sample_rate=None, visualize=True, export=True, use_cache=True, profile=None,
+                      export_format='json', instrument=False, track_memory=False, name=None,
+                      resolution='frames', memory_mb=DEFAULT_MEMORY_MB):
     """
     Verbeterde volledige analyse van een enkele track (Rekordbox-achtig)
     
     Args:
-        filename: Pad naar audio bestand
-        sample_rate: Sample rate (default: 44100)
+        filename: Pad naar audio bestand, of de inhoud als bytes, BytesIO of leesbare stream
+        sample_rate: Sample rate (default: die van het profiel, archival = 44100)
         visualize: Of visualisatie moet worden getoond (default: True)
         export: Of data moet worden geëxporteerd (default: True)
+        use_cache: Of de persistente analyse cache gebruikt wordt (default: True)
+                   Met visualize=True wordt altijd opnieuw geanalyseerd (audio nodig)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
+        export_format: 'json' of 'binary' (.bin met arrays plus JSON sidecar) (default: 'json')
+        instrument: Tijd per stap meten en als 'stage_metrics' toevoegen (default: False)
+        track_memory: Ook de piek allocatie per stap meten (tracemalloc, trager) (default: False)
+        name: Bestandsnaam voor titel en export bij in-memory input (default: naam van de stream)
+        resolution: 'frames' (energie per frame, default) of 'beats': in plaats van de
+                    frame energie een beat grid met beat_energy en bars (energie, chroma
+                    en dominante toon per maat), compact als base64 uint8 (zie beat_grid.py)
+        memory_mb: Limiet voor de piek RSS van het proces in MB (default: MUSIC_ANALYZER_MEMORY_MB,
+                   None = geen limiet). De track wordt dan in blokken gedecodeerd en
+                   geanalyseerd (zie memory_budget.py); een te klein budget geeft een MemoryError.
+                   Het budget (en de gemeten piek) geldt voor het hele proces: niet gebruiken
+                   met meerdere gelijktijdige analyses in één proces (threads)
     
     Returns:
         Dictionary met alle analyse resultaten
     """
+    stages = StageRecorder(track_memory=track_memory) if instrument or track_memory else None
+    try:
+        return run_analysis_pro(filename, sample_rate, visualize, export, use_cache, profile, export_format,
+                                stages, name, resolution, memory_mb).data
+    finally:
+        if stages is not None:
+            stages.finish()
+
+
+def run_analysis_pro(filename, sample_rate=None, visualize=True, export=True, use_cache=True, profile=None,
+                     export_format='json', stages=None, name=None, resolution='frames',
+                     memory_mb=DEFAULT_MEMORY_MB):
+    """
+    Zelfde als analyze_track_pro, maar retourneert een ProAnalysisResult
+    met het gedecodeerde signaal en de feature arrays
+    
+    Args:
+        stages: Optionele StageRecorder; de metingen komen in data['stage_metrics']
+                (de caller kan er daarna nog stappen aan toevoegen, bijv. 'render')
+    
+    Returns:
+        ProAnalysisResult
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Onbekende resolutie: {resolution} (kies uit {', '.join(RESOLUTIONS)})")
+    source = as_source(filename, name)
+    
+    print("\n" + "="*50)
+    print(f"🎵 PRO ANALYSE: {source.name}")
+    print("="*50)
+    
+    config = get_profile(profile, sample_rate)
+    computed = []
+    
+    def compute():
+        result = _analyze_signal_pro(source, config, visualize, stages, resolution, memory_mb)
+        computed.append(result)
+        return result.data
+    
+    if memory_mb:
+        reset_peak_rss()
+    
+    cache = get_default_cache() if use_cache and not visualize else None
+    if cache is not None:
+        params = {**cache_params(config), "resolution": resolution}
+        if memory_mb:
+            # Blokgewijze analyse: tuning en mediaan tempo kunnen marginaal afwijken
+            params["memory_budget"] = True
+        data, hit = cache.cached_call(f"pro:{ALGORITHM_VERSION}", source.cache_input(), params, compute)
+        if hit:
+            print("⚡ Resultaat uit cache")
+        # Bestandsafhankelijke velden horen bij dit pad, niet bij de gecachte inhoud
+        data["title"] = source.name
+        data["filename"] = source.path or source.name
+    else:
+        data = compute()
+    
+    if computed:
+        result = computed[0]
+    else:
+        result = ProAnalysisResult(data, source, from_cache=True)
+    
+    # Na de cache: metingen horen bij deze aanroep, niet bij de gecachte inhoud
+    if stages is not None:
+        data["stage_metrics"] = stages.as_dict()
+    if memory_mb:
+        data["memory"] = {"limit_mb": memory_mb, "peak_rss_mb": round(peak_rss_mb(), 1)}
+    
+    if export and export_format == 'binary':
+        bin_file, json_file = export_binary(data, f"{source.stem}_pro_analysis")
+        print(f"💾 Geëxporteerd naar: {bin_file} (+ {json_file})")
+    elif export:
+        output_file = f"{source.stem}_pro_analysis.json"
+        with open(output_file, "w") as f:
+            json.dump(data, f, indent=4)
+        print(f"💾 Geëxporteerd naar: {output_file}")
+    
+    # Samenvatting
+    duration = data["duration_seconds"]
     print("\n" + "="*50)
-    print(f"🎵 PRO ANALYSE: {Path(filename).name}")
+    print("📊 PRO ANALYSE SAMENVATTING")
     print("="*50)
+    print(f"📁 Bestand:     {source.name}")
+    print(f"🎵 BPM:         {data['bpm']} ({data['bpm_confidence']*100:.0f}% confidence)")
+    print(f"🎹 Key:         {data['key']} {data['mode']} ({data['key_confidence']*100:.0f}% confidence)")
+    print(f"🎯 Camelot:     {data['camelot']}")
+    print(f"⏱️  Duur:        {duration:.2f} sec ({duration/60:.2f} min)")
+    print(f"⚙️  Profiel:     {data['profile']}")
+    print(f"📈 Peaks:       {len(data['peaks'])} gevonden")
+    print(f"🎼 Phrases:     {sum(len(v) for v in data['phrases'].values())} segmenten")
+    print(f"🥁 Beats:       {len(data['beats'])}" + (f" ({data['bars']['count']} maten)" if "bars" in data else ""))
+    if "memory" in data:
+        print(f"💾 Geheugen:    piek {data['memory']['peak_rss_mb']:.0f} MB RSS (limiet {data['memory']['limit_mb']:.0f} MB)")
+    if data.get("stage_metrics"):
+        print("⏱️  Tijd per stap:")
+        for stage, metrics in data["stage_metrics"].items():
+            line = f"     {stage:<8} {metrics['wall_seconds']:7.3f}s wall, {metrics['cpu_seconds']:7.3f}s cpu"
+            if "peak_alloc_mb" in metrics:
+                line += f", piek {metrics['peak_alloc_mb']:.1f} MB"
+            print(line)
+    print("="*50)
+    print("✅ PRO Analyse voltooid!")
+    print("="*50 + "\n")
+    
+    return result
+
+
+def _warm_up_streaming(config):
+    """
+    Analyseer één keer per proces een kort synthetisch signaal via de blokgewijze route
+    
+    Lazy imports en numba JIT compilatie kosten ~200 MB RSS die daarna blijft; zonder
+    warm-up valt dat in het budget van de eerste track en klopt de planning niet.
+    """
+    global _streaming_warmed_up
+    from cold_start import warmup_signal
+    
+    with _streaming_warm_up_lock:
+        if _streaming_warmed_up:
+            return
+        sr = config["sample_rate"]
+        features = analyze_signal(warmup_signal(sr), sr, waveform_levels=None, n_fft=config["n_fft"],
+                                  hop_length=config["hop_length"], keep_chroma=True, exact_onset=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, _, beat_times = detect_bpm_improved(None, sr, features)
+            energy, _ = calculate_energy(None, sr, features)
+            detect_phrases(None, sr, energy, beat_times, features.chromagram, duration=features.duration)
+        _streaming_warmed_up = True
+
+
+def _stream_features_pro(source, config, memory_mb):
+    """
+    Decodeer en bereken de spectrale features in blokken die binnen het geheugenbudget passen
+    
+    Returns:
+        StreamingFeatures (gedraagt zich als AnalysisContext) met een chromagram per frame
+    """
+    _warm_up_streaming(config)
+    sr = config["sample_rate"]
+    signal = source.preloaded(sr)
+    duration = len(signal[0]) / signal[1] if signal is not None else stream_duration(source.open())
+    plan = plan_budget(memory_mb, duration, sr, config["n_fft"], config["hop_length"])
+    print(f"Geheugenbudget: {memory_mb:.0f} MB, blokken van {plan['block_seconds']:.1f} sec, "
+          f"tempogram segmenten van {plan['segment_frames']} frames (geschatte piek {plan['estimated_peak_mb']:.0f} MB)")
+    
+    options = dict(waveform_levels=None, n_fft=config["n_fft"], hop_length=config["hop_length"],
+                   keep_chroma=True, segment_frames=plan["segment_frames"], exact_onset=True)
+    if signal is not None:
+        return analyze_signal(signal[0], signal[1], plan["block_seconds"], **options)
+    try:
+        return analyze_stream(source.open(), sr, plan["block_seconds"], **options)
+    except RuntimeError:
+        if not source.in_memory:
+            raise
+        # Formaat niet uit het geheugen te lezen (bijv. m4a): via een tijdelijk bestand
+        with source.local_path() as path:
+            return analyze_stream(path, sr, plan["block_seconds"], **options)
+
+
+def _analyze_signal_pro(source, config, visualize, stages=None, resolution='frames', memory_mb=None):
+    """
+    Decode en analyseer een track (zonder cache, export of samenvatting)
     
-    # Audio inladen
-    y, sr = load_audio(filename, sample_rate)
+    Args:
+        source: AudioSource (pad of in-memory audio)
+        config: Profiel instellingen (zie analysis_profiles.get_profile)
+        visualize: Of visualisatie moet worden gemaakt (zet alle detectors aan)
+        stages: Optionele StageRecorder voor tijd en geheugen per stap
+        resolution: 'frames' of 'beats' (zie analyze_track_pro)
+        memory_mb: Optionele limiet voor de piek RSS in MB; het signaal wordt dan niet
+                   in zijn geheel geladen (alleen voor de visualisatie, buiten het budget)
+    
+    Returns:
+        ProAnalysisResult
+    """
+    detectors = set(ALL_DETECTORS if visualize else config["detectors"])
+    stages = stages or NULL_RECORDER
+    
+    if memory_mb:
+        # Decoderen en STFT in blokken; de stap 'load' bevat dan ook de spectrale features
+        with stages.stage("load"):
+            ctx = _stream_features_pro(source, config, memory_mb)
+        y, sr = None, ctx.sr
+    else:
+        # Audio inladen
+        with stages.stage("load"):
+            y, sr = load_audio(source, config["sample_rate"])
+        
+        # Gedeelde spectrale context (STFT en onset envelope maar één keer)
+        # De context is lazy: de STFT telt mee bij de eerste stap die hem nodig heeft (bpm)
+        ctx = AnalysisContext(y, sr, n_fft=config["n_fft"], hop_length=config["hop_length"])
+    duration = ctx.duration
     
     # Verbeterde BPM detectie
-    tempo, tempo_confidence, beat_frames = detect_bpm_improved(y, sr)
+    with stages.stage("bpm"):
+        tempo, tempo_confidence, beat_frames = detect_bpm_improved(y, sr, ctx)
     
     # Verbeterde Key detectie (met majeur/minor)
-    key, mode, key_index, key_confidence, camelot = detect_key_krumhansl_schmuckler(y, sr)
+    with stages.stage("key"):
+        key, mode, key_index, key_confidence, camelot = detect_key_krumhansl_schmuckler(y, sr, ctx)
+        
+        # Gemiddelde chroma vector bewaren zodat de key later opnieuw gescoord kan worden
+        chromagram = ctx.chromagram
+        chroma_vector = np.mean(chromagram, axis=1)
     
-    # Energie berekenen
-    energy, rms = calculate_energy(y, sr)
+    # Energie berekenen (ook nodig voor peaks en phrases)
+    energy = np.zeros(0, dtype=np.float32)
+    if detectors & {"energy", "peaks", "phrases"}:
+        with stages.stage("energy"):
+            energy, rms = calculate_energy(y, sr, ctx)
+            del rms
+    
+    # Spectrale tussenresultaten zijn niet meer nodig
+    del ctx
     
     # Verbeterde Peak detectie
-    peaks, peak_times, peak_heights = detect_peaks_improved(energy, y, sr)
+    peak_times = peak_heights = np.zeros(0)
+    if "peaks" in detectors:
+        with stages.stage("peaks"):
+            peaks, peak_times, peak_heights = detect_peaks_improved(energy, y, sr, duration=duration)
     
     # Phrase detectie
-    phrases = detect_phrases(y, sr, energy, beat_frames)
+    phrases = {}
+    if "phrases" in detectors:
+        with stages.stage("phrases"):
+            phrases = detect_phrases(y, sr, energy, beat_frames, chromagram, duration=duration)
     
     # Visualisatie
     if visualize:
-        track_name = Path(filename).stem
-        visualize_track_pro(y, sr, energy, peak_times, track_name, tempo, key, mode, camelot, phrases)
+        track_name = source.stem
+        with stages.stage("render"):
+            if y is None:
+                y, sr = load_audio(source, sr)
+            visualize_track_pro(y, sr, energy, peak_times, track_name, tempo, key, mode, camelot, phrases)
+    
+    # Beat grid: energie per beat en energie/chroma per maat in plaats van per frame
+    grid = {"beats": [round(float(t), 3) for t in beat_frames]}
+    if resolution == "beats":
+        with stages.stage("beats"):
+            grid = beat_grid(beat_frames, duration, sr, config["hop_length"],
+                             energy=energy if "energy" in detectors else None, chroma=chromagram)
     
     # Data structuur
     data = {
-        "title": Path(filename).name,
-        "filename": filename,
+        "title": source.name,
+        "filename": source.path or source.name,
         "bpm": int(tempo),
         "bpm_confidence": float(tempo_confidence),
         "key": key,
@@ -364,36 +578,23 @@ def analyze_track_pro(filename, sample_rate=44100, visualize=True, export=True):
         "key_index": int(key_index),
         "key_confidence": float(key_confidence),
         "camelot": camelot,
+        "chroma_vector": chroma_vector.tolist(),
         "energy": energy.tolist(),
+        **grid,
         "peaks": peak_times.tolist(),
         "peak_heights": peak_heights.tolist(),
         "phrases": phrases,
-        "duration_seconds": float(len(y)/sr),
-        "sample_rate": int(sr)
+        "duration_seconds": float(duration),
+        "sample_rate": int(sr),
+        "profile": config["name"]
     }
+    if resolution == "beats":
+        del data["energy"]
     
-    if export:
-        output_file = f"{Path(filename).stem}_pro_analysis.json"
-        with open(output_file, "w") as f:
-            json.dump(data, f, indent=4)
-        print(f"💾 Geëxporteerd naar: {output_file}")
-    
-    # Samenvatting
-    print("\n" + "="*50)
-    print("📊 PRO ANALYSE SAMENVATTING")
-    print("="*50)
-    print(f"📁 Bestand:     {Path(filename).name}")
-    print(f"🎵 BPM:         {tempo} ({tempo_confidence*100:.0f}% confidence)")
-    print(f"🎹 Key:         {key} {mode} ({key_confidence*100:.0f}% confidence)")
-    print(f"🎯 Camelot:     {camelot}")
-    print(f"⏱️  Duur:        {len(y)/sr:.2f} sec ({len(y)/sr/60:.2f} min)")
-    print(f"📈 Peaks:       {len(peak_times)} gevonden")
-    print(f"🎼 Phrases:     {sum(len(v) for v in phrases.values())} segmenten")
-    print("="*50)
-    print("✅ PRO Analyse voltooid!")
-    print("="*50 + "\n")
-    
-    return data
+    return ProAnalysisResult(
+        data, source, y=y, sr=sr, energy=energy,
+        peak_times=peak_times, beat_times=beat_frames
+    )
 
 
 def visualize_track_pro(y, sr, energy, peak_times, filename, bpm, key, mode, camelot, phrases):
@@ -401,16 +602,19 @@ def visualize_track_pro(y, sr, energy, peak_times, filename, bpm, key, mode, cam
     Verbeterde visualisatie met alle informatie en duidelijke waveform
     """
     x_energy = np.linspace(0, len(y)/sr, len(energy))
-    time_axis = np.linspace(0, len(y)/sr, len(y))
     
     # Maak 3 subplots: Waveform, Combined, Energy
-    fig = plt.figure(figsize=(16, 10))
+    # (Figure API zonder pyplot: geen globale state en geen extra draw bij opslaan)
+    fig = Figure(figsize=(16, 10))
     gs = fig.add_gridspec(3, 1, height_ratios=[1.5, 2, 1], hspace=0.3)
     
+    # Waveform en energie als min/max per pixel kolom (in plaats van alle samples)
+    n_pixels = figure_pixels(fig, IMAGE_DPI)
+    x_line, energy_line = min_max_line(x_energy, energy, n_pixels)
+    
     # Plot 1: Duidelijke Waveform
     ax1 = fig.add_subplot(gs[0])
-    ax1.plot(time_axis, y, color='#4A90E2', linewidth=0.8, alpha=0.9)
-    ax1.fill_between(time_axis, y, 0, alpha=0.3, color='#4A90E2')
+    plot_waveform_envelope(ax1, y, sr, n_pixels, color='#4A90E2', alpha=0.3, outline_alpha=0.9)
     ax1.set_ylabel('Amplitude', fontsize=12, fontweight='bold')
     ax1.set_title('Waveform', fontsize=13, fontweight='bold', pad=10)
     ax1.grid(True, alpha=0.3, linestyle='--')
@@ -419,8 +623,8 @@ def visualize_track_pro(y, sr, energy, peak_times, filename, bpm, key, mode, cam
     
     # Plot 2: Combined view met waveform, energy en peaks
     ax2 = fig.add_subplot(gs[1])
-    ax2.plot(time_axis, y, alpha=0.4, color='#4A90E2', linewidth=0.6, label='Waveform')
-    ax2.plot(x_energy, energy, color='#E24A4A', linewidth=2, label='Energy', zorder=3)
+    plot_waveform_envelope(ax2, y, sr, n_pixels, color='#4A90E2', alpha=0.4, label='Waveform')
+    ax2.plot(x_line, energy_line, color='#E24A4A', linewidth=2, label='Energy', zorder=3)
     ax2.scatter(peak_times, [np.max(energy)*0.6]*len(peak_times), color='#50C878', s=50, zorder=5, label='Peaks', alpha=0.8, marker='v')
     
     # Markeer phrases
@@ -438,32 +642,47 @@ def visualize_track_pro(y, sr, energy, peak_times, filename, bpm, key, mode, cam
     
     # Plot 3: Energy detail
     ax3 = fig.add_subplot(gs[2])
-    ax3.fill_between(x_energy, energy, alpha=0.6, color='#E24A4A')
-    ax3.plot(x_energy, energy, color='#E24A4A', linewidth=2)
+    ax3.fill_between(x_line, energy_line, alpha=0.6, color='#E24A4A')
+    ax3.plot(x_line, energy_line, color='#E24A4A', linewidth=2)
     ax3.set_xlabel('Time (s)', fontsize=12)
     ax3.set_ylabel('Energy', fontsize=12, fontweight='bold')
     ax3.set_title('Energy Detail', fontsize=13, fontweight='bold', pad=10)
     ax3.grid(True, alpha=0.3, linestyle='--')
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     output_file = f"{filename}_pro_analysis.png"
-    plt.savefig(output_file, dpi=150, bbox_inches='tight', facecolor='white')
+    fig.savefig(output_file, dpi=IMAGE_DPI, bbox_inches='tight', facecolor='white')
     print(f"🖼️  Visualisatie opgeslagen: {output_file}")
-    plt.close()
 
 
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        # Batch mode: complete directory parallel analyseren
+        from batch_analyzer import main as batch_main
+        batch_main(sys.argv[1:] + ['--analyzer', 'pro'])
+    elif len(sys.argv) > 1:
         filename = sys.argv[1]
-        analyze_track_pro(filename)
+        # --profile <naam>: fast, balanced of archival
+        # --binary: export als .bin (arrays) met JSON sidecar in plaats van volledige JSON
+        # --stages: tijd en piek allocatie per stap meten en tonen
+        # --beats: beat grid (energie/chroma per beat en per maat) in plaats van frame energie
+        options = sys.argv[2:]
+        profile = options[options.index('--profile') + 1] if '--profile' in options[:-1] else None
+        export_format = 'binary' if '--binary' in options else 'json'
+        instrument = '--stages' in options
+        resolution = 'beats' if '--beats' in options else 'frames'
+        analyze_track_pro(filename, profile=profile, export_format=export_format,
+                          instrument=instrument, track_memory=instrument, resolution=resolution)
     else:
         print("Music Analyzer Pro")
         print("="*50)
         print("\nGebruik:")
-        print("  python music_analyzer_pro.py <audio_file>")
+        print("  python music_analyzer_pro.py <audio_file> [--profile fast|balanced|archival] [--binary] [--stages] [--beats]")
+        print("  python music_analyzer_pro.py <map> [--workers N] [--output resultaten.jsonl]")
         print("\nVoorbeeld:")
         print("  python music_analyzer_pro.py track1.mp3")
+        print("  python music_analyzer_pro.py ~/Music --workers 8")
 
@@ -3,33 +3,36 @@ Music Analyzer - Vereenvoudigde versie
 Retourneert alleen: songnaam, BPM, key en duur
 """
 
-import librosa
 import numpy as np
-from pathlib import Path
 
-# Keys voor key detectie
-KEYS = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+from analysis_cache import get_default_cache
+from analysis_context import AnalysisContext
+from analysis_profiles import cache_params, get_profile
+from audio_source import as_source
+from key_engine import KEYS, estimate_key
+from stage_metrics import NULL_RECORDER, StageRecorder
 
-# Krumhansl-Schmuckler profiles voor majeur en minor
-MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+# Versie van de analyse algoritmes (verhogen bij wijzigingen die resultaten beïnvloeden)
+ALGORITHM_VERSION = 1
 
 
-def detect_bpm_improved(y, sr):
+def detect_bpm_improved(y, sr, ctx=None):
     """
     Verbeterde BPM detectie met multi-tempo analyse
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Methode 1: Standaard beat tracking
-    tempo1, beat_frames = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    tempo1, beat_frames = ctx.beat_track(units='time')
     tempo1 = float(tempo1[0] if isinstance(tempo1, np.ndarray) else tempo1)
     
     # Methode 2: Tempogram analyse
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    tempo2 = librosa.beat.tempo(onset_envelope=onset_env, sr=sr, aggregate=np.median)
+    tempo2 = ctx.tempo(aggregate=np.median)
     tempo2 = float(tempo2[0] if isinstance(tempo2, np.ndarray) else tempo2)
     
     # Methode 3: Multi-tempo detectie
-    tempos = librosa.beat.tempo(y=y, sr=sr, aggregate=None)
+    tempos = ctx.tempo(aggregate=None)
     if isinstance(tempos, np.ndarray) and len(tempos) > 0:
         tempo3 = float(np.median(tempos))
     else:
@@ -44,76 +47,102 @@ def detect_bpm_improved(y, sr):
     return final_tempo
 
 
-def detect_key_krumhansl_schmuckler(y, sr):
+def detect_key_krumhansl_schmuckler(y, sr, ctx=None):
     """
     Key detectie met Krumhansl-Schmuckler algoritme
     Detecteert zowel chroma als majeur/minor mode
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Chromagram voor tonaliteit
-    chromagram = librosa.feature.chroma_stft(y=y, sr=sr)
+    chromagram = ctx.chromagram
     
     # Gemiddelde chroma vector
     chroma_mean = np.mean(chromagram, axis=1)
     
-    # Normaliseer chroma vector
-    chroma_norm = chroma_mean / (np.sum(chroma_mean) + 1e-6)
-    
-    # Test alle 24 mogelijkheden (12 keys × 2 modes)
-    correlations = []
-    
-    for key_idx in range(12):
-        # Rotate profiles voor elke key
-        major_rotated = np.roll(MAJOR_PROFILE, key_idx)
-        minor_rotated = np.roll(MINOR_PROFILE, key_idx)
-        
-        # Bereken correlatie
-        major_corr = np.corrcoef(chroma_norm, major_rotated)[0, 1]
-        minor_corr = np.corrcoef(chroma_norm, minor_rotated)[0, 1]
-        
-        correlations.append((key_idx, 'major', major_corr))
-        correlations.append((key_idx, 'minor', minor_corr))
-    
-    # Vind beste match
-    best_match = max(correlations, key=lambda x: x[2])
-    key_index, mode, correlation = best_match
-    
-    key = KEYS[key_index]
+    # Correleer met alle 24 key profielen in één matrix vermenigvuldiging
+    key, mode, _, _, _ = estimate_key(chroma_mean)
     
     # Retourneer key + mode (bijv. "C major" of "A minor")
     return f"{key} {mode}"
 
 
-def analyze_track_simple(filename, sample_rate=44100):
+def analyze_track_simple(filename, sample_rate=None, use_cache=True, profile=None, name=None, instrument=False):
     """
     Vereenvoudigde analyse - retourneert alleen essentiële data
     
     Args:
-        filename: Pad naar audio bestand
-        sample_rate: Sample rate (default: 44100)
+        filename: Pad naar audio bestand, of de inhoud als bytes, BytesIO of leesbare stream
+        sample_rate: Sample rate (default: die van het profiel, archival = 44100)
+        use_cache: Of de persistente analyse cache gebruikt wordt (default: True)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
+        name: Bestandsnaam voor de songnaam bij in-memory input (default: naam van de stream)
+        instrument: Tijd per stap meten en als 'stage_metrics' toevoegen (default: False)
     
     Returns:
-        Dictionary met: songnaam, bpm, key, duration
+        Dictionary met: songnaam, bpm, key, duration, profile (en stage_metrics)
     """
-    # Audio inladen
-    y, sr = librosa.load(filename, sr=sample_rate)
+    config = get_profile(profile, sample_rate)
+    source = as_source(filename, name)
+    stages = StageRecorder() if instrument else None
+    
+    def compute():
+        return _analyze_signal_simple(source, config, stages)
+    
+    cache = get_default_cache() if use_cache else None
+    if cache is None:
+        result = compute()
+    else:
+        result, hit = cache.cached_call(
+            f"simple:{ALGORITHM_VERSION}", source.cache_input(), cache_params(config), compute
+        )
+        result["songnaam"] = source.stem
+    
+    # Na de cache: metingen horen bij deze aanroep, niet bij de gecachte inhoud
+    if stages is not None:
+        result["stage_metrics"] = stages.finish()
+    return result
+
+
+def _analyze_signal_simple(source, config, stages=None):
+    """
+    Decode en analyseer een track (zonder cache)
+    
+    Args:
+        source: AudioSource (pad of in-memory audio)
+        config: Profiel instellingen
+        stages: Optionele StageRecorder voor tijd per stap
+    """
+    stages = stages or NULL_RECORDER
+    
+    # Audio inladen (in-memory input wordt direct uit het geheugen gedecodeerd)
+    with stages.stage("load"):
+        y, sr = source.load(config["sample_rate"])
+    
+    # Gedeelde spectrale context (STFT en onset envelope maar één keer)
+    ctx = AnalysisContext(y, sr, n_fft=config["n_fft"], hop_length=config["hop_length"])
     
     # BPM detecteren
-    bpm = detect_bpm_improved(y, sr)
+    with stages.stage("bpm"):
+        bpm = detect_bpm_improved(y, sr, ctx)
     
     # Key detecteren
-    key = detect_key_krumhansl_schmuckler(y, sr)
+    with stages.stage("key"):
+        key = detect_key_krumhansl_schmuckler(y, sr, ctx)
     
     # Duur berekenen
     duration_seconds = len(y) / sr
     
     # Songnaam (zonder extensie)
-    song_name = Path(filename).stem
+    song_name = source.stem
     
     return {
         "songnaam": song_name,
         "bpm": bpm,
         "key": key,
-        "duration": duration_seconds
+        "duration": duration_seconds,
+        "profile": config["name"]
     }
 
 
@@ -7,50 +7,52 @@ Gebruik:
     result = analyze_audio('track.mp3')
 """
 
-import librosa
 import numpy as np
 from pathlib import Path
-try:
-    from mutagen import File as MutagenFile
-    MUTAGEN_AVAILABLE = True
-except ImportError:
-    MUTAGEN_AVAILABLE = False
-    print("Waarschuwing: mutagen niet geïnstalleerd. Bitrate detectie werkt mogelijk niet.")
-    print("Installeer met: pip install mutagen")
 
+from analysis_cache import get_default_cache
+from analysis_context import AnalysisContext
+from analysis_profiles import cache_params, get_profile
+from audio_probe import MUTAGEN_AVAILABLE, format_duration, probe, read_metadata
+from audio_source import as_source
+from excerpts import (BPM_CONFIDENCE_THRESHOLD, KEY_CONFIDENCE_THRESHOLD, combine_bpm, combine_chroma,
+                      select_excerpts)
+from key_engine import KEYS, estimate_key
+from stage_metrics import NULL_RECORDER, StageRecorder
+from streaming_analysis import analyze_stream
+from waveform_pyramid import WAVEFORM_LEVELS, build_pyramid
 
-# Keys voor key detectie
-KEYS = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-# Krumhansl-Schmuckler profiles voor majeur en minor
-# Gebaseerd op psychologisch onderzoek naar tooncentrum perceptie
-MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+# Versie van de analyse algoritmes (verhogen bij wijzigingen die resultaten beïnvloeden)
+ALGORITHM_VERSION = 4
 
 
-def detect_bpm_accurate(y, sr):
+def detect_bpm_accurate(y, sr, ctx=None):
     """
     Nauwkeurige BPM detectie met multi-tempo analyse
     
     Args:
         y: Audio time series
         sr: Sample rate
+        ctx: Optionele AnalysisContext (hergebruikt de onset envelope)
     
     Returns:
         bpm: BPM waarde (integer, afgerond)
         confidence: Betrouwbaarheid (0-1)
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Methode 1: Standaard beat tracking
-    tempo1, beat_frames = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    tempo1, beat_frames = ctx.beat_track(units='time')
     tempo1 = float(tempo1[0] if isinstance(tempo1, np.ndarray) else tempo1)
     
     # Methode 2: Tempogram analyse (meer robuust)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    tempo2 = librosa.beat.tempo(onset_envelope=onset_env, sr=sr, aggregate=np.median)
+    tempo2 = ctx.tempo(aggregate=np.median)
     tempo2 = float(tempo2[0] if isinstance(tempo2, np.ndarray) else tempo2)
     
     # Methode 3: Multi-tempo detectie
-    tempos = librosa.beat.tempo(y=y, sr=sr, aggregate=None)
+    tempos = ctx.tempo(aggregate=None)
     if isinstance(tempos, np.ndarray) and len(tempos) > 0:
         tempo3 = float(np.median(tempos))
     else:
@@ -72,7 +74,7 @@ def detect_bpm_accurate(y, sr):
     return final_tempo, confidence
 
 
-def detect_key_accurate(y, sr):
+def detect_key_accurate(y, sr, ctx=None):
     """
     Nauwkeurige key detectie met Krumhansl-Schmuckler algoritme
     Detecteert zowel chroma als majeur/minor mode
@@ -80,44 +82,24 @@ def detect_key_accurate(y, sr):
     Args:
         y: Audio time series
         sr: Sample rate
+        ctx: Optionele AnalysisContext (hergebruikt het power spectrogram)
     
     Returns:
         key: Toonsoort (bijv. 'C', 'D#', etc.)
         mode: 'major' of 'minor'
         confidence: Betrouwbaarheid (0-1)
     """
+    if ctx is None:
+        ctx = AnalysisContext(y, sr)
+    
     # Chromagram voor tonaliteit
-    chromagram = librosa.feature.chroma_stft(y=y, sr=sr)
+    chromagram = ctx.chromagram
     
     # Gemiddelde chroma vector
     chroma_mean = np.mean(chromagram, axis=1)
     
-    # Normaliseer chroma vector
-    chroma_norm = chroma_mean / (np.sum(chroma_mean) + 1e-6)
-    
-    # Test alle 24 mogelijkheden (12 keys × 2 modes)
-    correlations = []
-    
-    for key_idx in range(12):
-        # Rotate profiles voor elke key
-        major_rotated = np.roll(MAJOR_PROFILE, key_idx)
-        minor_rotated = np.roll(MINOR_PROFILE, key_idx)
-        
-        # Bereken correlatie
-        major_corr = np.corrcoef(chroma_norm, major_rotated)[0, 1]
-        minor_corr = np.corrcoef(chroma_norm, minor_rotated)[0, 1]
-        
-        correlations.append((key_idx, 'major', major_corr))
-        correlations.append((key_idx, 'minor', minor_corr))
-    
-    # Vind beste match
-    best_match = max(correlations, key=lambda x: x[2])
-    key_index, mode, correlation = best_match
-    
-    # Normaliseer confidence (correlatie kan negatief zijn)
-    confidence = max(0, min(1, (correlation + 1) / 2))
-    
-    key = KEYS[key_index]
+    # Correleer met alle 24 key profielen in één matrix vermenigvuldiging
+    key, mode, _, confidence, _ = estimate_key(chroma_mean)
     
     return key, mode, confidence
 
@@ -127,37 +109,13 @@ def get_bitrate(filename):
     Haal bitrate op uit audio bestand metadata
     
     Args:
-        filename: Pad naar audio bestand
+        filename: Pad naar audio bestand, bytes, stream of AudioSource
     
     Returns:
         bitrate: Bitrate in kbps (None als niet beschikbaar)
     """
-    if not MUTAGEN_AVAILABLE:
-        return None
-    
-    try:
-        audio_file = MutagenFile(filename)
-        if audio_file is None:
-            return None
-        
-        # Probeer bitrate uit info te halen
-        if hasattr(audio_file, 'info') and hasattr(audio_file.info, 'bitrate'):
-            bitrate = audio_file.info.bitrate
-            # Convert naar kbps als nodig (sommige formats geven bps)
-            if bitrate > 1000:
-                bitrate = bitrate / 1000
-            return int(bitrate)
-        
-        # Alternatieve methode voor sommige formats
-        if hasattr(audio_file, 'info') and hasattr(audio_file.info, 'bitrate_mode'):
-            # Voor MP3: probeer andere attributen
-            pass
-        
-    except Exception as e:
-        print(f"Waarschuwing: Kon bitrate niet ophalen: {e}")
-        return None
-    
-    return None
+    metadata = read_metadata(as_source(filename).open())
+    return metadata['bitrate'] if metadata else None
 
 
 def get_song_name(filename):
@@ -165,77 +123,61 @@ def get_song_name(filename):
     Haal song naam op uit metadata of filename
     
     Args:
-        filename: Pad naar audio bestand
+        filename: Pad naar audio bestand, bytes, stream of AudioSource
     
     Returns:
         song_name: Naam van het nummer
     """
-    # Probeer eerst metadata
-    if MUTAGEN_AVAILABLE:
-        try:
-            audio_file = MutagenFile(filename)
-            if audio_file is not None:
-                # Probeer verschillende metadata tags
-                for tag_key in ['TIT2', 'TITLE', '©nam', 'title']:
-                    if tag_key in audio_file:
-                        title = audio_file[tag_key][0]
-                        if title:
-                            return str(title)
-        except:
-            pass
+    source = as_source(filename)
+    metadata = read_metadata(source.open())
+    if metadata and metadata['title']:
+        return metadata['title']
     
     # Fallback naar filename (zonder extensie)
-    return Path(filename).stem
+    return source.stem
 
 
-def extract_waveform(y, sr, max_samples=5000):
+def extract_waveform(y, sr, levels=WAVEFORM_LEVELS):
     """
     Extraheer waveform data voor opslag
-    Downsampled voor efficiënte opslag (niet het originele bestand)
+    Min/max/RMS peak pyramide op meerdere zoomniveaus (niet het originele bestand)
     
     Args:
         y: Audio time series
         sr: Sample rate
-        max_samples: Maximum aantal samples voor waveform (default: 5000)
-                    Voor visualisatie is dit meestal voldoende
+        levels: Samples per bucket per zoomniveau (default: 2048, 16384)
     
     Returns:
-        waveform: Downsampled waveform array (list voor JSON serialisatie)
-        waveform_samples: Aantal samples in waveform
+        levels: Per niveau samples_per_bucket, buckets en base64 gecodeerde
+                min/max (int8, × 127) en rms (uint8, × 255)
         original_samples: Aantal samples in origineel
         sample_rate: Sample rate
     """
-    original_samples = len(y)
-    
-    # Downsample als nodig
-    if len(y) > max_samples:
-        # Gebruik lineaire interpolatie voor downsampling
-        indices = np.linspace(0, len(y) - 1, max_samples)
-        waveform = np.interp(indices, np.arange(len(y)), y)
-    else:
-        waveform = y.copy()
-    
-    # Converteer naar list voor JSON serialisatie
-    waveform_list = waveform.tolist()
-    
-    return {
-        "waveform": waveform_list,
-        "waveform_samples": len(waveform_list),
-        "original_samples": int(original_samples),
-        "sample_rate": int(sr),
-        "downsampled": original_samples > max_samples
-    }
+    return build_pyramid(y, sr, levels)
 
 
-def analyze_audio(filename, sample_rate=44100, include_waveform=True, waveform_samples=5000):
+def analyze_audio(filename, sample_rate=None, include_waveform=True, waveform_levels=WAVEFORM_LEVELS,
+                  use_cache=True, streaming=False, profile=None, name=None, excerpts=False, instrument=False):
     """
     Analyseer audio bestand en extraheer alle gewenste informatie
     
     Args:
-        filename: Pad naar audio bestand (mp3, wav, m4a, flac, etc.)
-        sample_rate: Sample rate voor analyse (default: 44100)
+        filename: Pad naar audio bestand (mp3, wav, m4a, flac, etc.), of de inhoud
+                  als bytes, BytesIO of leesbare stream (zonder omweg via schijf)
+        sample_rate: Sample rate voor analyse (default: die van het profiel, archival = 44100)
         include_waveform: Of waveform data moet worden opgenomen (default: True)
-        waveform_samples: Maximum aantal samples voor waveform (default: 5000)
+                          Profielen zonder waveform detector slaan de waveform over
+        waveform_levels: Samples per bucket per zoomniveau van de waveform (default: 2048, 16384;
+                         waveform_pyramid.DETAIL_WAVEFORM_LEVELS voegt 256 toe om in te zoomen)
+        use_cache: Of de persistente analyse cache gebruikt wordt (default: True)
+        streaming: Lees en analyseer in blokken met constant geheugengebruik,
+                   bedoeld voor lange mixes (default: False)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
+        name: Bestandsnaam bij in-memory input (default: naam van de stream)
+        excerpts: BPM en key eerst op drie fragmenten van 30 sec (gekozen op energie);
+                  alleen bij een te lage confidence wordt de volledige track geanalyseerd
+                  (default: False, niet bij streaming)
+        instrument: Tijd per stap meten en als 'stage_metrics' toevoegen (default: False)
     
     Returns:
         Dictionary met:
@@ -244,38 +186,185 @@ def analyze_audio(filename, sample_rate=44100, include_waveform=True, waveform_s
             - key: Toonsoort (bijv. 'C', 'D#')
             - mode: 'major' of 'minor'
             - key_confidence: Betrouwbaarheid key (0-1)
+            - chroma_vector: Gemiddelde chroma vector (12 waarden, voor opnieuw scoren met key_engine)
             - song_name: Naam van het nummer
             - duration: Duur in seconden (float)
             - duration_formatted: Duur geformatteerd (bijv. "3:45")
             - bitrate: Bitrate in kbps (None als niet beschikbaar)
-            - waveform: Waveform data (downsampled, alleen als include_waveform=True)
+            - waveform: Waveform peak pyramide (alleen als include_waveform=True)
             - filename: Originele bestandsnaam
+            - profile: Naam van het gebruikte analyse profiel
+            - analysis_path: Per detector 'excerpt' of 'full' ({'bpm': ..., 'key': ...})
+            - excerpts: Gebruikte fragmenten als [start, end] in seconden (alleen als
+                        er fragmenten geanalyseerd zijn)
+            - stage_metrics: Wall en CPU time per stap (alleen met instrument=True)
     """
-    # Laad audio
-    y, sr = librosa.load(filename, sr=sample_rate)
+    config = get_profile(profile, sample_rate)
+    include_waveform = include_waveform and "waveform" in config["detectors"]
+    source = as_source(filename, name)
+    stages = StageRecorder() if instrument else None
+    
+    def compute():
+        if streaming:
+            return _analyze_stream(source, config, include_waveform, waveform_levels, stages)
+        return _analyze_signal(source, config, include_waveform, waveform_levels, excerpts, stages)
+    
+    cache = get_default_cache() if use_cache else None
+    if cache is None:
+        result = compute()
+    else:
+        params = {
+            **cache_params(config),
+            "include_waveform": include_waveform,
+            "waveform_levels": list(waveform_levels),
+            "streaming": streaming,
+            "excerpts": excerpts and not streaming
+        }
+        result, hit = cache.cached_call(f"standalone:{ALGORITHM_VERSION}", source.cache_input(), params, compute)
+        
+        # Bestandsafhankelijke velden horen bij dit pad, niet bij de gecachte inhoud
+        if hit:
+            result["song_name"] = get_song_name(source)
+        result["filename"] = source.name
+        result["filepath"] = source.path
     
-    # BPM detectie
-    bpm, bpm_confidence = detect_bpm_accurate(y, sr)
+    # Na de cache: metingen horen bij deze aanroep, niet bij de gecachte inhoud
+    if stages is not None:
+        result["stage_metrics"] = stages.finish()
     
-    # Key detectie
-    key, mode, key_confidence = detect_key_accurate(y, sr)
+    return result
+
+
+def _analyze_signal(source, config, include_waveform, waveform_levels, excerpts=False, stages=None):
+    """
+    Decode en analyseer een track (zonder cache)
+    """
+    stages = stages or NULL_RECORDER
     
-    # Duur berekenen
-    duration_seconds = len(y) / sr
-    minutes = int(duration_seconds // 60)
-    seconds = int(duration_seconds % 60)
-    duration_formatted = f"{minutes}:{seconds:02d}"
+    # Laad audio (in-memory input wordt direct uit het geheugen gedecodeerd)
+    with stages.stage("load"):
+        y, sr = source.load(config["sample_rate"])
     
-    # Song naam
-    song_name = get_song_name(filename)
+    # Gedeelde spectrale context (STFT en onset envelope maar één keer)
+    # De context is lazy: zonder fallback naar de volledige track wordt er niets berekend
+    ctx = AnalysisContext(y, sr, n_fft=config["n_fft"], hop_length=config["hop_length"])
     
-    # Bitrate
-    bitrate = get_bitrate(filename)
+    estimates = {}
+    windows = select_excerpts(y, sr) if excerpts else None
+    if windows:
+        with stages.stage("excerpts"):
+            estimates = _detect_from_excerpts(y, sr, config, windows)
+    analysis_path = {"bpm": "excerpt" if "bpm" in estimates else "full",
+                     "key": "excerpt" if "key" in estimates else "full"}
+    
+    # BPM detectie
+    if "bpm" in estimates:
+        bpm, bpm_confidence = estimates["bpm"]
+    else:
+        with stages.stage("bpm"):
+            bpm, bpm_confidence = detect_bpm_accurate(y, sr, ctx)
+    
+    # Key detectie
+    if "key" in estimates:
+        key, mode, key_confidence, chroma_vector = estimates["key"]
+    else:
+        with stages.stage("key"):
+            key, mode, key_confidence = detect_key_accurate(y, sr, ctx)
+            chroma_vector = np.mean(ctx.chromagram, axis=1)
     
     # Waveform extractie
     waveform_data = None
     if include_waveform:
-        waveform_data = extract_waveform(y, sr, max_samples=waveform_samples)
+        with stages.stage("waveform"):
+            waveform_data = extract_waveform(y, sr, waveform_levels)
+    
+    result = _build_result(source, config, bpm, bpm_confidence, key, mode, key_confidence,
+                           chroma_vector, len(y) / sr, waveform_data, stages)
+    result["analysis_path"] = analysis_path
+    if windows:
+        result["excerpts"] = [[round(start / sr, 2), round(end / sr, 2)] for start, end in windows]
+    return result
+
+
+def _detect_from_excerpts(y, sr, config, windows):
+    """
+    BPM en key op de fragmenten
+    
+    Args:
+        windows: Fragmenten als (start_sample, end_sample) (zie excerpts.select_excerpts)
+    
+    Returns:
+        Dictionary met 'bpm': (bpm, confidence) en/of 'key': (key, mode, confidence,
+        chroma_vector), alleen voor detectors boven de confidence drempel
+    """
+    contexts = [AnalysisContext(y[start:end], sr, n_fft=config["n_fft"], hop_length=config["hop_length"])
+                for start, end in windows]
+    estimates = {}
+    
+    bpm, bpm_confidence = combine_bpm([detect_bpm_accurate(c.y, sr, c) for c in contexts])
+    if bpm_confidence >= BPM_CONFIDENCE_THRESHOLD:
+        estimates["bpm"] = (bpm, bpm_confidence)
+    
+    chroma_vector = combine_chroma([np.mean(c.chromagram, axis=1) for c in contexts],
+                                   [len(c.y) for c in contexts])
+    key, mode, _, key_confidence, _ = estimate_key(chroma_vector)
+    if key_confidence >= KEY_CONFIDENCE_THRESHOLD:
+        estimates["key"] = (key, mode, key_confidence, chroma_vector)
+    
+    return estimates
+
+
+def _analyze_stream(source, config, include_waveform, waveform_levels, stages=None):
+    """
+    Analyseer een track in blokken (constant geheugen, zonder cache)
+    """
+    stages = stages or NULL_RECORDER
+    
+    def stream(audio):
+        return analyze_stream(
+            audio, config["sample_rate"], waveform_levels=waveform_levels if include_waveform else None,
+            n_fft=config["n_fft"], hop_length=config["hop_length"]
+        )
+    
+    # Decoderen en spectrale features (en waveform) in blokken: alles in de stap 'load'
+    with stages.stage("load"):
+        try:
+            features = stream(source.open())
+        except RuntimeError:
+            if not source.in_memory:
+                raise
+            # Formaat niet uit het geheugen te lezen (bijv. m4a): via een tijdelijk bestand
+            with source.local_path() as path:
+                features = stream(path)
+    
+    # De streaming features gedragen zich als AnalysisContext voor de detectors
+    with stages.stage("bpm"):
+        bpm, bpm_confidence = detect_bpm_accurate(None, features.sr, features)
+    with stages.stage("key"):
+        key, mode, key_confidence = detect_key_accurate(None, features.sr, features)
+        chroma_vector = np.mean(features.chromagram, axis=1)
+    
+    waveform_data = features.waveform if include_waveform else None
+    
+    result = _build_result(source, config, bpm, bpm_confidence, key, mode, key_confidence,
+                           chroma_vector, features.duration, waveform_data, stages)
+    result["analysis_path"] = {"bpm": "full", "key": "full"}
+    return result
+
+
+def _build_result(source, config, bpm, bpm_confidence, key, mode, key_confidence, chroma_vector,
+                  duration_seconds, waveform_data, stages=NULL_RECORDER):
+    """
+    Stel het resultaat dictionary samen (metadata wordt hier uitgelezen)
+    """
+    # Duur berekenen
+    duration_formatted = format_duration(duration_seconds)
+    
+    # Song naam en bitrate (bestand maar één keer openen)
+    with stages.stage("metadata"):
+        metadata = read_metadata(source.open()) or {}
+    song_name = metadata.get('title') or source.stem
+    bitrate = metadata.get('bitrate')
     
     # Resultaat
     result = {
@@ -285,13 +374,15 @@ def analyze_audio(filename, sample_rate=44100, include_waveform=True, waveform_s
         "mode": mode,
         "key_full": f"{key} {mode}",  # Bijv. "C major" of "A minor"
         "key_confidence": round(key_confidence, 3),
+        "chroma_vector": [round(float(c), 6) for c in chroma_vector],
         "song_name": song_name,
         "duration": round(duration_seconds, 2),
         "duration_formatted": duration_formatted,
         "bitrate": bitrate,
         "bitrate_kbps": bitrate,  # Alias voor duidelijkheid
-        "filename": Path(filename).name,
-        "filepath": str(filename)
+        "filename": source.name,
+        "filepath": source.path,
+        "profile": config["name"]
     }
     
     # Voeg waveform toe als gevraagd
@@ -301,19 +392,20 @@ def analyze_audio(filename, sample_rate=44100, include_waveform=True, waveform_s
     return result
 
 
-def analyze_audio_simple(filename, sample_rate=44100, include_waveform=False):
+def analyze_audio_simple(filename, sample_rate=None, include_waveform=False, profile=None):
     """
     Vereenvoudigde versie - retourneert alleen de essentiële velden
     
     Args:
         filename: Pad naar audio bestand
-        sample_rate: Sample rate voor analyse (default: 44100)
+        sample_rate: Sample rate voor analyse (default: die van het profiel)
         include_waveform: Of waveform data moet worden opgenomen (default: False)
+        profile: Analyse profiel ('fast', 'balanced', 'archival'; default: archival)
     
     Returns:
         Dictionary met: bpm, key, song_name, duration, bitrate, (optioneel: waveform)
     """
-    result = analyze_audio(filename, sample_rate, include_waveform=include_waveform)
+    result = analyze_audio(filename, sample_rate, include_waveform=include_waveform, profile=profile)
     
     simple_result = {
         "bpm": result["bpm"],
@@ -338,9 +430,12 @@ if __name__ == "__main__":
         print("Music Analyzer Standalone")
         print("=" * 50)
         print("\nGebruik:")
-        print("  python music_analyzer_standalone.py <audio_file>")
+        print("  python music_analyzer_standalone.py <audio_file> [--streaming] [--excerpts] [--profile fast|balanced|archival] [--binary]")
+        print("  python music_analyzer_standalone.py <map> [--workers N] [--output resultaten.jsonl]")
+        print("  python music_analyzer_standalone.py <audio_file|map> --probe  (alleen metadata, zonder decoderen)")
         print("\nVoorbeeld:")
         print("  python music_analyzer_standalone.py track.mp3")
+        print("  python music_analyzer_standalone.py ~/Music --workers 8")
         print("\nOf gebruik in Python:")
         print("  from music_analyzer_standalone import analyze_audio")
         print("  result = analyze_audio('track.mp3')")
@@ -349,12 +444,30 @@ if __name__ == "__main__":
     
     filename = sys.argv[1]
     
+    if '--probe' in sys.argv[2:]:
+        # Alleen metadata, duur en bitrate (zonder decoderen); werkt ook op een map
+        from audio_probe import main as probe_main
+        sys.exit(probe_main([arg for arg in sys.argv[1:] if arg != '--probe']))
+    
+    if Path(filename).is_dir():
+        # Batch mode: complete directory parallel analyseren
+        from batch_analyzer import main as batch_main
+        batch_main(sys.argv[1:] + ['--analyzer', 'standalone'])
+        sys.exit(0)
+    
     print("\n" + "=" * 50)
     print(f"🎵 Analyseren: {Path(filename).name}")
     print("=" * 50)
     
     try:
-        result = analyze_audio(filename)
+        # --streaming: analyse in blokken voor lange mixes (constant geheugen)
+        # --profile <naam>: fast, balanced of archival
+        # --binary: export als .bin (arrays) met JSON sidecar
+        # --excerpts: BPM/key eerst op fragmenten (volledige track alleen bij lage confidence)
+        options = sys.argv[2:]
+        profile = options[options.index('--profile') + 1] if '--profile' in options[:-1] else None
+        result = analyze_audio(filename, streaming='--streaming' in options, profile=profile,
+                               excerpts='--excerpts' in options)
         
         print("\n📊 RESULTATEN:")
         print("=" * 50)
@@ -362,23 +475,31 @@ if __name__ == "__main__":
         print(f"🎯 BPM:         {result['bpm']} ({result['bpm_confidence']*100:.0f}% confidence)")
         print(f"🎹 Key:         {result['key_full']} ({result['key_confidence']*100:.0f}% confidence)")
         print(f"⏱️  Duur:        {result['duration_formatted']} ({result['duration']:.2f} sec)")
+        if 'excerpts' in result:
+            path = result['analysis_path']
+            print(f"✂️  Fragmenten:  {len(result['excerpts'])} (BPM: {path['bpm']}, key: {path['key']})")
         if result['bitrate']:
             print(f"📡 Bitrate:     {result['bitrate']} kbps")
         else:
             print(f"📡 Bitrate:     Niet beschikbaar")
         if 'waveform' in result:
-            waveform_info = result['waveform']
-            print(f"🌊 Waveform:    {waveform_info['waveform_samples']} samples")
-            if waveform_info['downsampled']:
-                print(f"                (Downsampled van {waveform_info['original_samples']} samples)")
+            levels = result['waveform']['levels']
+            print(f"🌊 Waveform:    {len(levels)} zoomniveaus "
+                  f"({', '.join(str(level['buckets']) for level in levels)} buckets)")
         print("=" * 50)
         
-        # Export naar JSON
-        import json
-        output_file = f"{Path(filename).stem}_analysis.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-        print(f"\n💾 Resultaten opgeslagen in: {output_file}")
+        if '--binary' in options:
+            # Export als .bin (arrays) met JSON sidecar
+            from binary_export import export_binary
+            bin_file, json_file = export_binary(result, f"{Path(filename).stem}_analysis")
+            print(f"\n💾 Resultaten opgeslagen in: {bin_file} (+ {json_file})")
+        else:
+            # Export naar JSON
+            import json
+            output_file = f"{Path(filename).stem}_analysis.json"
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            print(f"\n💾 Resultaten opgeslagen in: {output_file}")
         
     except Exception as e:
         print(f"\n❌ Fout bij analyseren: {e}")
@@ -0,0 +1,234 @@
+"""
+Segmentation - Beat-synchrone structuur segmentatie (phrases)
+- Features (chroma en energie) worden per beat gemiddeld
+- Self-similarity matrix over de beats; een checkerboard kernel langs de
+  diagonaal geeft een novelty curve (Foote), volledig gevectoriseerd
+- Pieken in de novelty curve zijn kandidaat grenzen; die worden op het
+  phrase grid (8/16/32 beats) gelegd
+- Segmenten worden op energie gelabeld als intro, verse, chorus of outro
+
+Werkt op beat niveau (een paar honderd tot duizend beats per track), dus
+ook een track van 10 minuten kost maar enkele milliseconden.
+
+Gebruik:
+    from segmentation import segment_phrases
+    phrases = segment_phrases(beat_times, energy, duration, chroma=chromagram)
+"""
+
+import numpy as np
+from scipy.signal import find_peaks
+
+
+# Phrase lengtes in beats; grenzen liggen altijd op het fijnste grid
+PHRASE_LENGTHS = (8, 16, 32)
+
+# Een kandidaat grens gaat naar een grover grid als die binnen zoveel beats ligt
+SNAP_TOLERANCE = 2
+
+# Minimaal energie verschil tussen segmenten om chorus en verse te onderscheiden
+MIN_ENERGY_SPREAD = 0.1
+
+# Halve breedte van de checkerboard kernel in beats (één 16-beat phrase aan elke kant,
+# zodat akkoordwissels binnen een phrase niet als grens gezien worden)
+KERNEL_BEATS = 16
+
+
+def beat_sync(features, beat_frames):
+    """
+    Gemiddelde van frame features per beat
+
+    Args:
+        features: Array (d × frames), bijv. float32; gesommeerd wordt in float64
+                  (zonder float64 kopie van de frames)
+        beat_frames: Oplopende frame indices van de beats; elke beat loopt tot de
+                     volgende, de laatste tot het einde
+
+    Returns:
+        Array beats × d met het gemiddelde per beat (float64)
+    """
+    n_frames = features.shape[1]
+    starts = np.clip(np.asarray(beat_frames, dtype=np.int64), 0, n_frames - 1)
+    sums = np.add.reduceat(features, starts, axis=1, dtype=np.float64)
+
+    # reduceat geeft bij een leeg interval het element op de start (count 1)
+    counts = np.diff(np.append(starts, n_frames))
+    counts = np.where(counts > 0, counts, 1)
+    return (sums / counts).T
+
+
+def checkerboard_kernel(half_width):
+    """
+    Checkerboard kernel met Gaussian taper (2·half_width × 2·half_width)
+    """
+    offsets = np.arange(-half_width, half_width) + 0.5
+    taper = np.exp(-0.5 * (offsets / (half_width / 2)) ** 2)
+    sign = np.sign(offsets)
+    return np.outer(sign * taper, sign * taper)
+
+
+def novelty_curve(features, half_width=KERNEL_BEATS, weights=None):
+    """
+    Novelty per beat (Foote): checkerboard kernel langs de diagonaal van de
+    self-similarity matrix
+
+    Alleen de band rond de diagonaal die de kernel raakt wordt berekend: per beat
+    één venster van 2·half_width beats, alle vensters tegelijk (geen loop over
+    de beats en geen volledige n × n matrix).
+
+    Args:
+        features: Array n × d (één rij per beat)
+        half_width: Halve kernel breedte in beats
+        weights: Optioneel gewicht per feature kolom (na standaardisatie)
+
+    Returns:
+        Array met n waarden; novelty[i] hoort bij de grens vóór beat i (0-1 genormaliseerd)
+    """
+    n = len(features)
+    std = features.std(axis=0)
+    z = (features - features.mean(axis=0)) / np.where(std > 0, std, 1)
+    if weights is not None:
+        z = z * np.asarray(weights, dtype=np.float64)
+
+    # Vensters rond elke grens: beats i-half_width .. i+half_width-1 (randen gespiegeld)
+    padded = np.pad(z, ((half_width, half_width), (0, 0)), mode='reflect' if n > half_width else 'edge')
+    windows = padded.astype(np.float32)[np.arange(n)[:, np.newaxis] + np.arange(2 * half_width)[np.newaxis, :]]
+
+    # Kwadratische afstanden binnen elk venster en Gaussian similarity
+    # (schaal: gemiddelde afstand, zodat de novelty niet van de feature schaal afhangt)
+    sq = np.einsum('ijd,ijd->ij', windows, windows)
+    dist = sq[:, :, np.newaxis] + sq[:, np.newaxis, :]
+    dist -= 2 * (windows @ windows.transpose(0, 2, 1))
+    np.maximum(dist, 0, out=dist)
+    scale = dist.mean()
+    similarity = np.exp(-dist / scale) if scale > 0 else np.ones_like(dist)
+
+    novelty = np.maximum(np.einsum('ijk,jk->i', similarity, checkerboard_kernel(half_width)), 0)
+    peak = novelty.max()
+    return novelty / peak if peak > 0 else novelty
+
+
+def snap_to_phrases(candidates, n_beats, phase=0, lengths=PHRASE_LENGTHS, tolerance=SNAP_TOLERANCE):
+    """
+    Leg kandidaat grenzen (beat indices) op het phrase grid
+
+    Een grens gaat naar de dichtstbijzijnde lijn van het grofste grid (bijv. 32 beats)
+    dat binnen de tolerantie ligt, en anders naar het fijnste grid (8 beats).
+
+    Args:
+        candidates: Beat indices van kandidaat grenzen
+        n_beats: Aantal beats
+        phase: Beat index van de eerste grid lijn (eerste tel van een phrase)
+        lengths: Phrase lengtes in beats (fijnste eerst)
+        tolerance: Maximale afstand in beats voor een grover grid
+
+    Returns:
+        Gesorteerde unieke beat indices (zonder 0 en n_beats)
+    """
+    candidates = np.asarray(candidates, dtype=np.float64)
+    finest = lengths[0]
+    snapped = phase + np.round((candidates - phase) / finest) * finest
+
+    for length in lengths[1:]:
+        coarse = phase + np.round((candidates - phase) / length) * length
+        use = np.abs(coarse - candidates) <= tolerance
+        snapped = np.where(use, coarse, snapped)
+
+    snapped = np.unique(snapped.astype(np.int64))
+    return snapped[(snapped > 0) & (snapped < n_beats)]
+
+
+def _grid_phase(novelty, length):
+    """Beat offset (0..length-1) waarop de novelty op het grid het hoogst is"""
+    padded = np.pad(novelty, (0, (-len(novelty)) % length))
+    return int(np.argmax(padded.reshape(-1, length).sum(axis=0)))
+
+
+def segment_phrases(beat_times, energy, duration, chroma=None, lengths=PHRASE_LENGTHS,
+                    half_width=KERNEL_BEATS):
+    """
+    Segmenteer een track in phrases op het beat grid
+
+    Args:
+        beat_times: Tijden van de beats in seconden
+        energy: Genormaliseerde energie per frame (0-1)
+        duration: Duur van de track in seconden
+        chroma: Optioneel chromagram (12 × frames, zelfde frames als energy)
+        lengths: Phrase lengtes in beats (default: 8, 16 en 32)
+        half_width: Halve kernel breedte in beats (default: 16)
+
+    Returns:
+        segments: Lijst met dictionaries (start, end, beats, energy, label)
+                  met grenzen op beat tijden (de eerste start op 0, de laatste eindigt op duration)
+    """
+    beat_times = np.asarray(beat_times, dtype=np.float64)
+    energy = np.asarray(energy)
+    if len(beat_times) < 2 * lengths[0] or len(energy) == 0 or duration <= 0:
+        return []
+
+    # Beat intervallen in frames (zelfde tijd → frame mapping als de peaks)
+    frames_per_second = len(energy) / duration
+    beat_frames = np.round(beat_times * frames_per_second).astype(np.int64)
+
+    # Per beat middelen vóór het samenvoegen: geen (13 × frames) float64 kopie
+    weights = [1.0]
+    if chroma is not None:
+        chroma = np.asarray(chroma)[:, :len(energy)]
+        beat_features = np.hstack([
+            beat_sync(chroma, beat_frames),
+            beat_sync(energy[np.newaxis, :chroma.shape[1]], beat_frames),
+        ])
+        # De 12 chroma kolommen wegen samen even zwaar als de energie
+        weights = [1 / np.sqrt(len(chroma))] * len(chroma) + weights
+    else:
+        beat_features = beat_sync(energy[np.newaxis, :], beat_frames)
+    beat_energy = beat_features[:, -1]
+    n_beats = len(beat_features)
+
+    novelty = novelty_curve(beat_features, half_width, weights)
+
+    # Kandidaten: pieken die boven de typische novelty uitsteken, minimaal 16 beats uit elkaar
+    peaks, _ = find_peaks(novelty, distance=lengths[min(1, len(lengths) - 1)],
+                          height=novelty.mean() + novelty.std())
+    phase = _grid_phase(novelty, lengths[0])
+    bounds = snap_to_phrases(peaks, n_beats, phase, lengths)
+    bounds = np.concatenate([[0], bounds, [n_beats]])
+
+    # Segment energie via cumulatieve som (geen loop over beats)
+    cum = np.concatenate([[0.0], np.cumsum(beat_energy)])
+    seg_energy = (cum[bounds[1:]] - cum[bounds[:-1]]) / np.diff(bounds)
+
+    # Hoog = chorus, laag = verse; een rustig begin/einde is intro/outro
+    # (zonder duidelijk energie verschil is alles verse)
+    threshold = (seg_energy.min() + seg_energy.max()) / 2
+    if seg_energy.max() - seg_energy.min() < MIN_ENERGY_SPREAD:
+        threshold = np.inf
+    labels = np.where(seg_energy > threshold, 'chorus', 'verse').astype(object)
+    if threshold < np.inf and len(labels) > 1:
+        # Intro/outro: de rustige phrases aan het begin/einde met (bijna) dezelfde energie
+        quiet = seg_energy <= threshold
+        intro = quiet & (np.abs(seg_energy - seg_energy[0]) < MIN_ENERGY_SPREAD)
+        outro = quiet & (np.abs(seg_energy - seg_energy[-1]) < MIN_ENERGY_SPREAD)
+        n_intro = min(int(np.cumprod(intro).sum()), len(labels) - 1)
+        n_outro = min(int(np.cumprod(outro[::-1]).sum()), len(labels) - 1 - n_intro)
+        labels[:n_intro] = 'intro'
+        labels[len(labels) - n_outro:] = 'outro'
+
+    # Opeenvolgende phrases met hetzelfde label vormen één sectie
+    keep = np.concatenate([[True], labels[1:] != labels[:-1], [True]])
+    bounds = bounds[keep]
+    labels = labels[keep[:-1]]
+    seg_energy = (cum[bounds[1:]] - cum[bounds[:-1]]) / np.diff(bounds)
+
+    times = np.append(beat_times, duration)[bounds]
+    times[0], times[-1] = 0.0, duration
+
+    return [
+        {
+            'start': round(float(times[i]), 3),
+            'end': round(float(times[i + 1]), 3),
+            'beats': int(bounds[i + 1] - bounds[i]),
+            'energy': round(float(seg_energy[i]), 4),
+            'label': str(labels[i]),
+        }
+        for i in range(len(labels))
+    ]
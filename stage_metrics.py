@@ -0,0 +1,254 @@
+"""
+Stage Metrics - Tijd en geheugen per analyse stap
+- StageRecorder meet per stap (load, bpm, key, energy, peaks, phrases, beats, render,
+  en bij de standalone analyzer excerpts, waveform en metadata) de wall time, CPU time
+  van de thread en optioneel de piek allocatie
+  (cpu_seconds is thread_time(): BLAS/numba worker threads tellen niet mee)
+- StageMetrics verzamelt de metingen van alle analyses (thread-safe)
+- prometheus_text() levert alles in het Prometheus text formaat (/metrics)
+
+De piek allocatie wordt met tracemalloc gemeten. Dat vertraagt de analyse
+(~20%) en is daarom optioneel. tracemalloc is proces-breed (ook reset_peak): een
+stap die overlapt met een gemeten stap van een andere analyse (thread) krijgt
+daarom geen peak_alloc_mb, in plaats van een piek met andermans allocaties.
+
+Gebruik:
+    from stage_metrics import StageRecorder
+    stages = StageRecorder(track_memory=True)
+    with stages.stage('bpm'):
+        tempo = detect_bpm(...)
+    stages.finish()  # {'bpm': {'wall_seconds': ..., 'cpu_seconds': ..., 'peak_alloc_mb': ...}}
+"""
+
+import math
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+STAGES = ('load', 'excerpts', 'bpm', 'key', 'energy', 'peaks', 'phrases', 'beats', 'waveform', 'metadata', 'render')
+
+# Histogram grenzen (seconden) voor de wall time per stap
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_MB = 1024 * 1024
+
+# Gemeten stappen (track_memory) die nu lopen, over alle threads, en hoe vaak een
+# stap begon terwijl er al een liep; een verandering tijdens een stap maakt de piek onbruikbaar
+_tracing_lock = threading.Lock()
+_tracing_active = 0
+_tracing_overlaps = 0
+
+
+class StageRecorder:
+    """
+    Meet de analyse stappen van één track
+
+    cpu_seconds is de CPU time van de aanroepende thread (time.thread_time); werk in
+    BLAS/numba worker threads telt daarin niet mee.
+
+    Args:
+        track_memory: Piek allocatie per stap meten met tracemalloc (default: False);
+                      stappen die overlappen met een gemeten stap in een andere thread
+                      krijgen geen peak_alloc_mb
+    """
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.stages = {}
+        self._overlapped = set()
+        self._started_tracing = False
+
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name):
+        """Meet de code binnen het with-blok als stap `name` (herhaalde stappen worden opgeteld)"""
+        global _tracing_active, _tracing_overlaps
+        if self.track_memory:
+            with _tracing_lock:
+                alone = _tracing_active == 0
+                _tracing_active += 1
+                if not alone:
+                    _tracing_overlaps += 1
+                overlaps = _tracing_overlaps
+                # Niet de piek van een stap resetten die in een andere thread loopt
+                if alone:
+                    start_alloc = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+
+        try:
+            yield
+        finally:
+            metrics = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            metrics['wall_seconds'] += time.perf_counter() - wall
+            metrics['cpu_seconds'] += time.thread_time() - cpu
+
+            if self.track_memory:
+                with _tracing_lock:
+                    _tracing_active -= 1
+                    exclusive = alone and overlaps == _tracing_overlaps
+                    if exclusive:
+                        # Piek boven wat er bij de start van de stap al gealloceerd was
+                        peak = (tracemalloc.get_traced_memory()[1] - start_alloc) / _MB
+                if not exclusive:
+                    self._overlapped.add(name)
+                    metrics.pop('peak_alloc_mb', None)
+                elif name not in self._overlapped:
+                    metrics['peak_alloc_mb'] = max(metrics.get('peak_alloc_mb', 0.0), peak)
+
+    def as_dict(self):
+        """
+        Returns:
+            Dictionary stap -> wall_seconds, cpu_seconds (en peak_alloc_mb), afgerond
+        """
+        return {
+            name: {key: round(value, 4 if key != 'peak_alloc_mb' else 2) for key, value in metrics.items()}
+            for name, metrics in self.stages.items()
+        }
+
+    def finish(self):
+        """
+        Stop tracemalloc (alleen als deze recorder het gestart heeft)
+
+        Returns:
+            Zelfde als as_dict()
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return self.as_dict()
+
+
+class _NullRecorder:
+    """Recorder die niets meet (instrumentatie uit)"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+class StageMetrics:
+    """
+    Verzamelt stap metingen van alle analyses voor de /metrics endpoint
+    """
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage_metrics):
+        """
+        Voeg de metingen van één analyse toe
+
+        Args:
+            stage_metrics: Dictionary zoals StageRecorder.as_dict()
+        """
+        with self._lock:
+            for name, metrics in stage_metrics.items():
+                stats = self._stages.setdefault(name, {
+                    'count': 0, 'wall_sum': 0.0, 'cpu_sum': 0.0,
+                    'bucket_counts': [0] * len(self.buckets), 'peak_alloc_mb_max': None,
+                })
+                wall = metrics['wall_seconds']
+                stats['count'] += 1
+                stats['wall_sum'] += wall
+                stats['cpu_sum'] += metrics['cpu_seconds']
+                for i, bound in enumerate(self.buckets):
+                    if wall <= bound:
+                        stats['bucket_counts'][i] += 1
+
+                if 'peak_alloc_mb' in metrics:
+                    stats['peak_alloc_mb_max'] = max(stats['peak_alloc_mb_max'] or 0.0, metrics['peak_alloc_mb'])
+
+    def snapshot(self):
+        """
+        Returns:
+            Kopie van de verzamelde statistieken per stap
+        """
+        with self._lock:
+            return {name: dict(stats, bucket_counts=list(stats['bucket_counts']))
+                    for name, stats in self._stages.items()}
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _metric(lines, name, metric_type, help_text, samples):
+    """Voeg één metric (HELP, TYPE en samples) toe in het Prometheus text formaat"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for suffix, labels, value in samples:
+        label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                     else f"{name}{suffix} {_format_value(value)}")
+
+
+def prometheus_text(stage_metrics=None, job_metrics=None, prefix='music_analyzer'):
+    """
+    Render metrics in het Prometheus text formaat (versie 0.0.4)
+
+    Args:
+        stage_metrics: StageMetrics instantie (optioneel)
+        job_metrics: Dictionary uit JobQueue.metrics() (optioneel)
+        prefix: Prefix voor alle metric namen
+
+    Returns:
+        Tekst voor een /metrics response
+    """
+    lines = []
+
+    if stage_metrics is not None:
+        stages = stage_metrics.snapshot()
+        ordered = [name for name in STAGES if name in stages] + sorted(set(stages) - set(STAGES))
+
+        histogram = []
+        for name in ordered:
+            stats = stages[name]
+            for bound, count in zip(stage_metrics.buckets, stats['bucket_counts']):
+                histogram.append(('_bucket', {'stage': name, 'le': _format_value(float(bound))}, count))
+            histogram.append(('_bucket', {'stage': name, 'le': '+Inf'}, stats['count']))
+            histogram.append(('_sum', {'stage': name}, stats['wall_sum']))
+            histogram.append(('_count', {'stage': name}, stats['count']))
+        _metric(lines, f"{prefix}_stage_seconds", 'histogram', 'Wall time per analyse stap', histogram)
+
+        _metric(lines, f"{prefix}_stage_cpu_seconds_total", 'counter', 'CPU time per analyse stap',
+                [('', {'stage': name}, stages[name]['cpu_sum']) for name in ordered])
+
+        memory = [('', {'stage': name}, int(stages[name]['peak_alloc_mb_max'] * _MB))
+                  for name in ordered if stages[name]['peak_alloc_mb_max'] is not None]
+        if memory:
+            _metric(lines, f"{prefix}_stage_peak_alloc_bytes", 'gauge',
+                    'Hoogste piek allocatie per analyse stap (tracemalloc)', memory)
+
+    if job_metrics is not None:
+        _metric(lines, f"{prefix}_queue_depth", 'gauge', 'Wachtende analyse jobs',
+                [('', {}, job_metrics['queue_depth'])])
+        _metric(lines, f"{prefix}_jobs_running", 'gauge', 'Actieve analyse jobs',
+                [('', {}, job_metrics['running'])])
+        _metric(lines, f"{prefix}_workers", 'gauge', 'Aantal analyse workers',
+                [('', {}, job_metrics['workers'])])
+        _metric(lines, f"{prefix}_jobs_total", 'counter', 'Analyse jobs per uitkomst',
+                [('', {'outcome': outcome}, job_metrics[outcome])
+                 for outcome in ('submitted', 'completed', 'failed', 'rejected')])
+
+        for kind in ('wait', 'run'):
+            samples = [('', {'quantile': q}, job_metrics[f"{kind}_seconds_p{p}"])
+                       for q, p in (('0.5', 50), ('0.95', 95)) if job_metrics[f"{kind}_seconds_p{p}"] is not None]
+            if samples:
+                _metric(lines, f"{prefix}_job_{kind}_seconds", 'gauge',
+                        f"{'Wachttijd' if kind == 'wait' else 'Looptijd'} van recente jobs", samples)
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,420 @@
+"""
+Streaming Analysis - Analyse in blokken met constant geheugengebruik
+- Leest audio in blokken van vaste grootte (soundfile, met audioread als fallback)
+- Resampled per blok met een streaming resampler (soxr)
+- Werkt RMS energie, chroma sommen, onset envelope en waveform peak pyramide
+  incrementeel bij, zodat het piekgeheugen niet afhangt van de lengte van de track
+
+Het resultaat (StreamingFeatures) gedraagt zich als een AnalysisContext voor de
+BPM en key detectors: het heeft onset_env, chromagram, rms, tempo() en beat_track().
+Tempo schatting gebruikt een gesegmenteerde tempogram, zodat ook die stap
+begrensd blijft in geheugen.
+
+Gebruik:
+    from streaming_analysis import analyze_stream
+    features = analyze_stream('mix.mp3')
+    bpm, confidence = detect_bpm_accurate(None, features.sr, features)
+"""
+
+import os
+
+import librosa
+import numpy as np
+
+from analysis_context import DEFAULT_N_FFT, DEFAULT_HOP_LENGTH
+from waveform_pyramid import WAVEFORM_LEVELS, PeakPyramid
+
+
+# Standaard blokgrootte in seconden
+DEFAULT_BLOCK_SECONDS = 30
+
+# Aantal onset frames per tempogram segment (~3 min bij 44.1 kHz / hop 512)
+SEGMENT_FRAMES = 16384
+
+# Dynamisch bereik van de mel spectrogram in dB (zelfde als librosa.power_to_db)
+TOP_DB = 80.0
+
+
+def tempo_segmented(onset_env, sr, hop_length=DEFAULT_HOP_LENGTH, aggregate=np.mean,
+                    segment_frames=SEGMENT_FRAMES, ac_size=8.0):
+    """
+    Tempo schatting zoals librosa.beat.tempo, maar met de tempogram in segmenten
+
+    De volledige tempogram van een lange mix is (ac_size frames × alle frames) groot;
+    per segment (met overlap van een half venster) blijft het geheugen begrensd.
+    aggregate=None en np.mean geven exact hetzelfde resultaat als librosa;
+    np.median wordt benaderd met de mediaan van de segment medianen.
+
+    Args:
+        onset_env: Onset strength envelope
+        sr: Sample rate
+        hop_length: Aantal samples tussen frames
+        aggregate: np.mean, np.median of None (tempo per frame)
+        segment_frames: Aantal frames per segment
+        ac_size: Lengte van het autocorrelatie venster in seconden (librosa default)
+
+    Returns:
+        Tempo array (lengte 1, of lengte n_frames bij aggregate=None)
+    """
+    win_length = int(librosa.time_to_frames(ac_size, sr=sr, hop_length=hop_length))
+    margin = win_length // 2 + 1
+    n_frames = len(onset_env)
+
+    parts = []
+    weights = []
+    for start in range(0, max(n_frames, 1), segment_frames):
+        stop = min(start + segment_frames, n_frames)
+        lo = max(0, start - margin)
+        hi = min(n_frames, stop + margin)
+        tg = librosa.feature.tempogram(
+            onset_envelope=onset_env[lo:hi], sr=sr, hop_length=hop_length, win_length=win_length
+        )[:, start - lo:stop - lo]
+
+        if aggregate is None:
+            parts.append(librosa.beat.tempo(tg=tg, sr=sr, hop_length=hop_length, aggregate=None))
+        else:
+            parts.append(aggregate(tg, axis=1, keepdims=True))
+            weights.append(stop - start)
+        del tg
+
+    if aggregate is None:
+        return np.concatenate(parts)
+
+    if aggregate is np.mean:
+        combined = np.average(np.hstack(parts), axis=1, weights=weights)[:, np.newaxis]
+    else:
+        combined = aggregate(np.hstack(parts), axis=1, keepdims=True)
+    return librosa.beat.tempo(tg=combined, sr=sr, hop_length=hop_length, aggregate=None)
+
+
+def read_blocks(filename, block_seconds=DEFAULT_BLOCK_SECONDS):
+    """
+    Open een audio bestand voor het lezen in blokken (mono, native sample rate)
+
+    Args:
+        filename: Pad naar audio bestand, of een seekable file object (bijv. MemoryReader)
+        block_seconds: Lengte van elk blok in seconden
+
+    Returns:
+        native_sr: Sample rate van het bestand
+        total_frames: (Geschat) aantal samples in het bestand
+        blocks: Generator met mono float32 blokken
+    """
+    import soundfile as sf
+
+    try:
+        info = sf.info(filename)
+    except RuntimeError:
+        # Formaat niet ondersteund door libsndfile (bijv. m4a): decode via audioread/ffmpeg
+        # (audioread kan alleen paden openen)
+        if not isinstance(filename, (str, os.PathLike)):
+            raise
+        return _read_blocks_audioread(filename, block_seconds)
+
+    if hasattr(filename, 'seek'):
+        filename.seek(0)  # sf.info heeft de header al gelezen
+
+    block_size = int(block_seconds * info.samplerate)
+
+    def blocks():
+        for block in sf.blocks(filename, blocksize=block_size, dtype='float32', always_2d=True):
+            yield block.mean(axis=1)
+
+    return info.samplerate, info.frames, blocks()
+
+
+def stream_duration(filename):
+    """
+    Duur uit de header van het bestand, zonder te decoderen
+
+    Formaten die libsndfile niet kent (m4a, aac, wma) lezen de duur uit de container
+    header via mutagen (audio_probe.read_metadata).
+
+    Args:
+        filename: Pad naar audio bestand, of een seekable file object
+
+    Returns:
+        Duur in seconden, of None als de header geen duur geeft
+    """
+    import soundfile as sf
+
+    try:
+        info = sf.info(filename)
+        return info.frames / info.samplerate
+    except RuntimeError:
+        pass
+    finally:
+        if hasattr(filename, 'seek'):
+            filename.seek(0)
+
+    from audio_probe import read_metadata
+
+    try:
+        metadata = read_metadata(filename) or {}
+    finally:
+        if hasattr(filename, 'seek'):
+            filename.seek(0)
+    return metadata.get('duration') or None
+
+
+def _read_blocks_audioread(filename, block_seconds):
+    import audioread
+
+    f = audioread.audio_open(filename)
+    native_sr = f.samplerate
+    channels = f.channels
+    block_size = int(block_seconds * native_sr)
+
+    def blocks():
+        with f:
+            pending = []
+            pending_len = 0
+            for buf in f:
+                x = np.frombuffer(buf, dtype='<i2').astype(np.float32) / 32768.0
+                x = x.reshape(-1, channels).mean(axis=1)
+                pending.append(x)
+                pending_len += len(x)
+                if pending_len >= block_size:
+                    yield np.concatenate(pending)
+                    pending = []
+                    pending_len = 0
+            if pending:
+                yield np.concatenate(pending)
+
+    return native_sr, int(f.duration * native_sr), blocks()
+
+
+class StreamingFeatures:
+    """
+    Incrementele feature accumulator voor één track
+
+    Blokken worden met update() toegevoegd; finalize() sluit de stream af.
+    Frames komen exact overeen met librosa's center=True framing.
+
+    Args:
+        sr: Sample rate van de blokken
+        waveform_levels: Samples per bucket van de waveform peak pyramide (None = geen waveform)
+        n_fft: FFT grootte (default: 2048)
+        hop_length: Aantal samples tussen frames (default: 512)
+        keep_chroma: Chroma per frame bewaren in plaats van alleen de som (default: False);
+                     chromagram is dan 12 × frames (nodig voor phrases en het beat grid)
+        segment_frames: Frames per tempogram segment (default: 16384)
+        exact_onset: De onset envelope pas in finalize() berekenen, met de top_db drempel
+                     van de hele track (default: False = drempel van het maximum tot dan toe).
+                     Gelijk aan AnalysisContext.onset_env, maar bewaart de mel spectrogram
+                     in dB tot het einde (128 × float32 per frame)
+    """
+
+    def __init__(self, sr, waveform_levels=WAVEFORM_LEVELS, n_fft=DEFAULT_N_FFT, hop_length=DEFAULT_HOP_LENGTH,
+                 keep_chroma=False, segment_frames=SEGMENT_FRAMES, exact_onset=False):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.segment_frames = segment_frames
+        self.n_samples = 0
+
+        # Center padding zoals librosa (n_fft // 2 nullen aan het begin)
+        self._buffer = np.zeros(n_fft // 2, dtype=np.float32)
+
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        self._chroma_basis = None
+        self._prev_mel_db = None
+        self._max_db = -np.inf
+        self._mel_db_blocks = [] if exact_onset else None
+
+        # Onset envelope begint met lag + n_fft // (2 * hop) nullen (zoals librosa)
+        self._onset_blocks = [np.zeros(1 + n_fft // (2 * hop_length), dtype=np.float32)]
+        self._rms_blocks = []
+        self.chroma_sum = np.zeros(12)
+        self.chroma_frames = 0
+        self._chroma_blocks = [] if keep_chroma else None
+        self._chroma = None
+
+        # Waveform peak pyramide (min/max/RMS per bucket)
+        self._pyramid = PeakPyramid(sr, waveform_levels) if waveform_levels else None
+        self._waveform = None
+
+        self.onset_env = None
+        self.rms = None
+
+    def update(self, block):
+        """Voeg een blok mono samples toe"""
+        block = np.asarray(block, dtype=np.float32)
+        if len(block) == 0:
+            return
+
+        if self._pyramid is not None:
+            self._pyramid.update(block)
+        self.n_samples += len(block)
+
+        self._buffer = np.concatenate([self._buffer, block])
+        self._process_frames()
+
+    def finalize(self):
+        """
+        Sluit de stream af (center padding aan het einde) en bouw de feature arrays
+
+        Returns:
+            self
+        """
+        self._buffer = np.concatenate([self._buffer, np.zeros(self.n_fft // 2, dtype=np.float32)])
+        self._process_frames()
+        self._buffer = None
+
+        if self._mel_db_blocks is not None:
+            # Nu pas is het maximum van de hele track (en dus de top_db drempel) bekend
+            blocks, self._mel_db_blocks = self._mel_db_blocks, None
+            while blocks:
+                self._add_onset(blocks.pop(0))
+
+        n_frames = 1 + self.n_samples // self.hop_length
+        self.onset_env = np.concatenate(self._onset_blocks)[:n_frames]
+        self.rms = np.concatenate(self._rms_blocks) if self._rms_blocks else np.zeros(0, dtype=np.float32)
+        self._onset_blocks = self._rms_blocks = None
+        if self._chroma_blocks is not None:
+            self._chroma = (np.concatenate(self._chroma_blocks, axis=1) if self._chroma_blocks
+                            else np.zeros((12, 0), dtype=np.float32))
+            self._chroma_blocks = None
+
+        if self._pyramid is not None:
+            self._waveform = self._pyramid.finalize()
+            self._pyramid = None
+        return self
+
+    def _process_frames(self):
+        n_frames = (len(self._buffer) - self.n_fft) // self.hop_length + 1
+        if n_frames <= 0:
+            return
+
+        used = (n_frames - 1) * self.hop_length + self.n_fft
+        stft = librosa.stft(self._buffer[:used], n_fft=self.n_fft, hop_length=self.hop_length, center=False)
+        self._buffer = self._buffer[n_frames * self.hop_length:]
+
+        magnitude = np.abs(stft)
+        del stft
+        power = magnitude ** 2
+
+        # RMS energie
+        self._rms_blocks.append(
+            librosa.feature.rms(S=magnitude, frame_length=self.n_fft, hop_length=self.hop_length)[0]
+        )
+        del magnitude
+
+        # Onset envelope: positieve verschillen van de mel spectrogram in dB
+        mel_db = librosa.power_to_db(self._mel_basis @ power, top_db=None)
+        self._max_db = max(self._max_db, float(mel_db.max()))
+        if self._mel_db_blocks is not None:
+            self._mel_db_blocks.append(mel_db)
+        else:
+            self._add_onset(mel_db)
+
+        # Chroma: tuning wordt op het eerste blok geschat en daarna vastgehouden
+        if self._chroma_basis is None:
+            tuning = librosa.estimate_tuning(S=power, sr=self.sr, bins_per_octave=12)
+            self._chroma_basis = librosa.filters.chroma(sr=self.sr, n_fft=self.n_fft, tuning=tuning)
+        chroma = librosa.util.normalize(self._chroma_basis @ power, norm=np.inf, axis=0)
+        self.chroma_sum += chroma.sum(axis=1)
+        self.chroma_frames += chroma.shape[1]
+        if self._chroma_blocks is not None:
+            self._chroma_blocks.append(chroma)
+
+    def _add_onset(self, mel_db):
+        """Onset waarden van een blok mel dB frames (top_db drempel van het maximum tot nu)"""
+        mel_db = np.maximum(mel_db, self._max_db - TOP_DB)
+        if self._prev_mel_db is not None:
+            mel_db_lagged = np.concatenate([self._prev_mel_db, mel_db], axis=1)
+        else:
+            mel_db_lagged = mel_db
+        onset = np.maximum(0.0, np.diff(mel_db_lagged, axis=1)).mean(axis=0)
+        self._onset_blocks.append(onset.astype(np.float32))
+        self._prev_mel_db = mel_db[:, -1:]
+
+    def tempo(self, aggregate=np.mean):
+        """Tempo schatting met een gesegmenteerde tempogram (begrensd geheugen)"""
+        return tempo_segmented(self.onset_env, self.sr, self.hop_length, aggregate, self.segment_frames)
+
+    def beat_track(self, units='time'):
+        """Beat tracking; het globale tempo komt uit de gesegmenteerde tempogram"""
+        bpm = self.tempo(np.mean)[0]
+        return librosa.beat.beat_track(
+            onset_envelope=self.onset_env, sr=self.sr, hop_length=self.hop_length, bpm=bpm, units=units
+        )
+
+    @property
+    def chromagram(self):
+        """
+        Chromagram 12 × frames (met keep_chroma), anders de gemiddelde chroma vector
+        als 12 × 1 chromagram (compatibel met de key detectors)
+        """
+        if self._chroma is not None:
+            return self._chroma
+        return (self.chroma_sum / max(self.chroma_frames, 1))[:, np.newaxis]
+
+    @property
+    def duration(self):
+        """Duur van de track in seconden"""
+        return self.n_samples / self.sr
+
+    @property
+    def waveform(self):
+        """Waveform peak pyramide (zie waveform_pyramid.PeakPyramid.finalize) of None"""
+        return self._waveform
+
+
+def analyze_stream(filename, sample_rate=44100, block_seconds=DEFAULT_BLOCK_SECONDS,
+                   waveform_levels=WAVEFORM_LEVELS, n_fft=DEFAULT_N_FFT, hop_length=DEFAULT_HOP_LENGTH,
+                   keep_chroma=False, segment_frames=SEGMENT_FRAMES, exact_onset=False):
+    """
+    Lees een audio bestand in blokken en bereken de features incrementeel
+
+    Args:
+        filename: Pad naar audio bestand, of een seekable file object (zie read_blocks)
+        sample_rate: Sample rate voor analyse (default: 44100, None = native)
+        block_seconds: Blokgrootte in seconden (default: 30)
+        waveform_levels: Samples per bucket van de waveform pyramide (default: 2048, 16384; None = geen)
+        n_fft: FFT grootte (default: 2048)
+        hop_length: Aantal samples tussen frames (default: 512)
+        keep_chroma: Chroma per frame bewaren (default: False, zie StreamingFeatures)
+        segment_frames: Frames per tempogram segment (default: 16384)
+        exact_onset: Onset envelope met de top_db drempel van de hele track (default: False)
+
+    Returns:
+        StreamingFeatures (afgesloten met finalize())
+    """
+    native_sr, _, blocks = read_blocks(filename, block_seconds)
+    sr = sample_rate or native_sr
+
+    resampler = None
+    if sr != native_sr:
+        import soxr
+        resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32', quality='HQ')
+
+    features = StreamingFeatures(sr, waveform_levels, n_fft, hop_length, keep_chroma, segment_frames, exact_onset)
+
+    for block in blocks:
+        if resampler is not None:
+            block = resampler.resample_chunk(block)
+        features.update(block)
+
+    if resampler is not None:
+        features.update(resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+
+    return features.finalize()
+
+
+def analyze_signal(y, sr, block_seconds=DEFAULT_BLOCK_SECONDS, waveform_levels=WAVEFORM_LEVELS,
+                   n_fft=DEFAULT_N_FFT, hop_length=DEFAULT_HOP_LENGTH, keep_chroma=False,
+                   segment_frames=SEGMENT_FRAMES, exact_onset=False):
+    """
+    Zelfde als analyze_stream, maar voor een al gedecodeerd signaal (bijv. uit een decoder thread)
+
+    De spectrale tussenresultaten blijven per blok begrensd; het signaal zelf wordt niet gekopieerd.
+
+    Returns:
+        StreamingFeatures (afgesloten met finalize())
+    """
+    features = StreamingFeatures(sr, waveform_levels, n_fft, hop_length, keep_chroma, segment_frames, exact_onset)
+    block_size = max(1, int(block_seconds * sr))
+    for start in range(0, len(y), block_size):
+        features.update(y[start:start + block_size])
+    return features.finalize()
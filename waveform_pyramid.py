@@ -0,0 +1,182 @@
+"""
+Waveform Pyramid - Min/max/RMS peak pyramide op meerdere zoomniveaus
+- Eén gevectoriseerde pass over de samples voor het fijnste niveau
+  (default 2048 samples per bucket); grovere niveaus worden daaruit afgeleid
+- Min en max als int8 (waarde × 127), RMS als uint8 (waarde × 255)
+- Compact opgeslagen als base64 strings, zodat het resultaat JSON blijft
+- Werkt zowel op een volledig signaal als blokgewijs (streaming)
+
+Frontends kunnen hiermee in- en uitzoomen zonder de audio opnieuw op te halen.
+
+Gebruik:
+    from waveform_pyramid import build_pyramid, decode_level
+    pyramid = build_pyramid(y, sr)
+    level = decode_level(pyramid['levels'][0])  # {'min': ..., 'max': ..., 'rms': ...}
+"""
+
+import base64
+
+import numpy as np
+
+
+# Aantal samples per bucket per zoomniveau (elk niveau een veelvoud van het vorige).
+# 2048 samples (46 ms bij 44.1 kHz) is genoeg voor een overzicht op volle breedte:
+# ~29 KB JSON voor 5 minuten, kleiner dan de oude lijst van 5000 floats (~106 KB)
+WAVEFORM_LEVELS = (2048, 16384)
+
+# Met een extra fijn niveau voor frontends die inzoomen (~8× zo groot: ~230 KB voor 5 minuten)
+DETAIL_WAVEFORM_LEVELS = (256, 2048, 16384)
+
+MIN_MAX_SCALE = 127
+RMS_SCALE = 255
+
+
+def _validate_levels(levels):
+    levels = tuple(int(level) for level in levels)
+    if not levels or any(level <= 0 for level in levels):
+        raise ValueError("Waveform levels moeten positieve bucket groottes zijn")
+    for finer, coarser in zip(levels, levels[1:]):
+        if coarser <= finer or coarser % finer:
+            raise ValueError(f"Waveform level {coarser} is geen veelvoud van {finer}")
+    return levels
+
+
+def _encode(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+def _decode(data, dtype):
+    return np.frombuffer(base64.b64decode(data), dtype=dtype)
+
+
+class PeakPyramid:
+    """
+    Incrementele opbouw van de peak pyramide
+
+    Blokken worden met update() toegevoegd; finalize() retourneert het resultaat.
+
+    Args:
+        sr: Sample rate
+        levels: Samples per bucket per niveau (default: WAVEFORM_LEVELS)
+    """
+
+    def __init__(self, sr, levels=WAVEFORM_LEVELS):
+        self.sr = sr
+        self.levels = _validate_levels(levels)
+        self.n_samples = 0
+
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._mins = []
+        self._maxs = []
+        self._sumsq = []
+        self._counts = []
+
+    def update(self, block):
+        """Voeg een blok mono samples toe"""
+        block = np.asarray(block, dtype=np.float32)
+        self.n_samples += len(block)
+
+        data = np.concatenate([self._carry, block]) if len(self._carry) else block
+        size = self.levels[0]
+        n_full = len(data) // size
+        if n_full:
+            self._add_buckets(data[:n_full * size].reshape(n_full, size))
+        self._carry = data[n_full * size:].copy()
+
+    def _add_buckets(self, buckets):
+        self._mins.append(buckets.min(axis=1))
+        self._maxs.append(buckets.max(axis=1))
+        self._sumsq.append(np.einsum('ij,ij->i', buckets, buckets, dtype=np.float64))
+        self._counts.append(np.full(len(buckets), buckets.shape[1], dtype=np.int64))
+
+    def finalize(self):
+        """
+        Sluit de stream af (laatste onvolledige bucket) en codeer alle niveaus
+
+        Returns:
+            Dictionary met:
+                - levels: Lijst met per niveau samples_per_bucket, buckets en
+                          base64 gecodeerde min (int8), max (int8) en rms (uint8)
+                - min_max_scale / rms_scale: Schaal van de gehele getallen
+                - original_samples: Aantal samples in het signaal
+                - sample_rate: Sample rate
+        """
+        if len(self._carry):
+            self._add_buckets(self._carry[np.newaxis, :])
+            self._carry = np.zeros(0, dtype=np.float32)
+
+        def joined(parts, dtype):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+        mins = joined(self._mins, np.float32)
+        maxs = joined(self._maxs, np.float32)
+        sumsq = joined(self._sumsq, np.float64)
+        counts = joined(self._counts, np.int64)
+
+        levels = []
+        for level in self.levels:
+            factor = level // self.levels[0]
+            if factor > 1:
+                # Grovere niveaus uit het fijnste niveau (laatste bucket mag korter zijn)
+                n = -(-len(mins) // factor)
+                pad = n * factor - len(mins)
+                mins_l = np.pad(mins, (0, pad), constant_values=np.inf).reshape(n, factor).min(axis=1)
+                maxs_l = np.pad(maxs, (0, pad), constant_values=-np.inf).reshape(n, factor).max(axis=1)
+                sumsq_l = np.pad(sumsq, (0, pad)).reshape(n, factor).sum(axis=1)
+                counts_l = np.pad(counts, (0, pad)).reshape(n, factor).sum(axis=1)
+            else:
+                mins_l, maxs_l, sumsq_l, counts_l = mins, maxs, sumsq, counts
+
+            rms = np.sqrt(sumsq_l / np.maximum(counts_l, 1))
+            levels.append({
+                "samples_per_bucket": level,
+                "buckets": len(mins_l),
+                "min": _encode(np.clip(np.round(mins_l * MIN_MAX_SCALE), -MIN_MAX_SCALE, MIN_MAX_SCALE), np.int8),
+                "max": _encode(np.clip(np.round(maxs_l * MIN_MAX_SCALE), -MIN_MAX_SCALE, MIN_MAX_SCALE), np.int8),
+                "rms": _encode(np.clip(np.round(rms * RMS_SCALE), 0, RMS_SCALE), np.uint8),
+            })
+
+        self._mins = self._maxs = self._sumsq = self._counts = None
+
+        return {
+            "levels": levels,
+            "min_max_scale": MIN_MAX_SCALE,
+            "rms_scale": RMS_SCALE,
+            "original_samples": int(self.n_samples),
+            "sample_rate": int(self.sr),
+        }
+
+
+def build_pyramid(y, sr, levels=WAVEFORM_LEVELS):
+    """
+    Bouw de peak pyramide voor een volledig signaal
+
+    Args:
+        y: Audio time series
+        sr: Sample rate
+        levels: Samples per bucket per niveau (default: WAVEFORM_LEVELS)
+
+    Returns:
+        Dictionary zoals PeakPyramid.finalize()
+    """
+    pyramid = PeakPyramid(sr, levels)
+    pyramid.update(y)
+    return pyramid.finalize()
+
+
+def decode_level(level, min_max_scale=MIN_MAX_SCALE, rms_scale=RMS_SCALE):
+    """
+    Decodeer één niveau naar float32 arrays
+
+    Args:
+        level: Niveau dictionary uit pyramid['levels']
+
+    Returns:
+        Dictionary met min, max en rms (float32 arrays) en samples_per_bucket
+    """
+    return {
+        "samples_per_bucket": level["samples_per_bucket"],
+        "min": _decode(level["min"], np.int8).astype(np.float32) / min_max_scale,
+        "max": _decode(level["max"], np.int8).astype(np.float32) / min_max_scale,
+        "rms": _decode(level["rms"], np.uint8).astype(np.float32) / rms_scale,
+    }
@@ -0,0 +1,116 @@
+"""
+Waveform Render - Snelle waveform plots voor analyse afbeeldingen
+- Reduceert het signaal eerst tot een min/max envelope per pixel
+- Plot alleen de envelope (een paar duizend punten in plaats van miljoenen samples)
+- Lange lijnen (energie) worden gereduceerd tot min en max punten per pixel
+- Visueel gelijk aan het plotten van alle samples: per pixel kolom wordt toch
+  alleen de band tussen minimum en maximum zichtbaar
+
+Gebruik:
+    from waveform_render import min_max_line, plot_waveform_envelope
+    plot_waveform_envelope(ax, y, sr, n_pixels=2400, color='#4A90E2', alpha=0.3, outline_alpha=0.9)
+    ax.plot(*min_max_line(x_energy, energy, n_pixels=2400))
+"""
+
+import numpy as np
+
+
+# Resolutie waarmee de analyse afbeeldingen worden opgeslagen
+IMAGE_DPI = 150
+
+
+def min_max_envelope(y, sr, n_pixels):
+    """
+    Bereken de min/max envelope van een signaal voor een gegeven aantal pixels
+
+    Args:
+        y: Audio time series
+        sr: Sample rate
+        n_pixels: Aantal pixel kolommen (buckets)
+
+    Returns:
+        times: Tijd in seconden van het midden van elke bucket
+        mins: Minimum per bucket
+        maxs: Maximum per bucket
+    """
+    n_pixels = max(1, int(n_pixels))
+
+    # Korte signalen hoeven niet gereduceerd te worden
+    if len(y) <= 2 * n_pixels:
+        times = np.arange(len(y)) / sr
+        return times, y, y
+
+    edges = np.linspace(0, len(y), n_pixels + 1).astype(np.int64)
+    starts = edges[:-1]
+
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    times = (starts + edges[1:]) / (2 * sr)
+
+    return times, mins, maxs
+
+
+def min_max_line(x, y, n_pixels):
+    """
+    Reduceer een lijn tot het minimum en maximum per pixel kolom
+
+    De punten blijven in tijdsvolgorde, zodat een lijn door deze punten er
+    hetzelfde uitziet als een lijn door alle punten.
+
+    Args:
+        x: X waarden (oplopend)
+        y: Y waarden
+        n_pixels: Aantal pixel kolommen (buckets)
+
+    Returns:
+        x, y: Gereduceerde punten (maximaal 2 per pixel kolom)
+    """
+    n_pixels = max(1, int(n_pixels))
+    if len(y) <= 2 * n_pixels:
+        return x, y
+
+    edges = np.linspace(0, len(y), n_pixels + 1).astype(np.int64)
+    starts = edges[:-1]
+    bucket = np.repeat(np.arange(n_pixels), np.diff(edges))
+
+    # Index van minimum en maximum binnen elke bucket
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    idx_min = np.flatnonzero(y == mins[bucket])
+    idx_max = np.flatnonzero(y == maxs[bucket])
+    first_min = idx_min[np.unique(bucket[idx_min], return_index=True)[1]]
+    first_max = idx_max[np.unique(bucket[idx_max], return_index=True)[1]]
+
+    idx = np.unique(np.concatenate([first_min, first_max]))
+    return x[idx], y[idx]
+
+
+def figure_pixels(fig, dpi):
+    """
+    Returns:
+        Breedte van de figuur in pixels bij de gegeven dpi (bovengrens voor elke subplot)
+    """
+    return int(np.ceil(fig.get_figwidth() * dpi))
+
+
+def plot_waveform_envelope(ax, y, sr, n_pixels, color='#4A90E2', alpha=0.9, label=None, outline_alpha=None):
+    """
+    Plot een waveform als gevulde min/max envelope
+
+    Args:
+        ax: Matplotlib axes
+        y: Audio time series
+        sr: Sample rate
+        n_pixels: Aantal pixel kolommen (bijv. figure_pixels(fig, dpi))
+        color: Kleur van de waveform
+        alpha: Transparantie van de vulling
+        label: Optioneel label voor de legenda
+        outline_alpha: Transparantie van een dunne lijn door minimum en maximum per
+                       pixel kolom (zoals een lijn door alle samples); None = geen lijn
+    """
+    times, mins, maxs = min_max_envelope(y, sr, n_pixels)
+    if outline_alpha is not None:
+        # Per pixel kolom van minimum naar maximum, dezelfde envelope als de vulling
+        ax.plot(np.repeat(times, 2), np.column_stack([mins, maxs]).ravel(),
+                color=color, linewidth=0.8, alpha=outline_alpha)
+    return ax.fill_between(times, mins, maxs, color=color, alpha=alpha, linewidth=0.6, label=label)